@@ -7,3 +7,4 @@ class ApiConfig(AppConfig):
     def ready(self) -> None:
         # Register drf_spectacular schema extensions
         import api.schema  # noqa: F401
+        import api.signals  # noqa: F401
@@ -1,10 +1,15 @@
 import logging
 import shlex
+import time
+from collections import OrderedDict
 from datetime import UTC, datetime
-from typing import Any
+from threading import Lock
+from typing import Any, NamedTuple
 
 from django.conf import settings
+from django.contrib.auth.models import User
 from django.core.cache import cache
+from django.utils.crypto import salted_hmac
 
 import requests
 from allauth.socialaccount.models import SocialAccount
@@ -17,14 +22,29 @@ from rest_framework.exceptions import (
     PermissionDenied,
 )
 
+from emails.utils import incr_if_enabled
+
 logger = logging.getLogger("events")
 INTROSPECT_TOKEN_URL = "{}/introspect".format(
     settings.SOCIALACCOUNT_PROVIDERS["fxa"]["OAUTH_ENDPOINT"]
 )
+# Change the version to ignore introspection results cached in an older format
+INTROSPECT_CACHE_KEY_PREFIX = "fxa_token:v1:"
+# Cache errors and inactive tokens for this long, to avoid repeated introspection
+NEGATIVE_CACHE_TIMEOUT = 60
+
 
+def get_cache_key(token: str) -> str:
+    """
+    Return the cache key for the introspection result of an FxA token.
 
-def get_cache_key(token):
-    return hash(token)
+    The key is a keyed digest, so it is the same in every process and server,
+    and the cache does not contain the token.
+    """
+    digest = salted_hmac(
+        "api.authentication.get_cache_key", token, algorithm="sha256"
+    ).hexdigest()
+    return INTROSPECT_CACHE_KEY_PREFIX + digest
 
 
 def introspect_token(token: str) -> dict[str, Any]:
@@ -53,29 +73,105 @@ def introspect_token(token: str) -> dict[str, Any]:
     return fxa_resp_data
 
 
+class LocalTokenCacheEntry(NamedTuple):
+    fxa_uid: str
+    user_id: int
+    expires_at: float
+
+
+class LocalTokenCache:
+    """
+    A per-process LRU cache from token cache keys to authenticated users.
+
+    This avoids a shared cache round-trip and the SocialAccount query for clients
+    that poll the API with the same token. Entries expire with the token, and are
+    removed when the user is deactivated or deleted.
+    """
+
+    def __init__(self) -> None:
+        self._entries: OrderedDict[str, LocalTokenCacheEntry] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, cache_key: str) -> LocalTokenCacheEntry | None:
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.time():
+                del self._entries[cache_key]
+                return None
+            self._entries.move_to_end(cache_key)
+            return entry
+
+    def set(self, cache_key: str, fxa_uid: str, user_id: int, expires_at: int) -> None:
+        maxsize = settings.FXA_TOKEN_LOCAL_CACHE_SIZE
+        if maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[cache_key] = LocalTokenCacheEntry(
+                fxa_uid, user_id, expires_at
+            )
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, cache_key: str) -> None:
+        with self._lock:
+            self._entries.pop(cache_key, None)
+
+    def delete_user(self, user_id: int) -> None:
+        with self._lock:
+            for cache_key in [
+                key for key, entry in self._entries.items() if entry.user_id == user_id
+            ]:
+                del self._entries[cache_key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+local_token_cache = LocalTokenCache()
+
+
 def get_fxa_uid_from_oauth_token(token: str, use_cache: bool = True) -> str:
+    fxa_uid, _ = get_fxa_uid_and_expiration_from_oauth_token(token, use_cache)
+    return fxa_uid
+
+
+def get_fxa_uid_and_expiration_from_oauth_token(
+    token: str, use_cache: bool = True, cache_key: str | None = None
+) -> tuple[str, int | None]:
+    """
+    Get the FxA UID for a token, and the token expiration as a timestamp in seconds.
+
+    The expiration is None if FxA did not return one.
+    """
     # set a default cache_timeout, but this will be overriden to match
     # the 'exp' time in the JWT returned by FxA
-    cache_timeout = 60
-    cache_key = get_cache_key(token)
+    cache_timeout = NEGATIVE_CACHE_TIMEOUT
+    if cache_key is None:
+        cache_key = get_cache_key(token)
 
-    if not use_cache:
-        fxa_resp_data = introspect_token(token)
+    cached_fxa_resp_data = None
+    if use_cache:
+        cached_fxa_resp_data = cache.get(cache_key)
+        incr_if_enabled(
+            "fxa_token_cache.hit" if cached_fxa_resp_data else "fxa_token_cache.miss"
+        )
+
+    if cached_fxa_resp_data:
+        fxa_resp_data = cached_fxa_resp_data
     else:
         # set a default fxa_resp_data, so any error during introspection
         # will still cache for at least cache_timeout to prevent an outage
         # from causing useless run-away repetitive introspection requests
         fxa_resp_data = {"status_code": None, "json": {}}
         try:
-            cached_fxa_resp_data = cache.get(cache_key)
-
-            if cached_fxa_resp_data:
-                fxa_resp_data = cached_fxa_resp_data
-            else:
-                # no cached data, get new
-                fxa_resp_data = introspect_token(token)
-        except AuthenticationFailed:
-            raise
+            fxa_resp_data = introspect_token(token)
         finally:
             # Store potential valid response, errors, inactive users, etc. from FxA
             # for at least 60 seconds. Valid access_token cache extended after checking.
@@ -95,11 +191,18 @@ def get_fxa_uid_from_oauth_token(token: str, use_cache: bool = True) -> str:
         raise NotFound("FXA did not return an FXA UID.")
     fxa_uid = str(raw_fxa_uid)
 
-    # cache valid access_token and fxa_resp_data until access_token expiration
-    # TODO: revisit this since the token can expire before its time
+    fxa_token_exp_time = None
     if isinstance(fxa_resp_data.get("json", {}).get("exp"), int):
         # Note: FXA iat and exp are timestamps in *milliseconds*
         fxa_token_exp_time = int(fxa_resp_data["json"]["exp"] / 1000)
+
+    if cached_fxa_resp_data:
+        # already cached until access_token expiration
+        return fxa_uid, fxa_token_exp_time
+
+    # cache valid access_token and fxa_resp_data until access_token expiration
+    # TODO: revisit this since the token can expire before its time
+    if fxa_token_exp_time is not None:
         now_time = int(datetime.now(UTC).timestamp())
         fxa_token_exp_cache_timeout = fxa_token_exp_time - now_time
         if fxa_token_exp_cache_timeout > cache_timeout:
@@ -108,7 +211,7 @@ def get_fxa_uid_from_oauth_token(token: str, use_cache: bool = True) -> str:
             cache_timeout = fxa_token_exp_cache_timeout
     cache.set(cache_key, fxa_resp_data, cache_timeout)
 
-    return fxa_uid
+    return fxa_uid, fxa_token_exp_time
 
 
 class FxaTokenAuthentication(BaseAuthentication):
@@ -135,20 +238,36 @@ class FxaTokenAuthentication(BaseAuthentication):
             use_cache = False
             if method == "POST" and request.path == "/api/v1/relayaddresses/":
                 use_cache = True
-        fxa_uid = get_fxa_uid_from_oauth_token(token, use_cache)
-        try:
-            # MPP-3021: select_related user object to save DB query
-            sa = SocialAccount.objects.filter(
-                uid=fxa_uid, provider="fxa"
-            ).select_related("user")[0]
-        except IndexError:
-            raise PermissionDenied(
-                "Authenticated user does not have a Relay account."
-                " Have they accepted the terms?"
-            )
-        user = sa.user
+        cache_key = get_cache_key(token)
+        user = None
+        if use_cache:
+            user = self.get_locally_cached_user(cache_key)
+        if user is None:
+            try:
+                fxa_uid, expires_at = get_fxa_uid_and_expiration_from_oauth_token(
+                    token, use_cache, cache_key
+                )
+            except APIException:
+                # Forget a token that FxA no longer accepts
+                local_token_cache.delete(cache_key)
+                raise
+            try:
+                # MPP-3021: select_related user object to save DB query
+                sa = SocialAccount.objects.filter(
+                    uid=fxa_uid, provider="fxa"
+                ).select_related("user")[0]
+            except IndexError:
+                local_token_cache.delete(cache_key)
+                raise PermissionDenied(
+                    "Authenticated user does not have a Relay account."
+                    " Have they accepted the terms?"
+                )
+            user = sa.user
+            if user.is_active and expires_at is not None:
+                local_token_cache.set(cache_key, fxa_uid, user.id, expires_at)
 
         if not user.is_active:
+            local_token_cache.delete_user(user.id)
             raise PermissionDenied(
                 "Authenticated user does not have an active Relay account."
                 " Have they been deactivated?"
@@ -158,3 +277,18 @@ class FxaTokenAuthentication(BaseAuthentication):
             return (user, token)
         else:
             raise NotFound()
+
+    def get_locally_cached_user(self, cache_key: str) -> User | None:
+        """Return the user for a token in the per-process cache, or None."""
+        entry = local_token_cache.get(cache_key)
+        if entry is None:
+            incr_if_enabled("fxa_token_local_cache.miss")
+            return None
+        try:
+            user = User.objects.get(id=entry.user_id)
+        except User.DoesNotExist:
+            local_token_cache.delete_user(entry.user_id)
+            incr_if_enabled("fxa_token_local_cache.miss")
+            return None
+        incr_if_enabled("fxa_token_local_cache.hit")
+        return user
@@ -107,5 +107,13 @@ class DomainAddressSerializer(PremiumValidatorsMixin, serializers.ModelSerialize
         ]
 
 
+class MaskIdsSerializer(serializers.Serializer):
+    """The masks to change in a bulk update or delete."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, allow_empty=False
+    )
+
+
 class FirstForwardedEmailSerializer(serializers.Serializer):
     mask = serializers.EmailField(required=True)
@@ -0,0 +1,22 @@
+from typing import Any
+
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import local_token_cache
+
+
+@receiver(post_save, sender=User, dispatch_uid="api_evict_deactivated_user_tokens")
+def evict_deactivated_user_tokens(
+    sender: type[User], instance: User, created: bool, **kwargs: Any
+) -> None:
+    if not created and not instance.is_active:
+        local_token_cache.delete_user(instance.id)
+
+
+@receiver(post_delete, sender=User, dispatch_uid="api_evict_deleted_user_tokens")
+def evict_deleted_user_tokens(
+    sender: type[User], instance: User, **kwargs: Any
+) -> None:
+    local_token_cache.delete_user(instance.id)
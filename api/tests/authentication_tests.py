@@ -1,21 +1,31 @@
 from datetime import datetime
 from typing import NotRequired, TypedDict
 
+from django.contrib.auth.models import User
 from django.core.cache import cache
 from django.test import RequestFactory, TestCase
 
 import responses
 from allauth.socialaccount.models import SocialAccount
+from markus.testing import MetricsMock
 from model_bakery import baker
-from rest_framework.exceptions import APIException, AuthenticationFailed, NotFound
+from pytest_django.fixtures import SettingsWrapper
+from rest_framework.exceptions import (
+    APIException,
+    AuthenticationFailed,
+    NotFound,
+    PermissionDenied,
+)
 from rest_framework.test import APIClient
 
 from ..authentication import (
+    INTROSPECT_CACHE_KEY_PREFIX,
     INTROSPECT_TOKEN_URL,
     FxaTokenAuthentication,
     get_cache_key,
     get_fxa_uid_from_oauth_token,
     introspect_token,
+    local_token_cache,
 )
 
 MOCK_BASE = "api.authentication"
@@ -241,6 +251,46 @@ class AuthenticationMiscellaneous(TestCase):
             return
         self.fail("Should have raised AuthenticationFailed")
 
+    def test_get_cache_key_is_stable_keyed_digest(self) -> None:
+        token = "user-123"
+        cache_key = get_cache_key(token)
+        assert cache_key == get_cache_key(token)
+        assert cache_key != get_cache_key("user-456")
+        assert cache_key.startswith(INTROSPECT_CACHE_KEY_PREFIX)
+        assert token not in cache_key
+        with self.settings(SECRET_KEY="a-different-secret-key"):  # noqa: S106
+            assert get_cache_key(token) != cache_key
+
+    @responses.activate
+    def test_get_fxa_uid_from_oauth_token_without_cache_stores_negative_result(
+        self,
+    ) -> None:
+        fxa_response = _setup_fxa_response(200, {"active": False})
+        invalid_token = "inactive-123"
+
+        with self.assertRaises(AuthenticationFailed):
+            get_fxa_uid_from_oauth_token(invalid_token, use_cache=False)
+        assert cache.get(get_cache_key(invalid_token)) == fxa_response
+
+        # A cached read does not introspect the token again
+        with self.assertRaises(AuthenticationFailed):
+            get_fxa_uid_from_oauth_token(invalid_token)
+        assert responses.assert_call_count(self.fxa_verify_path, 1) is True
+
+    @responses.activate
+    def test_get_fxa_uid_from_oauth_token_emits_cache_metrics(self) -> None:
+        user_token = "user-123"
+        exp_time = (int(datetime.now().timestamp()) + 60 * 60) * 1000
+        _setup_fxa_response(200, {"active": True, "sub": self.uid, "exp": exp_time})
+
+        with self.settings(STATSD_ENABLED=True), MetricsMock() as mm:
+            get_fxa_uid_from_oauth_token(user_token)
+            get_fxa_uid_from_oauth_token(user_token)
+            get_fxa_uid_from_oauth_token(user_token, use_cache=False)
+        mm.assert_incr_once("fx.private.relay.fxa_token_cache.miss")
+        mm.assert_incr_once("fx.private.relay.fxa_token_cache.hit")
+        assert responses.assert_call_count(self.fxa_verify_path, 2) is True
+
 
 class FxaTokenAuthenticationTest(TestCase):
     def setUp(self) -> None:
@@ -457,3 +507,148 @@ class FxaTokenAuthenticationTest(TestCase):
         delete_addresses_req = self.factory.delete(self.path, headers=headers)
         auth_return = self.auth.authenticate(delete_addresses_req)
         assert responses.assert_call_count(self.fxa_verify_path, 4) is True
+
+
+class LocalTokenCacheTest(TestCase):
+    def setUp(self) -> None:
+        self.auth = FxaTokenAuthentication()
+        self.factory = RequestFactory()
+        self.path = "/api/v1/relayaddresses/"
+        self.uid = "relay-user-fxa-uid"
+        self.sa: SocialAccount = baker.make(SocialAccount, uid=self.uid, provider="fxa")
+        self.token = "user-123"
+        self.headers = {"Authorization": f"Bearer {self.token}"}
+        exp_time = (int(datetime.now().timestamp()) + 60 * 60) * 1000
+        _setup_fxa_response(200, {"active": True, "sub": self.uid, "exp": exp_time})
+
+    def tearDown(self) -> None:
+        cache.clear()
+
+    @responses.activate
+    def test_second_request_uses_local_cache(self) -> None:
+        request = self.factory.get(self.path, headers=self.headers)
+        assert self.auth.authenticate(request) == (self.sa.user, self.token)
+        assert len(local_token_cache) == 1
+
+        # The shared cache and SocialAccount are skipped, only the user is loaded
+        cache.clear()
+        with self.assertNumQueries(1):
+            assert self.auth.authenticate(request) == (self.sa.user, self.token)
+        assert responses.assert_call_count(INTROSPECT_TOKEN_URL, 1) is True
+        assert cache.get(get_cache_key(self.token)) is None
+
+    @responses.activate
+    def test_write_request_skips_local_cache(self) -> None:
+        request = self.factory.get(self.path, headers=self.headers)
+        self.auth.authenticate(request)
+
+        put_request = self.factory.put(self.path, headers=self.headers)
+        assert self.auth.authenticate(put_request) == (self.sa.user, self.token)
+        assert responses.assert_call_count(INTROSPECT_TOKEN_URL, 2) is True
+
+    @responses.activate
+    def test_deactivated_user_is_evicted(self) -> None:
+        request = self.factory.get(self.path, headers=self.headers)
+        self.auth.authenticate(request)
+        assert len(local_token_cache) == 1
+
+        self.sa.user.is_active = False
+        self.sa.user.save()
+        assert len(local_token_cache) == 0
+        with self.assertRaises(PermissionDenied):
+            self.auth.authenticate(request)
+
+    @responses.activate
+    def test_user_deactivated_in_other_process_is_rejected(self) -> None:
+        request = self.factory.get(self.path, headers=self.headers)
+        self.auth.authenticate(request)
+
+        # Update without signals, like a deactivation on another server
+        User.objects.filter(id=self.sa.user.id).update(is_active=False)
+        assert len(local_token_cache) == 1
+        with self.assertRaises(PermissionDenied):
+            self.auth.authenticate(request)
+        assert len(local_token_cache) == 0
+
+    @responses.activate
+    def test_deleted_user_is_evicted(self) -> None:
+        request = self.factory.get(self.path, headers=self.headers)
+        self.auth.authenticate(request)
+        assert len(local_token_cache) == 1
+
+        self.sa.user.delete()
+        assert len(local_token_cache) == 0
+        with self.assertRaises(PermissionDenied):
+            self.auth.authenticate(request)
+
+    @responses.activate
+    def test_revoked_token_is_evicted(self) -> None:
+        request = self.factory.get(self.path, headers=self.headers)
+        self.auth.authenticate(request)
+        assert len(local_token_cache) == 1
+
+        # FxA says the token is no longer active on the next write request
+        responses.replace(
+            responses.POST, INTROSPECT_TOKEN_URL, status=200, json={"active": False}
+        )
+        delete_request = self.factory.delete(self.path, headers=self.headers)
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate(delete_request)
+        assert len(local_token_cache) == 0
+
+        # A read request now gets the inactive response from the shared cache
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate(request)
+        assert responses.assert_call_count(INTROSPECT_TOKEN_URL, 2) is True
+
+    @responses.activate
+    def test_revoked_token_is_rejected_by_api(self) -> None:
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        assert client.get(self.path).status_code == 200
+
+        responses.replace(
+            responses.POST, INTROSPECT_TOKEN_URL, status=200, json={"active": False}
+        )
+        assert client.delete(f"{self.path}1/").status_code == 401
+        assert client.get(self.path).status_code == 401
+
+    @responses.activate
+    def test_token_for_removed_account_is_evicted(self) -> None:
+        request = self.factory.get(self.path, headers=self.headers)
+        self.auth.authenticate(request)
+        assert len(local_token_cache) == 1
+
+        self.sa.delete()
+        put_request = self.factory.put(self.path, headers=self.headers)
+        with self.assertRaises(PermissionDenied):
+            self.auth.authenticate(put_request)
+        assert len(local_token_cache) == 0
+
+    @responses.activate
+    def test_disabled_with_zero_size(self) -> None:
+        request = self.factory.get(self.path, headers=self.headers)
+        with self.settings(FXA_TOKEN_LOCAL_CACHE_SIZE=0):
+            self.auth.authenticate(request)
+        assert len(local_token_cache) == 0
+
+
+def test_local_token_cache_evicts_least_recently_used(
+    settings: SettingsWrapper,
+) -> None:
+    settings.FXA_TOKEN_LOCAL_CACHE_SIZE = 2
+    expires_at = int(datetime.now().timestamp()) + 60
+    local_token_cache.set("key1", "uid1", 1, expires_at)
+    local_token_cache.set("key2", "uid2", 2, expires_at)
+    assert local_token_cache.get("key1") is not None
+    local_token_cache.set("key3", "uid3", 3, expires_at)
+    assert local_token_cache.get("key1") is not None
+    assert local_token_cache.get("key2") is None
+    assert local_token_cache.get("key3") is not None
+
+
+def test_local_token_cache_expires_with_token() -> None:
+    expires_at = int(datetime.now().timestamp()) - 1
+    local_token_cache.set("key1", "uid1", 1, expires_at)
+    assert local_token_cache.get("key1") is None
+    assert len(local_token_cache) == 0
@@ -1,5 +1,7 @@
 """Shared fixtures for API tests."""
 
+from collections.abc import Iterator
+
 from django.contrib.auth.models import User
 from django.contrib.sites.models import Site
 
@@ -8,9 +10,18 @@ from allauth.socialaccount.models import SocialApp
 from model_bakery import baker
 from rest_framework.test import APIClient
 
+from api.authentication import local_token_cache
 from privaterelay.tests.utils import make_free_test_user, make_premium_test_user
 
 
+@pytest.fixture(autouse=True)
+def clear_local_token_cache() -> Iterator[None]:
+    """Start and end each test with an empty per-process token cache."""
+    local_token_cache.clear()
+    yield
+    local_token_cache.clear()
+
+
 @pytest.fixture
 def free_user(db: None) -> User:
     return make_free_test_user()
@@ -467,6 +467,196 @@ def test_post_relayaddress_with_generated_for_success(
     assert event == expected_event
 
 
+def test_post_relayaddress_bulk_success(
+    premium_user: User, prem_api_client: APIClient, caplog: pytest.LogCaptureFixture
+) -> None:
+    """A user can create several random masks in one request."""
+    response = prem_api_client.post(
+        reverse("relayaddress-bulk"),
+        data=[{}, {"description": "Shopping", "block_list_emails": True}, {}],
+        format="json",
+    )
+
+    assert response.status_code == 201
+    ret_data = response.json()
+    assert len(ret_data) == 3
+    assert len({mask["address"] for mask in ret_data}) == 3
+    assert ret_data[1]["description"] == "Shopping"
+    assert ret_data[1]["block_list_emails"]
+    assert RelayAddress.objects.filter(user=premium_user).count() == 3
+    abuse_metrics = premium_user.abusemetrics_set.get()
+    assert abuse_metrics.num_address_created_per_day == 3
+    events = [
+        record for record in caplog.records if record.name == "glean-server-event"
+    ]
+    assert len(events) == 3
+
+
+def test_post_relayaddress_bulk_free_mask_limit_error(
+    settings: SettingsWrapper, free_user: User, free_api_client: APIClient
+) -> None:
+    """A free user can not create masks past the limit, even in a bulk request."""
+    baker.make(RelayAddress, user=free_user)
+
+    response = free_api_client.post(
+        reverse("relayaddress-bulk"),
+        data=[{}] * settings.MAX_NUM_FREE_ALIASES,
+        format="json",
+    )
+
+    assert response.status_code == 403
+    assert response.json()["error_code"] == "free_tier_limit"
+    assert RelayAddress.objects.filter(user=free_user).count() == 1
+
+
+def test_post_relayaddress_bulk_too_many_error(
+    settings: SettingsWrapper, premium_user: User, prem_api_client: APIClient
+) -> None:
+    """A bulk request is limited to MAX_BULK_CREATE_MASKS masks."""
+    settings.MAX_BULK_CREATE_MASKS = 2
+    response = prem_api_client.post(
+        reverse("relayaddress-bulk"), data=[{}, {}, {}], format="json"
+    )
+    assert response.status_code == 400
+    assert not RelayAddress.objects.filter(user=premium_user).exists()
+
+
+def test_post_relayaddress_bulk_empty_error(
+    premium_user: User, prem_api_client: APIClient
+) -> None:
+    """A bulk request must have at least one mask."""
+    response = prem_api_client.post(
+        reverse("relayaddress-bulk"), data=[], format="json"
+    )
+    assert response.status_code == 400
+    assert not RelayAddress.objects.filter(user=premium_user).exists()
+
+
+def test_patch_relayaddress_bulk_by_ids(
+    free_user: User, free_api_client: APIClient, caplog: pytest.LogCaptureFixture
+) -> None:
+    """A user can change several masks, selected by ID, in one request."""
+    masks = [RelayAddress.objects.create(user=free_user) for _ in range(3)]
+    other_mask = baker.make(RelayAddress)
+
+    response = free_api_client.patch(
+        reverse("relayaddress-bulk"),
+        data={
+            "ids": [masks[0].id, masks[1].id, other_mask.id],
+            "enabled": False,
+            "description": "Old accounts",
+        },
+        format="json",
+    )
+
+    assert response.status_code == 200
+    ret_data = response.json()
+    assert [mask["id"] for mask in ret_data] == [masks[0].id, masks[1].id]
+    assert all(not mask["enabled"] for mask in ret_data)
+    assert list(
+        RelayAddress.objects.filter(enabled=False).values_list("id", flat=True)
+    ) == [masks[0].id, masks[1].id]
+    assert RelayAddress.objects.get(id=masks[0].id).description == "Old accounts"
+    events = [
+        record for record in caplog.records if record.name == "glean-server-event"
+    ]
+    assert len(events) == 2
+
+
+def test_patch_relayaddress_bulk_by_filter(
+    free_user: User, free_api_client: APIClient
+) -> None:
+    """A user can change several masks, selected by a filter, in one request."""
+    enabled = RelayAddress.objects.create(user=free_user)
+    disabled = RelayAddress.objects.create(user=free_user, enabled=False)
+
+    response = free_api_client.patch(
+        reverse("relayaddress-bulk") + "?enabled=false",
+        data={"enabled": True},
+        format="json",
+    )
+
+    assert response.status_code == 200
+    assert [mask["id"] for mask in response.json()] == [disabled.id]
+    assert RelayAddress.objects.filter(id=disabled.id, enabled=True).exists()
+    assert RelayAddress.objects.filter(id=enabled.id, enabled=True).exists()
+
+
+def test_patch_relayaddress_bulk_requires_ids_or_filter(
+    free_user: User, free_api_client: APIClient
+) -> None:
+    """A bulk change without IDs or a filter is rejected."""
+    mask = RelayAddress.objects.create(user=free_user)
+
+    response = free_api_client.patch(
+        reverse("relayaddress-bulk") + "?unknown=1",
+        data={"enabled": False},
+        format="json",
+    )
+
+    assert response.status_code == 400
+    assert RelayAddress.objects.get(id=mask.id).enabled
+
+
+def test_delete_relayaddress_bulk(
+    free_user: User, free_api_client: APIClient, caplog: pytest.LogCaptureFixture
+) -> None:
+    """A user can delete several masks in one request."""
+    masks = [
+        RelayAddress.objects.create(user=free_user, num_forwarded=2, num_blocked=1)
+        for _ in range(3)
+    ]
+    other_mask = baker.make(RelayAddress)
+
+    response = free_api_client.delete(
+        reverse("relayaddress-bulk"),
+        data={"ids": [masks[0].id, masks[1].id, other_mask.id]},
+        format="json",
+    )
+
+    assert response.status_code == 204
+    assert list(
+        RelayAddress.objects.filter(user=free_user).values_list("id", flat=True)
+    ) == [masks[2].id]
+    assert RelayAddress.objects.filter(id=other_mask.id).exists()
+    profile = free_user.profile
+    profile.refresh_from_db()
+    assert profile.num_address_deleted == 2
+    assert profile.num_deleted_relay_addresses == 2
+    assert profile.num_email_forwarded_in_deleted_address == 4
+    assert profile.num_email_blocked_in_deleted_address == 2
+    events = [
+        record for record in caplog.records if record.name == "glean-server-event"
+    ]
+    assert len(events) == 2
+
+
+def test_delete_domainaddress_bulk_by_filter(
+    premium_user: User, prem_api_client: APIClient
+) -> None:
+    """A user can delete the domain masks that match a filter."""
+    disabled = DomainAddress.objects.create(
+        user=premium_user, address="old-mask", enabled=False
+    )
+    enabled = DomainAddress.objects.create(user=premium_user, address="new-mask")
+
+    response = prem_api_client.delete(reverse("domainaddress-bulk") + "?enabled=false")
+
+    assert response.status_code == 204
+    assert not DomainAddress.objects.filter(id=disabled.id).exists()
+    assert DomainAddress.objects.filter(id=enabled.id).exists()
+    premium_user.profile.refresh_from_db()
+    assert premium_user.profile.num_deleted_domain_addresses == 1
+
+
+def test_post_domainaddress_bulk_not_allowed(prem_api_client: APIClient) -> None:
+    """Domain masks can not be created in bulk."""
+    response = prem_api_client.post(
+        reverse("domainaddress-bulk"), data=[{}], format="json"
+    )
+    assert response.status_code == 405
+
+
 def test_post_relayaddress_free_mask_email_limit_error(
     settings: SettingsWrapper,
     free_user: User,
@@ -13,12 +13,20 @@ from django.template.loader import render_to_string
 import django_ftl
 from django_filters import rest_framework as filters
 from drf_spectacular.utils import OpenApiResponse, extend_schema
-from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from rest_framework.decorators import (
+    action,
+    api_view,
+    permission_classes,
+    throttle_classes,
+)
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.serializers import BaseSerializer
 from rest_framework.status import (
     HTTP_201_CREATED,
+    HTTP_204_NO_CONTENT,
     HTTP_400_BAD_REQUEST,
     HTTP_404_NOT_FOUND,
 )
@@ -27,7 +35,7 @@ from rest_framework.viewsets import ModelViewSet
 from waffle import flag_is_active
 
 from emails.apps import EmailsConfig
-from emails.models import DomainAddress, RelayAddress
+from emails.models import DomainAddress, RelayAddress, delete_masks, update_masks
 from emails.utils import generate_from_header, ses_message_props
 from emails.views import _get_address, wrap_html_email
 from privaterelay.ftl_bundles import main as ftl_bundle
@@ -37,6 +45,7 @@ from ..permissions import IsOwner
 from ..serializers.emails import (
     DomainAddressSerializer,
     FirstForwardedEmailSerializer,
+    MaskIdsSerializer,
     RelayAddressSerializer,
 )
 from . import SaveToRequestUser
@@ -103,6 +112,62 @@ class AddressViewSet(Generic[_Address], SaveToRequestUser, ModelViewSet):
             is_random_mask=is_random_mask,
         )
 
+    def get_bulk_queryset(self) -> QuerySet[_Address]:
+        """
+        Return the masks for a bulk update or delete.
+
+        The masks are selected by a list of IDs in the request body, or by the
+        same filter query parameters as listing the masks.
+        """
+        ids_serializer = MaskIdsSerializer(data=self.request.data)
+        ids_serializer.is_valid(raise_exception=True)
+        queryset = self.filter_queryset(self.get_queryset())
+        if (ids := ids_serializer.validated_data.get("ids")) is not None:
+            return queryset.filter(id__in=ids)
+        filterset_class = getattr(self, "filterset_class")
+        if not set(self.request.query_params) & set(filterset_class.base_filters):
+            raise ValidationError({"ids": "A list of IDs or a filter is required."})
+        return queryset
+
+    def update_bulk_masks(self, request: Request) -> Response:
+        """Change the masks selected by get_bulk_queryset, for a bulk update."""
+        if not isinstance(request.user, User):
+            raise TypeError("request.user must be type User")
+        mask_ids = list(self.get_bulk_queryset().values_list("id", flat=True))
+        serializer = self.get_serializer(data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        changes = dict(serializer.validated_data)
+        # A mask address can not be changed
+        changes.pop("address", None)
+        masks = self.get_queryset().filter(id__in=mask_ids)
+        old_descriptions = dict(masks.values_list("id", "description"))
+        if changes:
+            update_masks(request.user, masks, changes)
+        updated_masks = list(masks.order_by("id"))
+        glean_logger().log_email_masks_label_updated(
+            request=request,
+            masks=[
+                mask
+                for mask in updated_masks
+                if mask.description != old_descriptions[mask.id]
+            ],
+        )
+        return Response(self.get_serializer(updated_masks, many=True).data)
+
+    def destroy_bulk_masks(self, request: Request) -> Response:
+        """Delete the masks selected by get_bulk_queryset, for a bulk delete."""
+        if not isinstance(request.user, User):
+            raise TypeError("request.user must be type User")
+        masks = list(self.get_bulk_queryset())
+        delete_masks(request.user, masks)
+        glean_logger().log_email_mask_deleted(
+            request=request,
+            user=request.user,
+            is_random_mask=self.get_queryset().model is RelayAddress,
+            count=len(masks),
+        )
+        return Response(status=HTTP_204_NO_CONTENT)
+
 
 @extend_schema(tags=["emails"])
 class RelayAddressViewSet(AddressViewSet[RelayAddress]):
@@ -117,6 +182,58 @@ class RelayAddressViewSet(AddressViewSet[RelayAddress]):
             return RelayAddress.objects.filter(user=self.request.user)
         return RelayAddress.objects.none()
 
+    @action(detail=False, methods=["patch"], url_path="bulk", url_name="bulk")
+    def bulk_update(self, request: Request) -> Response:
+        """
+        Change the same fields on several masks.
+
+        The request has the mask fields to change, and a list of mask IDs in "ids",
+        or filter query parameters.
+        """
+        return self.update_bulk_masks(request)
+
+    @extend_schema(responses={204: OpenApiResponse(description="Masks deleted.")})
+    @bulk_update.mapping.delete
+    def bulk_destroy(self, request: Request) -> Response:
+        """
+        Delete several masks.
+
+        The masks are selected by a list of mask IDs in "ids", or by filter query
+        parameters.
+        """
+        return self.destroy_bulk_masks(request)
+
+    @extend_schema(
+        request=RelayAddressSerializer(many=True),
+        responses={201: RelayAddressSerializer(many=True)},
+    )
+    @bulk_update.mapping.post
+    def bulk_create(self, request: Request) -> Response:
+        """
+        Create several masks with random addresses in one request.
+
+        The request is a list of masks, with the same fields as creating one mask.
+        All of the masks are created, or none if there is an error.
+        """
+        serializer = self.get_serializer(
+            data=request.data,
+            many=True,
+            allow_empty=False,
+            max_length=settings.MAX_BULK_CREATE_MASKS,
+        )
+        serializer.is_valid(raise_exception=True)
+        if not isinstance(request.user, User):
+            raise TypeError("request.user must be type User")
+        masks = RelayAddress.make_relay_addresses(
+            request.user, serializer.validated_data
+        )
+        glean_logger().log_email_masks_created(
+            request=request, masks=masks, created_by_api=True
+        )
+        return Response(
+            self.get_serializer(masks, many=True).data, status=HTTP_201_CREATED
+        )
+
 
 class DomainAddressFilter(filters.FilterSet):
     used_on = filters.CharFilter(field_name="used_on", lookup_expr="icontains")
@@ -154,6 +271,27 @@ class DomainAddressViewSet(AddressViewSet[DomainAddress]):
             return DomainAddress.objects.filter(user=self.request.user)
         return DomainAddress.objects.none()
 
+    @action(detail=False, methods=["patch"], url_path="bulk", url_name="bulk")
+    def bulk_update(self, request: Request) -> Response:
+        """
+        Change the same fields on several masks.
+
+        The request has the mask fields to change, and a list of mask IDs in "ids",
+        or filter query parameters.
+        """
+        return self.update_bulk_masks(request)
+
+    @extend_schema(responses={204: OpenApiResponse(description="Masks deleted.")})
+    @bulk_update.mapping.delete
+    def bulk_destroy(self, request: Request) -> Response:
+        """
+        Delete several masks.
+
+        The masks are selected by a list of mask IDs in "ids", or by filter query
+        parameters.
+        """
+        return self.destroy_bulk_masks(request)
+
 
 class FirstForwardedEmailRateThrottle(UserRateThrottle):
     rate = settings.FIRST_EMAIL_RATE_LIMIT
@@ -34,7 +34,7 @@ from waffle import get_waffle_flag_model
 from waffle.models import Sample, Switch
 
 from emails.utils import incr_if_enabled
-from privaterelay.models import Profile
+from privaterelay.models import Profile, with_mask_stats
 from privaterelay.plans import (
     get_bundle_country_language_mapping,
     get_phone_country_language_mapping,
@@ -94,7 +94,7 @@ class ProfileViewSet(ModelViewSet):
 
     def get_queryset(self) -> QuerySet[Profile]:
         if isinstance(self.request.user, User):
-            return Profile.objects.filter(user=self.request.user)
+            return with_mask_stats(Profile.objects.filter(user=self.request.user))
         return Profile.objects.none()
 
 
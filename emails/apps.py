@@ -1,6 +1,6 @@
 import logging
 import os
-from typing import NamedTuple
+from dataclasses import dataclass
 
 from django.apps import AppConfig, apps
 from django.conf import settings
@@ -10,16 +10,24 @@ import boto3
 from botocore.config import Config
 from mypy_boto3_ses.client import SESClient
 
+from .term_matcher import TermMatcher
+
 logger = logging.getLogger("events")
 
 
 # Bad words are split into short and long words
-class BadWords(NamedTuple):
+@dataclass
+class BadWords:
     # Short words are 4 or less characters. A hit is an exact match to a short word
     short: set[str]
     # Long words are 5 or more characters. A hit contains a long word.
     long: list[str]
 
+    @cached_property
+    def long_matcher(self) -> TermMatcher:
+        """Find long words in a value in one pass, instead of one per word."""
+        return TermMatcher(self.long)
+
 
 class EmailsConfig(AppConfig):
     name = "emails"
@@ -48,19 +56,21 @@ class EmailsConfig(AppConfig):
         except Exception:
             logger.exception("exception during S3 connect")
 
-    def __init__(self, app_name, app_module):
-        super().__init__(app_name, app_module)
-
+    @cached_property
+    def badwords(self) -> BadWords:
         # badwords file from:
         # https://www.cs.cmu.edu/~biglou/resources/bad-words.txt
         # Using `.text` extension because of
         # https://github.com/dependabot/dependabot-core/issues/1657
         _badwords = self._load_terms("badwords.text")
-        self.badwords = BadWords(
+        return BadWords(
             short=set(word for word in _badwords if len(word) <= 4),
             long=sorted(set(word for word in _badwords if len(word) > 4)),
         )
-        self.blocklist = set(self._load_terms("blocklist.text"))
+
+    @cached_property
+    def blocklist(self) -> set[str]:
+        return set(self._load_terms("blocklist.text"))
 
     def _load_terms(self, filename: str) -> list[str]:
         """Load a list of terms from a file."""
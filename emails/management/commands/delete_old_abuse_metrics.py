@@ -0,0 +1,38 @@
+from datetime import UTC, datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from privaterelay.retention import delete_in_chunks, old_abuse_metrics_before
+
+
+def delete_old_abuse_metrics(before: datetime, batch_size: int) -> int:
+    """
+    Delete AbuseMetrics rows first recorded before a date, in batches.
+
+    Each batch is a short delete of an ID range, so the table is not locked while
+    emails are being forwarded. Return is the number of deleted rows.
+    """
+    return delete_in_chunks(old_abuse_metrics_before(before), batch_size)
+
+
+class Command(BaseCommand):
+    help = "Deletes AbuseMetrics records from before today (UTC)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of records to delete per query.",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+        midnight_utc_today = datetime.combine(
+            datetime.now(UTC).date(), datetime.min.time()
+        ).replace(tzinfo=UTC)
+        deleted = delete_old_abuse_metrics(midnight_utc_today, options["batch_size"])
+        self.stdout.write(
+            f"Deleted {deleted} abuse metric records older than {midnight_utc_today}"
+        )
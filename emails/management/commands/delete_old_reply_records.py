@@ -1,9 +1,12 @@
 from datetime import UTC, datetime, timedelta
 
-from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.core.management.base import BaseCommand, CommandError
 
-from ...models import Reply
+from privaterelay.retention import (
+    DELETE_CHUNK_SIZE,
+    delete_in_chunks,
+    old_replies_before,
+)
 
 
 class Command(BaseCommand):
@@ -11,13 +14,18 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("days_old", nargs=1, type=int)
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DELETE_CHUNK_SIZE,
+            help="Number of records to delete per query.",
+        )
 
     def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be at least 1")
         delete_date = datetime.now(UTC) - timedelta(options["days_old"][0])
-        replies_to_delete = Reply.objects.filter(created_at__lt=delete_date).only("id")
-        print(
-            f"Deleting {len(replies_to_delete)} reply records "
-            f"older than {delete_date}"
+        deleted = delete_in_chunks(
+            old_replies_before(delete_date), options["chunk_size"]
         )
-        with transaction.atomic():
-            replies_to_delete.delete()
+        self.stdout.write(f"Deleted {deleted} reply records older than {delete_date}")
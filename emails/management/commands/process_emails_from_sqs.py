@@ -37,6 +37,7 @@ from emails.management.command_from_django_settings import (
     CommandFromDjangoSettings,
     SettingToLocal,
 )
+from emails.management.worker_pool import TaskResult, WorkerPool
 from emails.sns import verify_from_sns
 from emails.utils import gauge_if_enabled, incr_if_enabled
 from emails.views import _sns_inbound_logic, validate_sns_arn_and_type
@@ -93,6 +94,25 @@ class Command(CommandFromDjangoSettings):
             "Maximum time to process a message before cancelling.",
             lambda max_seconds: max_seconds > 0.0,
         ),
+        SettingToLocal(
+            "PROCESS_EMAIL_WORKERS",
+            "workers",
+            (
+                "Number of long-lived worker processes, or 0 to start a new"
+                " process for each message."
+            ),
+            lambda workers: workers >= 0,
+        ),
+        SettingToLocal(
+            "PROCESS_EMAIL_CONCURRENCY",
+            "concurrency",
+            (
+                "Maximum number of messages in progress at once, or 0 to finish"
+                " each batch before polling for the next. If PROCESS_EMAIL_WORKERS"
+                " is 0, this many worker processes are started."
+            ),
+            lambda concurrency: concurrency >= 0,
+        ),
         SettingToLocal(
             "AWS_REGION",
             "aws_region",
@@ -121,6 +141,8 @@ class Command(CommandFromDjangoSettings):
     delete_failed_messages: bool
     max_seconds: float | None
     max_seconds_per_message: float
+    workers: int
+    concurrency: int
     aws_region: str
     sqs_url: str
     verbosity: int
@@ -139,6 +161,8 @@ class Command(CommandFromDjangoSettings):
                 "delete_failed_messages": self.delete_failed_messages,
                 "max_seconds": self.max_seconds,
                 "max_seconds_per_message": self.max_seconds_per_message,
+                "workers": self.workers,
+                "concurrency": self.concurrency,
                 "aws_region": self.aws_region,
                 "sqs_url": self.sqs_url,
                 "verbosity": self.verbosity,
@@ -150,7 +174,13 @@ class Command(CommandFromDjangoSettings):
         except ClientError as e:
             raise CommandError("Unable to connect to SQS") from e
 
-        process_data = self.process_queue()
+        if self.workers or self.concurrency:
+            self.start_worker_pool()
+        try:
+            process_data = self.process_queue()
+        finally:
+            if self.worker_pool:
+                self.worker_pool.close()
         logger.info("Exiting process_emails_from_sqs", extra=process_data)
 
     def init_locals(self) -> None:
@@ -165,6 +195,8 @@ class Command(CommandFromDjangoSettings):
         self.queue_count: int = 0
         self.queue_count_delayed: int = 0
         self.queue_count_not_visible: int = 0
+        self.worker_pool: WorkerPool | None = None
+        self.in_progress: dict[int, tuple[SQSMessage, dict[str, Any]]] = {}
 
     def create_client(self) -> SQSQueue:
         """Create the SQS client."""
@@ -175,6 +207,25 @@ class Command(CommandFromDjangoSettings):
         sqs_client = boto3.resource("sqs", region_name=self.aws_region)
         return sqs_client.Queue(self.sqs_url)
 
+    def start_worker_pool(self) -> None:
+        """Start the long-lived worker processes."""
+        worker_count = self.workers or self.concurrency
+        with Timer(logger=None) as setup_timer:
+            self.worker_pool = WorkerPool(
+                worker_count,
+                run_sns_inbound_logic,
+                initializer=setup,
+                task_timeout=self.max_seconds_per_message,
+            )
+            self.worker_pool.start()
+        logger.info(
+            "Started worker processes",
+            extra={
+                "workers": worker_count,
+                "workers_start_s": round(setup_timer.last, 3),
+            },
+        )
+
     def process_queue(self) -> dict[str, Any]:
         """
         Process the SQS email queue until an exit condition is reached.
@@ -243,6 +294,10 @@ class Command(CommandFromDjangoSettings):
                 self.halt_requested = True
                 exit_on = "interrupt"
 
+        if self.in_progress:
+            drain_data = self.finish_in_progress(wait_for_all=True)
+            self.failed_messages += int(drain_data.get("failed_count", 0))
+
         process_data = {
             "exit_on": exit_on,
             "cycles": self.cycles,
@@ -304,17 +359,28 @@ class Command(CommandFromDjangoSettings):
     ) -> tuple[list[SQSMessage], dict[str, float | int]]:
         """Request a batch of messages, using the long-poll method.
 
+        If messages are still in progress, the batch is limited to the room left
+        under the concurrency limit, and the poll returns within a second.
+
         Return is a tuple:
         * message_batch: a list of messages, which may be empty
         * data: A dict suitable for logging context, with these keys:
             - message_count: the number of messages
             - sqs_poll_s: The poll time, in seconds with millisecond precision
         """
+        max_messages = self.batch_size
+        wait_seconds = self.wait_seconds
+        if self.concurrency:
+            # Only fetch messages that fit in the window
+            max_messages = min(max_messages, self.concurrency - len(self.in_progress))
+        if self.in_progress:
+            # Return quickly to collect results from the worker processes
+            wait_seconds = min(wait_seconds, 1)
         with Timer(logger=None) as poll_timer:
             message_batch = self.queue.receive_messages(
-                MaxNumberOfMessages=self.batch_size,
+                MaxNumberOfMessages=max_messages,
                 VisibilityTimeout=self.visibility_seconds,
-                WaitTimeSeconds=self.wait_seconds,
+                WaitTimeSeconds=wait_seconds,
             )
         return (
             message_batch,
@@ -339,12 +405,15 @@ class Command(CommandFromDjangoSettings):
 
         Times are in seconds, with millisecond precision
         """
+        if self.worker_pool:
+            return self.process_message_batch_with_workers(message_batch)
         if not message_batch:
             return {}
         failed_count = 0
         pause_time = 0.0
         pause_count = 0
         process_time = 0.0
+        to_delete: list[SQSMessage] = []
         for message in message_batch:
             self.write_healthcheck()
             with Timer(logger=None) as message_timer:
@@ -352,13 +421,14 @@ class Command(CommandFromDjangoSettings):
                 if not message_data["success"]:
                     failed_count += 1
                 if message_data["success"] or self.delete_failed_messages:
-                    message.delete()
+                    to_delete.append(message)
                 pause_time += message_data.get("pause_s", 0.0)
                 pause_count += message_data.get("pause_count", 0)
 
             message_data["message_process_time_s"] = round(message_timer.last, 3)
             process_time += message_timer.last
             logger.log(logging.INFO, "Message processed", extra=message_data)
+        self.delete_messages(to_delete)
 
         batch_data = {"process_s": round((process_time - pause_time), 3)}
         if pause_count:
@@ -368,20 +438,129 @@ class Command(CommandFromDjangoSettings):
             batch_data["failed_count"] = failed_count
         return batch_data
 
-    def process_message(self, message: SQSMessage) -> dict[str, Any]:
+    def process_message_batch_with_workers(
+        self, message_batch: list[SQSMessage]
+    ) -> dict[str, Any]:
         """
-        Process an SQS message, which may include sending an email.
+        Add a batch of messages to the worker processes, and collect results.
+
+        If concurrency is 0, this waits for all messages to complete. Otherwise,
+        it returns when there is room for at least one more message in progress,
+        so that the next batch can be polled while this one finishes.
+
+        Arguments:
+        * messages - a list of SQS messages, possibly empty
 
         Return is a dict suitable for logging context, with these keys:
-        * success: True if message was processed successfully
-        * error: The processing error, omitted on success
-        * message_body_quoted: Set if the message was non-JSON, omitted for valid JSON
-        * pause_count: Set to 1 if paused due to temporary error, or omitted
-          with no error
-        * pause_s: The pause in seconds (ms precision) for temp error, or omitted
-        * pause_error: The temporary error, or omitted if no temp error
-        * client_error_code: The error code for non-temp or retry error,
-          omitted on success
+        * in_progress_count: How many messages are still being processed,
+          omitted if 0
+        * process_s: How long collecting results took, omitted if no messages
+        * failed_count: How many messages failed to process, omitted if 0
+
+        Times are in seconds, with millisecond precision
+        """
+        if self.worker_pool is None:
+            raise ValueError("self.worker_pool must be set.")
+        if not (message_batch or self.in_progress):
+            return {}
+        failed_count = 0
+        to_delete: list[SQSMessage] = []
+        for message in message_batch:
+            results, task_args = self.prepare_message(message)
+            if task_args is None:
+                if not self.finish_message(message, results, to_delete):
+                    failed_count += 1
+            else:
+                task_id = self.worker_pool.submit(*task_args)
+                self.in_progress[task_id] = (message, results)
+        self.delete_messages(to_delete)
+
+        batch_data = self.finish_in_progress(wait_for_all=not self.concurrency)
+        failed_count += batch_data.pop("failed_count", 0)
+        if failed_count:
+            batch_data["failed_count"] = failed_count
+        if self.in_progress:
+            batch_data["in_progress_count"] = len(self.in_progress)
+        return batch_data
+
+    def finish_in_progress(self, wait_for_all: bool) -> dict[str, Any]:
+        """
+        Collect results from the worker processes, and delete completed messages.
+
+        If wait_for_all is False, wait until there is room for another message
+        under the concurrency limit, then collect any other finished messages.
+
+        Return is a dict suitable for logging context, with these keys:
+        * process_s: How long collecting results took
+        * failed_count: How many messages failed to process, omitted if 0
+        """
+        if self.worker_pool is None:
+            raise ValueError("self.worker_pool must be set.")
+        limit = 0 if wait_for_all else self.concurrency - 1
+        failed_count = 0
+        to_delete: list[SQSMessage] = []
+        with Timer(logger=None) as collect_timer:
+            while self.in_progress:
+                self.write_healthcheck()
+                over_limit = len(self.in_progress) > limit
+                for task_result in self.worker_pool.wait(1.0 if over_limit else 0.0):
+                    message, results = self.in_progress.pop(task_result.task_id)
+                    self.record_task_result(results, task_result)
+                    if not self.finish_message(message, results, to_delete):
+                        failed_count += 1
+                if not over_limit:
+                    break
+            self.delete_messages(to_delete)
+
+        data: dict[str, Any] = {"process_s": round(collect_timer.last, 3)}
+        if failed_count:
+            data["failed_count"] = failed_count
+        return data
+
+    def finish_message(
+        self,
+        message: SQSMessage,
+        results: dict[str, Any],
+        to_delete: list[SQSMessage],
+    ) -> bool:
+        """Log the message results, add to to_delete if done, return True if success"""
+        success = bool(results["success"])
+        if success or self.delete_failed_messages:
+            to_delete.append(message)
+        logger.log(logging.INFO, "Message processed", extra=results)
+        return success
+
+    def delete_messages(self, messages: list[SQSMessage]) -> None:
+        """Delete processed messages from the queue, up to 10 per request."""
+        for start in range(0, len(messages), 10):
+            chunk = messages[start : start + 10]
+            response = self.queue.delete_messages(
+                Entries=[
+                    {"Id": str(num), "ReceiptHandle": message.receipt_handle}
+                    for num, message in enumerate(chunk)
+                ]
+            )
+            for failure in response.get("Failed", []):
+                message = chunk[int(failure["Id"])]
+                logger.error(
+                    "Failed to delete message",
+                    extra={
+                        "sqs_message_id": message.message_id,
+                        "code": failure["Code"],
+                        "error": failure.get("Message", ""),
+                    },
+                )
+
+    def prepare_message(
+        self, message: SQSMessage
+    ) -> tuple[dict[str, Any], tuple[str, str, Any] | None]:
+        """
+        Parse, verify, and validate an SQS message.
+
+        Return is a tuple:
+        * results: a dict suitable for logging context, see process_message
+        * task_args: arguments for run_sns_inbound_logic, or None if the
+          message failed and should not be processed
         """
         incr_if_enabled("process_message_from_sqs", 1)
         results = {"success": True, "sqs_message_id": message.message_id}
@@ -392,14 +571,14 @@ class Command(CommandFromDjangoSettings):
             results["success"] = False
             results["error"] = f"Failed to load message.body: {e}"
             results["message_body_quoted"] = shlex.quote(raw_body)
-            return results
+            return results, None
         try:
             verified_json_body = verify_from_sns(json_body)
         except (KeyError, OpenSSL.crypto.Error) as e:
             logger.error("Failed SNS verification", extra={"error": str(e)})
             results["success"] = False
             results["error"] = f"Failed SNS verification: {e}"
-            return results
+            return results, None
 
         topic_arn = verified_json_body["TopicArn"]
         message_type = verified_json_body["Type"]
@@ -407,6 +586,56 @@ class Command(CommandFromDjangoSettings):
         if error_details:
             results["success"] = False
             results.update(error_details)
+            return results, None
+        return results, (topic_arn, message_type, verified_json_body)
+
+    def record_error(self, results: dict[str, Any], exc_info: BaseException) -> None:
+        """Record an exception raised by _sns_inbound_logic"""
+        capture_exception(exc_info)
+        results["success"] = False
+        if isinstance(exc_info, ClientError):
+            incr_if_enabled("message_from_sqs_error")
+            err = exc_info.response["Error"]
+            logger.error("sqs_client_error", extra=err)
+            results["error"] = err
+            results["client_error_code"] = err["Code"].lower()
+        else:
+            incr_if_enabled("email_processing_failure")
+            results["error"] = str(exc_info)
+            results["error_type"] = type(exc_info).__name__
+
+    def record_task_result(
+        self, results: dict[str, Any], task_result: TaskResult
+    ) -> None:
+        """Record the outcome of running a message in a worker process."""
+        results["message_process_time_s"] = round(task_result.duration_s, 3)
+        results["message_queued_time_s"] = round(task_result.queued_s, 3)
+        results["worker_id"] = task_result.worker_id
+        if task_result.timed_out:
+            incr_if_enabled("email_processing_timeout")
+            error = f"Timed out after {self.max_seconds_per_message:0.1f} seconds."
+            results["success"] = False
+            results["error"] = error
+        elif task_result.error is not None:
+            self.record_error(results, task_result.error)
+
+    def process_message(self, message: SQSMessage) -> dict[str, Any]:
+        """
+        Process an SQS message, which may include sending an email.
+
+        Return is a dict suitable for logging context, with these keys:
+        * success: True if message was processed successfully
+        * error: The processing error, omitted on success
+        * message_body_quoted: Set if the message was non-JSON, omitted for valid JSON
+        * pause_count: Set to 1 if paused due to temporary error, or omitted
+          with no error
+        * pause_s: The pause in seconds (ms precision) for temp error, or omitted
+        * pause_error: The temporary error, or omitted if no temp error
+        * client_error_code: The error code for non-temp or retry error,
+          omitted on success
+        """
+        results, task_args = self.prepare_message(message)
+        if task_args is None:
             return results
 
         def success_callback(result: HttpResponse) -> None:
@@ -416,28 +645,18 @@ class Command(CommandFromDjangoSettings):
 
         def error_callback(exc_info: BaseException) -> None:
             """Handle exception raised by _sns_inbound_logic"""
-            capture_exception(exc_info)
-            results["success"] = False
-            if isinstance(exc_info, ClientError):
-                incr_if_enabled("message_from_sqs_error")
-                err = exc_info.response["Error"]
-                logger.error("sqs_client_error", extra=err)
-                results["error"] = err
-                results["client_error_code"] = err["Code"].lower()
-            else:
-                incr_if_enabled("email_processing_failure")
-                results["error"] = str(exc_info)
-                results["error_type"] = type(exc_info).__name__
+            self.record_error(results, exc_info)
 
         # Run in a multiprocessing Pool
         # This will start a subprocess, which needs to run django.setup
         # The benefit is that the subprocess can be terminated
         # The penalty is that is is slower to start
+        # Set PROCESS_EMAIL_WORKERS to use long-lived worker processes instead
         pool_start_time = time.monotonic()
         with Pool(1, initializer=setup) as pool:
             future = pool.apply_async(
                 run_sns_inbound_logic,
-                [topic_arn, message_type, verified_json_body],
+                task_args,
                 callback=success_callback,
                 error_callback=error_callback,
             )
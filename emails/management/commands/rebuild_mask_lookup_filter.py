@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...mask_filter import configured_bloom_filter, get_mask_lookup_filter
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the Redis filters of mask addresses and deleted addresses."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10_000,
+            help="Number of addresses to read and add per batch.",
+        )
+
+    def handle(self, *args, **options):
+        mask_filter = get_mask_lookup_filter()
+        if mask_filter is None:
+            raise CommandError(
+                "The mask lookup filter requires MASK_LOOKUP_FILTER_ENABLED"
+                " and REDIS_URL."
+            )
+        bloom = configured_bloom_filter()
+        num_addresses, num_deleted = mask_filter.rebuild(bloom, options["batch_size"])
+        self.stdout.write(
+            f"Added {num_addresses} addresses and {num_deleted} deleted addresses"
+            f" to a filter of {bloom.num_bits} bits with {bloom.num_hashes} hashes."
+        )
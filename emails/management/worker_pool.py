@@ -0,0 +1,261 @@
+"""
+WorkerPool runs tasks in long-lived, supervised worker processes.
+
+multiprocessing.Pool can only terminate all of its workers at once, so a
+stuck task means throwing away the whole pool. WorkerPool keeps a fixed
+number of pre-warmed workers, runs one task at a time in each, and when a
+task runs past the timeout, kills and respawns only that worker.
+"""
+
+import logging
+import multiprocessing
+import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+from itertools import count
+from multiprocessing.connection import Connection, wait
+from multiprocessing.process import BaseProcess
+from typing import Any, cast
+
+logger = logging.getLogger("eventsinfo.process_emails_from_sqs")
+
+
+class WorkerExitedError(Exception):
+    """A worker process exited while running a task."""
+
+
+class WorkerTaskError(Exception):
+    """A task raised an exception that could not be sent back from the worker."""
+
+
+@dataclass
+class TaskResult:
+    """The outcome of a task run by a WorkerPool."""
+
+    task_id: int
+    worker_id: int
+    error: BaseException | None = None
+    timed_out: bool = False
+    duration_s: float = 0.0
+    queued_s: float = 0.0
+
+    @property
+    def success(self) -> bool:
+        return self.error is None and not self.timed_out
+
+
+@dataclass
+class _Task:
+    task_id: int
+    args: tuple[Any, ...]
+    submit_time: float
+
+
+@dataclass
+class _Worker:
+    worker_id: int
+    process: BaseProcess
+    conn: Connection
+    task: _Task | None = None
+    start_time: float = 0.0
+
+
+def _worker_main(
+    conn: Connection,
+    func: Callable[..., Any],
+    initializer: Callable[[], Any] | None,
+) -> None:
+    """Run tasks sent by the WorkerPool until told to stop."""
+    if initializer is not None:
+        initializer()
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if task is None:
+            break
+        task_id, args = task
+        error: BaseException | None = None
+        try:
+            func(*args)
+        except BaseException as e:
+            error = e
+        try:
+            conn.send((task_id, error))
+        except Exception:
+            # The exception could not be pickled, send a summary instead
+            conn.send((task_id, WorkerTaskError(f"{type(error).__name__}: {error}")))
+
+
+class WorkerPool:
+    """
+    A fixed-size pool of worker processes that run func(*args) for each task.
+
+    Workers are started once, call initializer() once, and are reused for
+    every task. Tasks are queued with submit(), and wait() returns results as
+    they complete. A task that runs longer than task_timeout is reported as
+    timed out, and its worker is replaced.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        func: Callable[..., Any],
+        initializer: Callable[[], Any] | None = None,
+        task_timeout: float = 120.0,
+    ) -> None:
+        if size < 1:
+            raise ValueError("size must be at least 1.")
+        self.size = size
+        self.func = func
+        self.initializer = initializer
+        self.task_timeout = task_timeout
+        self.restart_count = 0
+        self._context = multiprocessing.get_context()
+        self._workers: list[_Worker] = []
+        self._pending: deque[_Task] = deque()
+        self._task_ids = count()
+
+    def __enter__(self) -> "WorkerPool":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def start(self) -> None:
+        """Start the worker processes."""
+        self._workers = [self._spawn(worker_id) for worker_id in range(self.size)]
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Ask the workers to exit, and terminate any that do not."""
+        for worker in self._workers:
+            try:
+                worker.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self._workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join()
+            worker.conn.close()
+        self._workers = []
+
+    @property
+    def in_flight(self) -> int:
+        """The number of tasks that are queued or running."""
+        return len(self._pending) + sum(1 for w in self._workers if w.task)
+
+    def submit(self, *args: Any) -> int:
+        """Queue func(*args) to run on the next free worker, and return the task ID."""
+        task = _Task(next(self._task_ids), args, time.monotonic())
+        self._pending.append(task)
+        self._dispatch()
+        return task.task_id
+
+    def wait(self, timeout: float) -> list[TaskResult]:
+        """
+        Wait up to timeout seconds for running tasks to complete.
+
+        Return is the list of tasks that completed, failed, or timed out, which
+        may be empty.
+        """
+        self._dispatch()
+        busy = {w.conn: w for w in self._workers if w.task}
+        if not busy:
+            return []
+
+        now = time.monotonic()
+        next_deadline = min(w.start_time for w in busy.values()) + self.task_timeout
+        wait_timeout = max(0.0, min(timeout, next_deadline - now))
+
+        results: list[TaskResult] = []
+        for conn in wait(list(busy.keys()), wait_timeout):
+            worker = busy[cast(Connection, conn)]
+            try:
+                task_id, error = worker.conn.recv()
+            except (EOFError, OSError):
+                exit_code = worker.process.exitcode
+                results.append(
+                    self._finish(
+                        worker,
+                        error=WorkerExitedError(
+                            f"Worker exited with code {exit_code}."
+                        ),
+                    )
+                )
+                self._replace(worker)
+            else:
+                if worker.task is None or task_id != worker.task.task_id:
+                    raise RuntimeError(f"Unexpected result for task {task_id}.")
+                results.append(self._finish(worker, error=error))
+
+        now = time.monotonic()
+        for worker in self._workers:
+            if worker.task and now - worker.start_time >= self.task_timeout:
+                results.append(self._finish(worker, timed_out=True))
+                self._replace(worker)
+
+        self._dispatch()
+        return results
+
+    def _spawn(self, worker_id: int) -> _Worker:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, self.func, self.initializer),
+            name=f"WorkerPool-{worker_id}",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        return _Worker(worker_id=worker_id, process=process, conn=parent_conn)
+
+    def _replace(self, worker: _Worker) -> None:
+        """Kill a stuck or broken worker and start a fresh one in its place."""
+        worker.process.terminate()
+        worker.process.join(1.0)
+        if worker.process.is_alive():
+            worker.process.kill()
+            worker.process.join()
+        worker.conn.close()
+        index = self._workers.index(worker)
+        self._workers[index] = self._spawn(worker.worker_id)
+        self.restart_count += 1
+        logger.warning(
+            "Restarted worker process",
+            extra={"worker_id": worker.worker_id, "restarts": self.restart_count},
+        )
+
+    def _dispatch(self) -> None:
+        """Send queued tasks to idle workers."""
+        for worker in self._workers:
+            if not self._pending:
+                return
+            if worker.task is None:
+                task = self._pending.popleft()
+                worker.task = task
+                worker.start_time = time.monotonic()
+                worker.conn.send((task.task_id, task.args))
+
+    def _finish(
+        self,
+        worker: _Worker,
+        error: BaseException | None = None,
+        timed_out: bool = False,
+    ) -> TaskResult:
+        task = worker.task
+        if task is None:
+            raise RuntimeError("Worker has no task.")
+        worker.task = None
+        return TaskResult(
+            task_id=task.task_id,
+            worker_id=worker.worker_id,
+            error=error,
+            timed_out=timed_out,
+            duration_s=time.monotonic() - worker.start_time,
+            queued_s=worker.start_time - task.submit_time,
+        )
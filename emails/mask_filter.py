@@ -0,0 +1,243 @@
+"""
+Bloom filters of RelayAddress and DeletedAddress entries, stored in Redis.
+
+Most emails to a relay domain that do not match a mask are spam, such as
+dictionary attacks. The live filter answers "is this definitely not a mask?"
+without a database query. The deleted filter answers "was this definitely not
+deleted?", which is only used to pick a metric.
+
+A Bloom filter has false positives, which fall back to the database, but no
+false negatives, as long as every new entry is added. Entries are added when
+they are created. The rebuild_mask_lookup_filter command builds a new
+generation of the filters from the database, and switches to it when complete.
+If an add fails, the filters are disabled until the next rebuild.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+from collections.abc import Iterable, Iterator
+from datetime import UTC, datetime, timedelta
+from hashlib import sha256
+from typing import TYPE_CHECKING, Literal
+from uuid import uuid4
+
+from django.conf import settings
+
+from redis.exceptions import RedisError
+
+if TYPE_CHECKING:
+    from redis import Redis
+
+logger = logging.getLogger("events")
+
+KEY_PREFIX = "mask_filter:v1:"
+GENERATION_KEY = KEY_PREFIX + "generation"
+BUILDING_KEY = KEY_PREFIX + "building"
+# Keep a replaced generation for lookups that started before the switch
+OLD_GENERATION_TIMEOUT = 3600
+# Stop adding to an abandoned build after this long
+BUILDING_TIMEOUT = 24 * 3600
+# Add again masks created this long before a rebuild, to cover open transactions
+REBUILD_OVERLAP = timedelta(minutes=10)
+
+FilterName = Literal["live", "deleted"]
+
+
+class BloomFilter:
+    """The bit positions of items in a Bloom filter of a given size."""
+
+    def __init__(self, num_bits: int, num_hashes: int) -> None:
+        if num_bits < 1 or num_hashes < 1:
+            raise ValueError("num_bits and num_hashes must be positive.")
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+
+    @classmethod
+    def for_capacity(cls, capacity: int, error_rate: float) -> BloomFilter:
+        """Size a filter for the expected number of items and false positive rate."""
+        if capacity < 1 or not (0 < error_rate < 1):
+            raise ValueError("capacity must be positive, and error_rate in (0, 1).")
+        num_bits = math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+        return cls(num_bits, num_hashes)
+
+    def positions(self, item: str) -> list[int]:
+        """Return the bits to set or check for an item, using double hashing."""
+        digest = sha256(item.encode()).digest()
+        hash1 = int.from_bytes(digest[:8], "big")
+        hash2 = int.from_bytes(digest[8:16], "big") | 1
+        return [(hash1 + i * hash2) % self.num_bits for i in range(self.num_hashes)]
+
+
+class Generation:
+    """
+    A generation of the filters, stored in Redis as "<id>.<num_bits>.<num_hashes>".
+
+    The filter size is stored with the generation, so that a settings change
+    does not affect filters built with the old size.
+    """
+
+    def __init__(self, gen_id: str, bloom: BloomFilter) -> None:
+        self.gen_id = gen_id
+        self.bloom = bloom
+
+    @classmethod
+    def parse(cls, value: bytes | str) -> Generation:
+        text = value.decode() if isinstance(value, bytes) else value
+        gen_id, num_bits, num_hashes = text.split(".")
+        return cls(gen_id, BloomFilter(int(num_bits), int(num_hashes)))
+
+    def __str__(self) -> str:
+        return f"{self.gen_id}.{self.bloom.num_bits}.{self.bloom.num_hashes}"
+
+    def key(self, name: FilterName) -> str:
+        return f"{KEY_PREFIX}{self.gen_id}:{name}"
+
+
+class MaskLookupFilter:
+    """Bloom filters of mask addresses and deleted address hashes in Redis."""
+
+    def __init__(self, client: Redis) -> None:
+        self.client = client
+
+    def might_have_address(self, address: str) -> bool:
+        """
+        Return False if no RelayAddress has this lower-case address.
+
+        Return True if one may exist, or if the filter is not built or available.
+        """
+        return self._might_have("live", address)
+
+    def might_have_deleted(self, address_hash: str) -> bool:
+        """Return False if no DeletedAddress has this address hash."""
+        return self._might_have("deleted", address_hash)
+
+    def add_address(self, address: str) -> None:
+        """Add a new RelayAddress to the current and building filters."""
+        self._add("live", [address])
+
+    def add_addresses(self, addresses: list[str]) -> None:
+        """Add new RelayAddresses to the current and building filters."""
+        self._add("live", addresses)
+
+    def add_deleted(self, address_hash: str) -> None:
+        """Add a new DeletedAddress hash to the current and building filters."""
+        self._add("deleted", [address_hash])
+
+    def add_deleted_hashes(self, address_hashes: list[str]) -> None:
+        """Add new DeletedAddress hashes to the current and building filters."""
+        self._add("deleted", address_hashes)
+
+    def disable(self) -> None:
+        """Stop using the filters until they are rebuilt."""
+        try:
+            self.client.delete(GENERATION_KEY)
+        except RedisError:
+            logger.exception("mask_filter_disable_failed")
+
+    def rebuild(self, bloom: BloomFilter, batch_size: int = 10_000) -> tuple[int, int]:
+        """
+        Build a new generation of the filters from the database, and switch to it.
+
+        Return is the number of addresses and deleted address hashes added.
+        """
+        from .models import DeletedAddress, RelayAddress
+
+        generation = Generation(uuid4().hex, bloom)
+        started = datetime.now(UTC)
+        self.client.set(BUILDING_KEY, str(generation), ex=BUILDING_TIMEOUT)
+
+        addresses = RelayAddress.objects.values_list("address", flat=True)
+        hashes = DeletedAddress.objects.values_list("address_hash", flat=True)
+        num_addresses = self._set_all(
+            generation, "live", addresses.iterator(chunk_size=batch_size), batch_size
+        )
+        num_deleted = self._set_all(
+            generation, "deleted", hashes.iterator(chunk_size=batch_size), batch_size
+        )
+
+        old_value = self.client.get(GENERATION_KEY)
+        self.client.set(GENERATION_KEY, str(generation))
+        self.client.delete(BUILDING_KEY)
+        if old_value is not None:
+            old_generation = Generation.parse(old_value)
+            self.client.expire(old_generation.key("live"), OLD_GENERATION_TIMEOUT)
+            self.client.expire(old_generation.key("deleted"), OLD_GENERATION_TIMEOUT)
+
+        # Masks saved during the rebuild may not be in the new generation
+        recent = addresses.filter(created_at__gte=started - REBUILD_OVERLAP)
+        self._set_all(generation, "live", recent.iterator(), batch_size)
+        return num_addresses, num_deleted
+
+    def _might_have(self, name: FilterName, item: str) -> bool:
+        try:
+            value = self.client.get(GENERATION_KEY)
+            if value is None:
+                return True
+            generation = Generation.parse(value)
+            key = generation.key(name)
+            pipeline = self.client.pipeline(transaction=False)
+            for position in generation.bloom.positions(item):
+                pipeline.getbit(key, position)
+            return all(pipeline.execute())
+        except (RedisError, ValueError):
+            logger.exception("mask_filter_lookup_failed")
+            return True
+
+    def _add(self, name: FilterName, items: list[str]) -> None:
+        try:
+            values = self.client.mget([GENERATION_KEY, BUILDING_KEY])
+            for value in values:
+                if value is not None:
+                    self._set_bits(Generation.parse(value), name, items)
+        except (RedisError, ValueError):
+            logger.exception("mask_filter_add_failed")
+            self.disable()
+
+    def _set_all(
+        self,
+        generation: Generation,
+        name: FilterName,
+        items: Iterator[str],
+        batch_size: int,
+    ) -> int:
+        count = 0
+        batch: list[str] = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                self._set_bits(generation, name, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            self._set_bits(generation, name, batch)
+            count += len(batch)
+        return count
+
+    def _set_bits(
+        self, generation: Generation, name: FilterName, items: Iterable[str]
+    ) -> None:
+        key = generation.key(name)
+        pipeline = self.client.pipeline(transaction=False)
+        for item in items:
+            for position in generation.bloom.positions(item):
+                pipeline.setbit(key, position, 1)
+        pipeline.execute()
+
+
+def get_mask_lookup_filter() -> MaskLookupFilter | None:
+    """Return the mask lookup filter, or None if it is not enabled."""
+    if not (settings.MASK_LOOKUP_FILTER_ENABLED and settings.REDIS_URL):
+        return None
+    from django_redis import get_redis_connection
+
+    return MaskLookupFilter(get_redis_connection("default"))
+
+
+def configured_bloom_filter() -> BloomFilter:
+    """Return a Bloom filter sized by the settings."""
+    return BloomFilter.for_capacity(
+        settings.MASK_LOOKUP_FILTER_CAPACITY, settings.MASK_LOOKUP_FILTER_ERROR_RATE
+    )
@@ -3,35 +3,45 @@ from __future__ import annotations
 import logging
 import random
 import string
-from collections.abc import Iterable
+from collections.abc import Collection, Iterable, Sequence
 from datetime import UTC, datetime
 from hashlib import sha256
-from typing import Any, Literal, cast
+from typing import TYPE_CHECKING, Any, Literal, cast
 
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.validators import MinLengthValidator
-from django.db import models, transaction
+from django.db import IntegrityError, models, transaction
 from django.db.models.base import ModelBase
+from django.db.models.functions import Coalesce
 
 from .exceptions import (
     DomainAddrDuplicateException,
     DomainAddrUnavailableException,
     DomainAddrUpdateException,
+    RelayAddrFreeTierLimitException,
 )
+from .mask_filter import get_mask_lookup_filter
 from .utils import get_domains_from_settings, incr_if_enabled
 from .validators import (
     check_user_can_make_another_address,
     check_user_can_make_domain_address,
+    has_bad_words,
     is_blocklisted,
     valid_address,
+    valid_address_pattern,
 )
 
+if TYPE_CHECKING:
+    from privaterelay.models import Profile
+
 logger = logging.getLogger("events")
 
 
 DOMAIN_CHOICES = [(1, "RELAY_FIREFOX_DOMAIN"), (2, "MOZMAIL_DOMAIN")]
 PREMIUM_DOMAINS = ["mozilla.com", "getpocket.com", "mozillafoundation.org"]
+# Attempts to insert a RelayAddress when another request takes the same address
+RELAY_ADDRESS_INSERT_ATTEMPTS = 3
 
 
 def default_server_storage() -> bool:
@@ -85,6 +95,60 @@ def address_default() -> str:
     )
 
 
+def available_relay_address(address: str, domain: str, batch_size: int = 10) -> str:
+    """
+    Return the address if it can be used for a new RelayAddress, or a random one.
+
+    Candidates are checked in batches. The pattern, bad words, and blocklist are
+    checked in Python, and existing and deleted addresses with one query per batch.
+    """
+    candidates = [address]
+    while True:
+        candidates += [address_default() for _ in range(batch_size - len(candidates))]
+        if available := _available_relay_addresses(candidates, domain):
+            return available[0]
+        candidates = []
+
+
+def available_relay_addresses(count: int, domain: str) -> list[str]:
+    """Return random addresses for new RelayAddresses, with one query per batch."""
+    addresses: list[str] = []
+    while len(addresses) < count:
+        # Generate extra candidates, so one batch is usually enough
+        candidates = [address_default() for _ in range(2 * (count - len(addresses)))]
+        for address in _available_relay_addresses(candidates, domain):
+            if address not in addresses and len(addresses) < count:
+                addresses.append(address)
+    return addresses
+
+
+def _available_relay_addresses(candidates: list[str], domain: str) -> list[str]:
+    """Return the candidates that can be used for a new RelayAddress, in order."""
+    hashes = {
+        candidate: address_hash(candidate, domain=domain)
+        for candidate in candidates
+        if valid_address_pattern(candidate)
+        and not has_bad_words(candidate)
+        and not is_blocklisted(candidate)
+    }
+    if not hashes:
+        return []
+    used = set(
+        RelayAddress.objects.filter(address__in=hashes)
+        .values_list("address", flat=True)
+        .union(
+            DeletedAddress.objects.filter(address_hash__in=hashes.values()).values_list(
+                "address_hash", flat=True
+            )
+        )
+    )
+    return [
+        candidate
+        for candidate, candidate_hash in hashes.items()
+        if candidate not in used and candidate_hash not in used
+    ]
+
+
 class RelayAddress(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     address = models.CharField(max_length=64, default=address_default, unique=True)
@@ -130,6 +194,8 @@ class RelayAddress(models.Model):
             num_spam=self.num_spam,
         )
         deleted_address.save()
+        if mask_filter := get_mask_lookup_filter():
+            mask_filter.add_deleted(deleted_address.address_hash)
         profile = self.user.profile
         profile.address_last_deleted = datetime.now(UTC)
         profile.num_address_deleted += 1
@@ -154,19 +220,14 @@ class RelayAddress(models.Model):
     ) -> None:
         from privaterelay.models import Profile
 
-        if self._state.adding:
+        adding = self._state.adding
+        if adding:
             with transaction.atomic():
                 locked_profile = Profile.objects.select_for_update().get(user=self.user)
                 check_user_can_make_another_address(locked_profile.user)
-                while True:
-                    address_is_allowed = not is_blocklisted(self.address)
-                    address_is_valid = valid_address(self.address, self.domain_value)
-                    if address_is_valid and address_is_allowed:
-                        break
-                    self.address = address_default()
+                self.address = available_relay_address(self.address, self.domain_value)
                 locked_profile.update_abuse_metric(address_created=True)
-                locked_profile.last_engagement = datetime.now(UTC)
-                locked_profile.save()
+                locked_profile.touch_engagement()
         if (not self.user.profile.server_storage) and any(
             (self.description, self.generated_for, self.used_on)
         ):
@@ -181,12 +242,82 @@ class RelayAddress(models.Model):
             self.block_list_emails = False
             if update_fields is not None:
                 update_fields = {"block_list_emails"}.union(update_fields)
-        super().save(
-            force_insert=force_insert,
-            force_update=force_update,
-            using=using,
-            update_fields=update_fields,
-        )
+        if not adding:
+            super().save(
+                force_insert=force_insert,
+                force_update=force_update,
+                using=using,
+                update_fields=update_fields,
+            )
+            return
+        for attempt in range(1, RELAY_ADDRESS_INSERT_ATTEMPTS + 1):
+            try:
+                with transaction.atomic():
+                    super().save(
+                        force_insert=force_insert,
+                        force_update=force_update,
+                        using=using,
+                        update_fields=update_fields,
+                    )
+                break
+            except IntegrityError:
+                # Another request added the address since it was checked
+                if attempt == RELAY_ADDRESS_INSERT_ATTEMPTS:
+                    raise
+                self.address = available_relay_address(
+                    address_default(), self.domain_value
+                )
+        if mask_filter := get_mask_lookup_filter():
+            mask_filter.add_address(self.address)
+
+    @staticmethod
+    def make_relay_addresses(
+        user: User, masks: list[dict[str, Any]]
+    ) -> list[RelayAddress]:
+        """
+        Create RelayAddresses with random addresses for a user.
+
+        The profile is locked once, the free tier limit is checked for all the new
+        masks, and the masks are inserted with one query.
+        """
+        from privaterelay.models import Profile
+
+        with transaction.atomic():
+            locked_profile = Profile.objects.select_for_update().get(user=user)
+            check_user_can_make_another_address(locked_profile.user)
+            if not locked_profile.has_premium and (
+                locked_profile.relay_addresses.count() + len(masks)
+                > settings.MAX_NUM_FREE_ALIASES
+            ):
+                raise RelayAddrFreeTierLimitException()
+            relay_addresses = [RelayAddress(user=user, **fields) for fields in masks]
+            for relay_address in relay_addresses:
+                if not locked_profile.server_storage:
+                    relay_address.description = ""
+                    relay_address.generated_for = ""
+                    relay_address.used_on = ""
+                if not locked_profile.has_premium:
+                    relay_address.block_list_emails = False
+            domain = relay_addresses[0].domain_value
+            for attempt in range(1, RELAY_ADDRESS_INSERT_ATTEMPTS + 1):
+                addresses = available_relay_addresses(len(relay_addresses), domain)
+                for relay_address, address in zip(relay_addresses, addresses):
+                    relay_address.address = address
+                try:
+                    with transaction.atomic():
+                        RelayAddress.objects.bulk_create(relay_addresses)
+                    break
+                except IntegrityError:
+                    # Another request added an address since it was checked
+                    if attempt == RELAY_ADDRESS_INSERT_ATTEMPTS:
+                        raise
+            locked_profile.update_abuse_metric(
+                num_addresses_created=len(relay_addresses)
+            )
+            locked_profile.touch_engagement()
+        if mask_filter := get_mask_lookup_filter():
+            mask_filter.add_addresses([mask.address for mask in relay_addresses])
+        return relay_addresses
 
     @property
     def domain_value(self) -> str:
@@ -243,17 +374,36 @@ class DomainAddress(models.Model):
         unique_together = ["user", "address"]
         verbose_name_plural = "domain addresses"
 
+    # The address when loaded from or saved to the database
+    _saved_address: str | None = None
+
     def __str__(self):
         return self.address
 
+    @classmethod
+    def from_db(
+        cls, db: str | None, field_names: Collection[str], values: Collection[Any]
+    ) -> DomainAddress:
+        instance = super().from_db(db, field_names, values)
+        # Deferred fields are not in __dict__
+        instance._saved_address = instance.__dict__.get("address")
+        return instance
+
     def save(
         self,
         force_insert: bool | tuple[ModelBase, ...] = False,
         force_update: bool = False,
         using: str | None = None,
         update_fields: Iterable[str] | None = None,
+        profile: Profile | None = None,
     ) -> None:
-        if self._state.adding:
+        """
+        Save the DomainAddress.
+
+        Pass the user's profile, if already loaded, to skip loading it again.
+        """
+        adding = self._state.adding
+        if adding:
             check_user_can_make_domain_address(self.user)
             domain_address_valid = valid_address(
                 self.address, self.domain_value, self.user.profile.subdomain
@@ -269,24 +419,25 @@ class DomainAddress(models.Model):
                 raise DomainAddrDuplicateException(duplicate_address=self.address)
 
             self.user.profile.update_abuse_metric(address_created=True)
-            self.user.profile.last_engagement = datetime.now(UTC)
-            self.user.profile.save(update_fields=["last_engagement"])
+            self.user.profile.touch_engagement()
             incr_if_enabled("domainaddress.create")
             if self.first_emailed_at:
                 incr_if_enabled("domainaddress.create_via_email")
         else:
             # The model is in an update state, do not allow 'address' field updates
-            existing_instance = DomainAddress.objects.get(id=self.id)
-            if existing_instance.address != self.address:
+            saved_address = self._saved_address
+            if saved_address is None:
+                saved_address = DomainAddress.objects.get(id=self.id).address
+            if saved_address != self.address:
                 raise DomainAddrUpdateException()
 
-        if not self.user.profile.has_premium and self.block_list_emails:
+        if profile is None:
+            profile = self.user.profile
+        if self.block_list_emails and not profile.has_premium:
             self.block_list_emails = False
             if update_fields:
                 update_fields = {"block_list_emails"}.union(update_fields)
-        if (not self.user.profile.server_storage) and (
-            self.description or self.used_on
-        ):
+        if (not profile.server_storage) and (self.description or self.used_on):
             self.description = ""
             self.used_on = ""
             if update_fields:
@@ -297,6 +448,7 @@ class DomainAddress(models.Model):
             using=using,
             update_fields=update_fields,
         )
+        self._saved_address = self.address
 
     @staticmethod
     def make_domain_address(
@@ -367,6 +519,156 @@ class DomainAddress(models.Model):
         return f"D{self.id}"
 
 
+def increment_mask_counters(
+    mask: RelayAddress | DomainAddress,
+    num_forwarded: int = 0,
+    num_blocked: int = 0,
+    num_level_one_trackers_blocked: int = 0,
+    num_replied: int = 0,
+    used: bool = False,
+) -> None:
+    """
+    Add to the counters of a mask with one UPDATE query.
+
+    The counters are incremented by the database, so concurrent emails to the
+    same mask are all counted. If used is True, last_used_at is also set. The
+    mask instance is updated to match, but may not include other increments.
+    """
+    updates: dict[str, Any] = {}
+    for name, value in (
+        ("num_forwarded", num_forwarded),
+        ("num_blocked", num_blocked),
+        ("num_replied", num_replied),
+    ):
+        if value:
+            updates[name] = models.F(name) + value
+            setattr(mask, name, getattr(mask, name) + value)
+    if num_level_one_trackers_blocked:
+        updates["num_level_one_trackers_blocked"] = (
+            Coalesce(models.F("num_level_one_trackers_blocked"), 0)
+            + num_level_one_trackers_blocked
+        )
+        mask.num_level_one_trackers_blocked = (
+            mask.num_level_one_trackers_blocked or 0
+        ) + num_level_one_trackers_blocked
+    if used:
+        mask.last_used_at = updates["last_used_at"] = datetime.now(UTC)
+    if updates:
+        type(mask).objects.filter(id=mask.id).update(**updates)
+
+
+def update_masks(
+    user: User,
+    masks: models.QuerySet[RelayAddress] | models.QuerySet[DomainAddress],
+    changes: dict[str, Any],
+) -> int:
+    """
+    Update the same fields on masks of a user with one UPDATE query.
+
+    The rules for saving one mask are applied: labels are not stored for users
+    without server storage, and only premium users can block promotional emails.
+    Return is the number of updated masks.
+    """
+    changes = dict(changes)
+    if not user.profile.server_storage:
+        for name in ("description", "generated_for", "used_on"):
+            if name in changes:
+                changes[name] = ""
+    if not user.profile.has_premium and changes.get("block_list_emails"):
+        changes["block_list_emails"] = False
+    return masks.update(last_modified_at=datetime.now(UTC), **changes)
+
+
+def delete_masks(
+    user: User,
+    masks: Sequence[RelayAddress | DomainAddress],
+    update_profile: bool = True,
+) -> None:
+    """
+    Delete masks of a user, with the same bookkeeping as deleting one mask.
+
+    The DeletedAddress rows are inserted with one query, and the profile counters
+    are added to with one UPDATE query, instead of a profile save per mask. If the
+    profile is about to be deleted, update_profile=False skips the counters.
+    """
+    from privaterelay.models import Profile
+
+    if not masks:
+        return
+    subdomain = user.profile.subdomain
+    relay_address_ids: list[int] = []
+    domain_address_ids: list[int] = []
+    deleted_addresses: list[DeletedAddress] = []
+    for mask in masks:
+        if isinstance(mask, RelayAddress):
+            relay_address_ids.append(mask.id)
+            mask_hash = address_hash(mask.address, domain=mask.domain_value)
+        else:
+            domain_address_ids.append(mask.id)
+            mask_hash = address_hash(mask.address, subdomain, mask.domain_value)
+        deleted_addresses.append(
+            DeletedAddress(
+                address_hash=mask_hash,
+                num_forwarded=mask.num_forwarded,
+                num_blocked=mask.num_blocked,
+                num_replied=mask.num_replied,
+                num_spam=mask.num_spam,
+            )
+        )
+
+    now = datetime.now(UTC)
+    with transaction.atomic():
+        DeletedAddress.objects.bulk_create(deleted_addresses)
+        if update_profile:
+            Profile.objects.filter(user=user).update(
+                address_last_deleted=now,
+                last_engagement=now,
+                num_address_deleted=models.F("num_address_deleted") + len(masks),
+                num_email_forwarded_in_deleted_address=(
+                    models.F("num_email_forwarded_in_deleted_address")
+                    + sum(mask.num_forwarded for mask in masks)
+                ),
+                num_email_blocked_in_deleted_address=(
+                    models.F("num_email_blocked_in_deleted_address")
+                    + sum(mask.num_blocked for mask in masks)
+                ),
+                num_level_one_trackers_blocked_in_deleted_address=(
+                    Coalesce(
+                        models.F("num_level_one_trackers_blocked_in_deleted_address"), 0
+                    )
+                    + sum(mask.num_level_one_trackers_blocked or 0 for mask in masks)
+                ),
+                num_email_replied_in_deleted_address=(
+                    models.F("num_email_replied_in_deleted_address")
+                    + sum(mask.num_replied for mask in masks)
+                ),
+                num_email_spam_in_deleted_address=(
+                    models.F("num_email_spam_in_deleted_address")
+                    + sum(mask.num_spam for mask in masks)
+                ),
+                num_deleted_relay_addresses=(
+                    models.F("num_deleted_relay_addresses") + len(relay_address_ids)
+                ),
+                num_deleted_domain_addresses=(
+                    models.F("num_deleted_domain_addresses") + len(domain_address_ids)
+                ),
+            )
+        if relay_address_ids:
+            RelayAddress.objects.filter(id__in=relay_address_ids).delete()
+        if domain_address_ids:
+            DomainAddress.objects.filter(id__in=domain_address_ids).delete()
+    if update_profile:
+        user.profile.refresh_from_db()
+    if relay_address_ids and (mask_filter := get_mask_lookup_filter()):
+        mask_filter.add_deleted_hashes(
+            [
+                deleted_address.address_hash
+                for mask, deleted_address in zip(masks, deleted_addresses)
+                if isinstance(mask, RelayAddress)
+            ]
+        )
+
+
 class Reply(models.Model):
     relay_address = models.ForeignKey(
         RelayAddress, on_delete=models.CASCADE, blank=True, null=True
@@ -394,9 +696,7 @@ class Reply(models.Model):
         address = self.relay_address or self.domain_address
         if not address:
             raise ValueError("address must be truthy value")
-        address.num_replied += 1
-        address.last_used_at = datetime.now(UTC)
-        address.save(update_fields=["num_replied", "last_used_at"])
+        increment_mask_counters(address, num_replied=1, used=True)
         return address.num_replied
 
 
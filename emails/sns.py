@@ -3,12 +3,16 @@
 
 import base64
 import logging
+import time
+from threading import Lock
+from typing import NamedTuple
 from urllib.request import urlopen
 
 from django.conf import settings
 from django.core.cache import caches
 from django.core.exceptions import SuspiciousOperation
 from django.utils.encoding import smart_bytes
+from django.utils.timezone import now
 
 import pem
 from OpenSSL import crypto
@@ -63,19 +67,71 @@ SUPPORTED_SNS_TYPES = [
 ]
 
 
+# Don't download a certificate again if it failed verification within this time
+CERTIFICATE_REFRESH_SECONDS = 60
+
+
+class _CachedCertificate(NamedTuple):
+    cert: crypto.X509
+    loaded_at: float
+    expires_at: float
+
+
+_certificate_cache: dict[str, _CachedCertificate] = {}
+_certificate_cache_lock = Lock()
+
+
 def verify_from_sns(json_body):
-    pemfile = _grab_keyfile(json_body["SigningCertURL"])
-    cert = crypto.load_certificate(crypto.FILETYPE_PEM, pemfile)
+    cert_url = json_body["SigningCertURL"]
     signature = base64.decodebytes(json_body["Signature"].encode("utf-8"))
-
     hash_format = _get_hash_format(json_body)
-
-    crypto.verify(
-        cert, signature, hash_format.format(**json_body).encode("utf-8"), "sha1"
-    )
+    data = hash_format.format(**json_body).encode("utf-8")
+
+    cached = _get_certificate(cert_url)
+    try:
+        crypto.verify(cached.cert, signature, data, "sha1")
+    except crypto.Error:
+        # The certificate may have been rotated, so try again with a fresh copy
+        if time.monotonic() - cached.loaded_at < CERTIFICATE_REFRESH_SECONDS:
+            raise
+        cached = _get_certificate(cert_url, refresh=True)
+        crypto.verify(cached.cert, signature, data, "sha1")
     return json_body
 
 
+def _get_certificate(cert_url: str, refresh: bool = False) -> _CachedCertificate:
+    """
+    Get the parsed SNS signing certificate for a URL.
+
+    Parsed certificates are kept in memory, so that each process parses them
+    once rather than once per message. If refresh is True, or the certificate
+    has expired from the process cache, it is loaded from the shared cache or
+    downloaded.
+    """
+    _check_cert_url(cert_url)
+    now_time = time.monotonic()
+    if not refresh:
+        with _certificate_cache_lock:
+            cached = _certificate_cache.get(cert_url)
+        if cached and cached.expires_at > now_time:
+            return cached
+
+    pemfile = _grab_keyfile(cert_url, refresh=refresh)
+    cert = crypto.load_certificate(crypto.FILETYPE_PEM, pemfile)
+    expires_at = now_time + settings.AWS_SNS_CERT_LOCAL_CACHE_SECONDS
+    not_after = cert.to_cryptography().not_valid_after_utc
+    expires_at = min(expires_at, now_time + (not_after - now()).total_seconds())
+    cached = _CachedCertificate(cert, now_time, expires_at)
+    with _certificate_cache_lock:
+        _certificate_cache[cert_url] = cached
+    return cached
+
+
+def _clear_certificate_cache() -> None:
+    with _certificate_cache_lock:
+        _certificate_cache.clear()
+
+
 def _get_hash_format(json_body):
     message_type = json_body["Type"]
     if message_type == "Notification":
@@ -86,16 +142,20 @@ def _get_hash_format(json_body):
     return SUBSCRIPTION_HASH_FORMAT
 
 
-def _grab_keyfile(cert_url):
+def _check_cert_url(cert_url: str) -> None:
     cert_url_origin = f"https://sns.{settings.AWS_REGION}.amazonaws.com/"
     if not (cert_url.startswith(cert_url_origin)):
         raise SuspiciousOperation(
             f'SNS SigningCertURL "{cert_url}" did not start with "{cert_url_origin}"'
         )
 
+
+def _grab_keyfile(cert_url, refresh=False):
+    _check_cert_url(cert_url)
+
     key_cache = caches[getattr(settings, "AWS_SNS_KEY_CACHE", "default")]
 
-    pemfile = key_cache.get(cert_url)
+    pemfile = None if refresh else key_cache.get(cert_url)
     if not pemfile:
         response = urlopen(cert_url)  # noqa: S310 (check for custom scheme)
         pemfile = response.read()
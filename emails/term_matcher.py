@@ -0,0 +1,63 @@
+"""Match a string against a list of terms in one pass."""
+
+from collections import deque
+from collections.abc import Iterable
+
+
+class TermMatcher:
+    """
+    Find if a string contains any of a list of terms.
+
+    This uses the Aho-Corasick algorithm. The terms are built into a trie, with
+    links from each node to the longest suffix that is also in the trie. A search
+    reads each character of the string once, so the time does not depend on the
+    number of terms.
+    """
+
+    def __init__(self, terms: Iterable[str]) -> None:
+        # Node 0 is the root. Each node has its children by character, the node to
+        # continue from when the next character is not a child, and if a term ends
+        # at the node or at one of the nodes it continues from.
+        self._children: list[dict[str, int]] = [{}]
+        self._fallback: list[int] = [0]
+        self._is_match: list[bool] = [False]
+        for term in terms:
+            node = 0
+            for char in term:
+                child = self._children[node].get(char)
+                if child is None:
+                    child = len(self._children)
+                    self._children[node][char] = child
+                    self._children.append({})
+                    self._fallback.append(0)
+                    self._is_match.append(False)
+                node = child
+            self._is_match[node] = True
+
+        # Set the fallback links in breadth-first order, so that the fallback of a
+        # node's parent is always set first
+        queue = deque(self._children[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._children[node].items():
+                queue.append(child)
+                fallback = self._fallback[node]
+                while fallback and char not in self._children[fallback]:
+                    fallback = self._fallback[fallback]
+                self._fallback[child] = self._children[fallback].get(char, 0)
+                if self._is_match[self._fallback[child]]:
+                    self._is_match[child] = True
+
+    def contains_term(self, value: str) -> bool:
+        """Return True if any term is a substring of the value."""
+        children, fallback, is_match = self._children, self._fallback, self._is_match
+        if is_match[0]:
+            return True
+        node = 0
+        for char in value:
+            while node and char not in children[node]:
+                node = fallback[node]
+            node = children[node].get(char, 0)
+            if is_match[node]:
+                return True
+        return False
@@ -0,0 +1,213 @@
+from collections.abc import Iterator
+from io import StringIO
+from typing import Any
+from unittest.mock import patch
+
+from django.core.management import CommandError, call_command
+from django.test import override_settings
+
+import pytest
+from markus.testing import MetricsMock
+from model_bakery import baker
+from redis.exceptions import ConnectionError
+
+from emails.mask_filter import (
+    BUILDING_KEY,
+    GENERATION_KEY,
+    BloomFilter,
+    Generation,
+    MaskLookupFilter,
+)
+from emails.models import DeletedAddress, RelayAddress, address_hash
+from emails.views import _get_address
+from privaterelay.tests.utils import make_free_test_user
+
+
+class FakePipeline:
+    def __init__(self, client: "FakeRedis") -> None:
+        self.client = client
+        self.commands: list[tuple[str, str, int]] = []
+
+    def getbit(self, key: str, offset: int) -> None:
+        self.commands.append(("getbit", key, offset))
+
+    def setbit(self, key: str, offset: int, value: int) -> None:
+        assert value == 1
+        self.commands.append(("setbit", key, offset))
+
+    def execute(self) -> list[int]:
+        results = []
+        for command, key, offset in self.commands:
+            bits = self.client.bits.setdefault(key, set())
+            results.append(int(offset in bits))
+            if command == "setbit":
+                bits.add(offset)
+        return results
+
+
+class FakeRedis:
+    """The subset of the Redis client used by MaskLookupFilter."""
+
+    def __init__(self) -> None:
+        self.values: dict[str, bytes] = {}
+        self.bits: dict[str, set[int]] = {}
+        self.expires: dict[str, int] = {}
+
+    def get(self, key: str) -> bytes | None:
+        return self.values.get(key)
+
+    def mget(self, keys: list[str]) -> list[bytes | None]:
+        return [self.values.get(key) for key in keys]
+
+    def set(self, key: str, value: str, ex: int | None = None) -> None:
+        self.values[key] = value.encode()
+
+    def delete(self, key: str) -> None:
+        self.values.pop(key, None)
+        self.bits.pop(key, None)
+
+    def expire(self, key: str, seconds: int) -> None:
+        self.expires[key] = seconds
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
+        return FakePipeline(self)
+
+
+@pytest.fixture
+def mask_filter() -> Iterator[MaskLookupFilter]:
+    mask_filter = MaskLookupFilter(FakeRedis())  # type: ignore[arg-type]
+    with (
+        patch("emails.models.get_mask_lookup_filter", return_value=mask_filter),
+        patch("emails.views.get_mask_lookup_filter", return_value=mask_filter),
+    ):
+        yield mask_filter
+
+
+def test_bloom_filter_for_capacity() -> None:
+    bloom = BloomFilter.for_capacity(1_000_000, 0.01)
+    assert bloom.num_bits == 9_585_059
+    assert bloom.num_hashes == 7
+
+
+def test_bloom_filter_positions() -> None:
+    bloom = BloomFilter(1000, 5)
+    positions = bloom.positions("abc123")
+    assert len(positions) == 5
+    assert all(0 <= position < 1000 for position in positions)
+    assert bloom.positions("abc123") == positions
+    assert bloom.positions("abc124") != positions
+
+
+@pytest.mark.parametrize("capacity,error_rate", [(0, 0.01), (10, 0), (10, 1)])
+def test_bloom_filter_for_capacity_invalid(capacity: int, error_rate: float) -> None:
+    with pytest.raises(ValueError):
+        BloomFilter.for_capacity(capacity, error_rate)
+
+
+def test_generation_round_trip() -> None:
+    generation = Generation("abc", BloomFilter(100, 3))
+    parsed = Generation.parse(str(generation).encode())
+    assert parsed.gen_id == "abc"
+    assert (parsed.bloom.num_bits, parsed.bloom.num_hashes) == (100, 3)
+
+
+def test_not_built_might_have_everything(mask_filter: MaskLookupFilter) -> None:
+    assert mask_filter.might_have_address("anything")
+    assert mask_filter.might_have_deleted("anything")
+
+
+def test_lookup_error_might_have_everything(mask_filter: MaskLookupFilter) -> None:
+    with patch.object(mask_filter.client, "get", side_effect=ConnectionError()):
+        assert mask_filter.might_have_address("anything")
+
+
+@pytest.mark.django_db
+def test_rebuild(mask_filter: MaskLookupFilter) -> None:
+    user = make_free_test_user()
+    addresses = [baker.make(RelayAddress, user=user).address for _ in range(3)]
+    baker.make(DeletedAddress, address_hash="deleted_hash")
+    client: Any = mask_filter.client
+    client.set(GENERATION_KEY, "old.100.3")
+
+    counts = mask_filter.rebuild(BloomFilter.for_capacity(100, 0.001), batch_size=2)
+
+    assert counts == (3, 1)
+    assert client.get(GENERATION_KEY).decode().endswith(".1438.10")
+    assert client.get(BUILDING_KEY) is None
+    assert client.expires == {
+        "mask_filter:v1:old:live": 3600,
+        "mask_filter:v1:old:deleted": 3600,
+    }
+    assert all(mask_filter.might_have_address(address) for address in addresses)
+    assert not mask_filter.might_have_address("unknown")
+    assert mask_filter.might_have_deleted("deleted_hash")
+    assert not mask_filter.might_have_deleted("other_hash")
+
+
+@pytest.mark.django_db
+def test_new_and_deleted_masks_are_added(mask_filter: MaskLookupFilter) -> None:
+    mask_filter.rebuild(BloomFilter.for_capacity(100, 0.001))
+    client: Any = mask_filter.client
+    # A rebuild that started later is also updated
+    building = Generation("building", BloomFilter(500, 4))
+    client.set(BUILDING_KEY, str(building))
+
+    relay_address = baker.make(RelayAddress, user=make_free_test_user())
+    assert mask_filter.might_have_address(relay_address.address)
+    assert client.bits["mask_filter:v1:building:live"]
+
+    deleted_hash = address_hash(relay_address.address, domain="test.com")
+    relay_address.delete()
+    assert mask_filter.might_have_deleted(deleted_hash)
+    assert client.bits["mask_filter:v1:building:deleted"]
+
+
+def test_add_error_disables_filter(mask_filter: MaskLookupFilter) -> None:
+    client: Any = mask_filter.client
+    client.set(GENERATION_KEY, "current.100.3")
+    with patch.object(client, "pipeline", side_effect=ConnectionError()):
+        mask_filter.add_address("new")
+    assert client.get(GENERATION_KEY) is None
+    assert mask_filter.might_have_address("unknown")
+
+
+@pytest.mark.django_db
+@override_settings(SITE_ORIGIN="https://test.com", STATSD_ENABLED=True)
+def test_get_address_unknown_skips_database(
+    mask_filter: MaskLookupFilter, django_assert_num_queries: Any
+) -> None:
+    baker.make(DeletedAddress, address_hash=address_hash("deleted", domain="test.com"))
+    mask_filter.rebuild(BloomFilter.for_capacity(100, 0.001))
+
+    with django_assert_num_queries(0), MetricsMock() as mm:
+        with pytest.raises(RelayAddress.DoesNotExist):
+            _get_address("unknown@test.com")
+        with pytest.raises(RelayAddress.DoesNotExist):
+            _get_address("deleted@test.com")
+    mm.assert_incr_once("fx.private.relay.email_for_unknown_address")
+    mm.assert_incr_once("fx.private.relay.email_for_deleted_address")
+
+
+@pytest.mark.django_db
+@override_settings(SITE_ORIGIN="https://test.com", STATSD_ENABLED=True)
+def test_get_address_known_uses_database(mask_filter: MaskLookupFilter) -> None:
+    relay_address = baker.make(RelayAddress, user=make_free_test_user())
+    mask_filter.rebuild(BloomFilter.for_capacity(100, 0.001))
+    assert _get_address(f"{relay_address.address}@test.com") == relay_address
+
+
+@pytest.mark.django_db
+@override_settings(MASK_LOOKUP_FILTER_ENABLED=True, REDIS_URL="redis://redis")
+def test_rebuild_command() -> None:
+    client = FakeRedis()
+    out = StringIO()
+    with patch("django_redis.get_redis_connection", return_value=client):
+        baker.make(RelayAddress, user=make_free_test_user())
+        call_command("rebuild_mask_lookup_filter", batch_size=10, stdout=out)
+    assert out.getvalue().startswith("Added 1 addresses and 0 deleted addresses")
+
+
+@override_settings(MASK_LOOKUP_FILTER_ENABLED=False)
+def test_rebuild_command_disabled() -> None:
+    with pytest.raises(CommandError):
+        call_command("rebuild_mask_lookup_filter")
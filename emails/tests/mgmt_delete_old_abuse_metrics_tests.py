@@ -0,0 +1,60 @@
+from datetime import UTC, datetime, timedelta
+from io import StringIO
+from typing import Any
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+
+import pytest
+from model_bakery import baker
+
+from emails.management.commands.delete_old_abuse_metrics import (
+    delete_old_abuse_metrics,
+)
+from emails.models import AbuseMetrics
+
+COMMAND_NAME = "delete_old_abuse_metrics"
+
+
+def make_metrics(user: User, first_recorded: datetime) -> AbuseMetrics:
+    metrics: AbuseMetrics = baker.make(AbuseMetrics, user=user)
+    # first_recorded is auto_now_add, so set it after creation
+    AbuseMetrics.objects.filter(id=metrics.id).update(first_recorded=first_recorded)
+    return metrics
+
+
+@pytest.mark.django_db
+def test_delete_old_abuse_metrics_command() -> None:
+    user = baker.make(User)
+    now = datetime.now(UTC)
+    old = [make_metrics(user, now - timedelta(days=days)) for days in (2, 3, 4)]
+    today = baker.make(AbuseMetrics, user=user)
+    out = StringIO()
+
+    call_command(COMMAND_NAME, batch_size=2, stdout=out)
+
+    assert out.getvalue().startswith("Deleted 3 abuse metric records older than")
+    assert list(AbuseMetrics.objects.values_list("id", flat=True)) == [today.id]
+    assert not AbuseMetrics.objects.filter(id__in=[m.id for m in old]).exists()
+
+
+@pytest.mark.django_db
+def test_delete_old_abuse_metrics_in_batches(
+    django_assert_num_queries: Any,
+) -> None:
+    user = baker.make(User)
+    now = datetime.now(UTC)
+    for days in range(1, 6):
+        make_metrics(user, now - timedelta(days=days))
+
+    # 3 batches with a select and a delete, and a final empty select
+    with django_assert_num_queries(7):
+        deleted = delete_old_abuse_metrics(now - timedelta(hours=1), batch_size=2)
+
+    assert deleted == 5
+    assert not AbuseMetrics.objects.exists()
+
+
+def test_delete_old_abuse_metrics_command_invalid_batch_size() -> None:
+    with pytest.raises(CommandError, match="--batch-size must be at least 1"):
+        call_command(COMMAND_NAME, batch_size=0)
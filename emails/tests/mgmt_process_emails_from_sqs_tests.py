@@ -17,6 +17,7 @@ from markus.testing import MetricsMock
 from pytest import LogCaptureFixture
 from pytest_django.fixtures import SettingsWrapper
 
+from emails.management.worker_pool import TaskResult
 from emails.tests.views_tests import EMAIL_SNS_BODIES
 from privaterelay.tests.utils import log_extra, omit_markus_logs
 
@@ -116,6 +117,8 @@ def test_settings(settings: SettingsWrapper, tmp_path: Path) -> SettingsWrapper:
     settings.PROCESS_EMAIL_VISIBILITY_SECONDS = 120
     settings.PROCESS_EMAIL_WAIT_SECONDS = 5
     settings.PROCESS_EMAIL_MAX_SECONDS_PER_MESSAGE = 3
+    settings.PROCESS_EMAIL_WORKERS = 0
+    settings.PROCESS_EMAIL_CONCURRENCY = 0
     return settings
 
 
@@ -194,6 +197,57 @@ def mock_process_pool_future() -> Iterator[Mock]:
         yield mock_future
 
 
+@pytest.fixture
+def mock_worker_pool() -> Iterator[Mock]:
+    """
+    Replace WorkerPool with a mock that runs tasks in the test process.
+
+    Tasks are run on the first call to pool.wait(). If a task ID is in
+    mock_pool._timed_out, it is reported as timed out instead. If
+    mock_pool._per_wait is set, only that many tasks complete per call.
+    """
+    with patch(f"{MOCK_BASE}.WorkerPool", spec=True) as mock_pool_cls:
+        mock_pool = Mock(spec=["start", "close", "submit", "wait", "in_flight"])
+        mock_pool._tasks = []
+        mock_pool._timed_out = set()
+        mock_pool._wait_count = 0
+        mock_pool._per_wait = None
+
+        def mock_submit(*args: Any) -> int:
+            mock_pool._tasks.append(args)
+            return len(mock_pool._tasks) - 1
+
+        def mock_wait(timeout: float) -> list[TaskResult]:
+            func = mock_pool_cls.call_args[0][1]
+            mock_pool._wait_count += 1
+            results: list[TaskResult] = []
+            for task_id, args in enumerate(mock_pool._tasks):
+                if args is None:
+                    continue
+                if mock_pool._per_wait is not None and (
+                    len(results) >= mock_pool._per_wait
+                ):
+                    break
+                mock_pool._tasks[task_id] = None
+                if task_id in mock_pool._timed_out:
+                    results.append(
+                        TaskResult(task_id, worker_id=0, timed_out=True, duration_s=3)
+                    )
+                    continue
+                try:
+                    func(*args)
+                except BaseException as e:
+                    results.append(TaskResult(task_id, worker_id=0, error=e))
+                else:
+                    results.append(TaskResult(task_id, worker_id=0, duration_s=1))
+            return results
+
+        mock_pool.submit.side_effect = mock_submit
+        mock_pool.wait.side_effect = mock_wait
+        mock_pool_cls.return_value = mock_pool
+        yield mock_pool
+
+
 def fake_queue(*message_lists: list[Mock] | BaseException) -> Mock:
     """
     Return a mock version of boto3's SQS Queue
@@ -201,7 +255,10 @@ def fake_queue(*message_lists: list[Mock] | BaseException) -> Mock:
     Arguments:
     message_lists: A list of lists of messages, None if no messages
     """
-    queue = Mock(spec_set=("receive_messages", "load", "attributes"))
+    queue = Mock(spec_set=("receive_messages", "load", "attributes", "delete_messages"))
+    queue.delete_messages.side_effect = lambda Entries: {
+        "Successful": [{"Id": entry["Id"]} for entry in Entries]
+    }
     queue.attributes = {
         "ApproximateNumberOfMessages": 1,
         "ApproximateNumberOfMessagesDelayed": 2,
@@ -221,7 +278,7 @@ def fake_sqs_message(body: str) -> Mock:
     Only includes some attributes. For full spec, see:
     https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/sqs.html#message
     """
-    msg = Mock(spec_set=("queue_url", "receipt_handle", "body", "message_id", "delete"))
+    msg = Mock(spec_set=("queue_url", "receipt_handle", "body", "message_id"))
     msg.queue_url = (
         "https://sqs.us-east-1.amazonaws.example.com/123456789012/queue-name"
     )
@@ -231,6 +288,16 @@ def fake_sqs_message(body: str) -> Mock:
     return msg
 
 
+def deleted_receipts(mock_sqs_client: Mock) -> list[str]:
+    """Return the receipt handles of messages deleted from the fake queue."""
+    queue = mock_sqs_client.return_value
+    return [
+        entry["ReceiptHandle"]
+        for delete_call in queue.delete_messages.call_args_list
+        for entry in delete_call.kwargs["Entries"]
+    ]
+
+
 def make_client_error(
     message: str = "Unknown", code: str = "Unknown", operation_name: str = "Unknown"
 ) -> ClientError:
@@ -265,6 +332,8 @@ def test_no_messages(caplog: LogCaptureFixture, test_settings: SettingsWrapper)
         "verbosity": 2,
         "visibility_seconds": 120,
         "wait_seconds": 5,
+        "workers": 0,
+        "concurrency": 0,
     }
 
     assert rec2.getMessage() == "Cycle 0: processed 0 messages"
@@ -363,7 +432,7 @@ def test_no_body(mock_sqs_client: Mock, caplog: LogCaptureFixture) -> None:
     summary = summary_from_exit_log(caplog)
     assert summary["failed_messages"] == 1
     assert summary["cycles"] == 2
-    msg.delete.assert_not_called()
+    assert deleted_receipts(mock_sqs_client) == []
 
 
 def test_no_body_deleted(
@@ -377,7 +446,7 @@ def test_no_body_deleted(
     summary = summary_from_exit_log(caplog)
     assert summary["failed_messages"] == 1
     assert summary["cycles"] == 2
-    msg.delete.assert_called_once_with()
+    assert deleted_receipts(mock_sqs_client) == [msg.receipt_handle]
 
 
 def test_ses_temp_failure(
@@ -403,7 +472,7 @@ def test_ses_temp_failure(
     summary = summary_from_exit_log(caplog)
     assert summary["total_messages"] == 1
     assert summary["failed_messages"] == 1
-    msg.delete.assert_not_called()
+    assert deleted_receipts(mock_sqs_client) == []
 
 
 def test_ses_generic_failure(
@@ -418,7 +487,7 @@ def test_ses_generic_failure(
     summary = summary_from_exit_log(caplog)
     assert summary["total_messages"] == 1
     assert summary["failed_messages"] == 1
-    msg.delete.assert_not_called()
+    assert deleted_receipts(mock_sqs_client) == []
 
 
 def test_ses_python_error(
@@ -436,7 +505,7 @@ def test_ses_python_error(
     summary = summary_from_exit_log(caplog)
     assert summary["total_messages"] == 1
     assert summary["failed_messages"] == 1
-    msg.delete.assert_not_called()
+    assert deleted_receipts(mock_sqs_client) == []
     rec2 = omit_markus_logs(caplog)[1]
     assert rec2.msg == "Message processed"
     rec2_extra = log_extra(rec2)
@@ -459,7 +528,7 @@ def test_ses_slow(
     call_command(COMMAND_NAME)
     summary = summary_from_exit_log(caplog)
     assert summary["total_messages"] == 1
-    msg.delete.assert_called()
+    assert deleted_receipts(mock_sqs_client) == [msg.receipt_handle]
     rec2 = omit_markus_logs(caplog)[1]
     assert rec2.msg == "Message processed"
     rec2_extra = log_extra(rec2)
@@ -485,7 +554,7 @@ def test_ses_timeout(
     summary = summary_from_exit_log(caplog)
     assert summary["total_messages"] == 1
     assert summary["failed_messages"] == 1
-    msg.delete.assert_not_called()
+    assert deleted_receipts(mock_sqs_client) == []
     rec2 = omit_markus_logs(caplog)[1]
     assert rec2.msg == "Message processed"
     rec2_extra = log_extra(rec2)
@@ -506,7 +575,7 @@ def test_db_is_unusable_is_closed(
     call_command(COMMAND_NAME)
     summary = summary_from_exit_log(caplog)
     assert summary["total_messages"] == 1
-    msg.delete.assert_called()
+    assert deleted_receipts(mock_sqs_client) == [msg.receipt_handle]
     rec2 = omit_markus_logs(caplog)[1]
     assert rec2.msg == "Message processed"
     rec2_extra = log_extra(rec2)
@@ -585,3 +654,147 @@ def test_command_sqs_client_error(
         call_command(COMMAND_NAME)
     assert str(err.value) == "Unable to connect to SQS"
     mock_sqs_client.assert_called_once_with(test_settings.AWS_SQS_EMAIL_QUEUE_URL)
+
+
+def test_workers_process_batch(
+    mock_worker_pool: Mock,
+    mock_process_pool_future: Mock,
+    mock_sns_inbound_logic: Mock,
+    mock_sqs_client: Mock,
+    test_settings: SettingsWrapper,
+    caplog: LogCaptureFixture,
+) -> None:
+    """With PROCESS_EMAIL_WORKERS, messages run in the long-lived worker pool."""
+    test_settings.PROCESS_EMAIL_WORKERS = 2
+    msgs = [fake_sqs_message(json.dumps(TEST_SNS_MESSAGE)) for _ in range(3)]
+    mock_sqs_client.return_value = fake_queue(msgs, [])
+    call_command(COMMAND_NAME)
+
+    summary = summary_from_exit_log(caplog)
+    assert summary["total_messages"] == 3
+    assert "failed_messages" not in summary
+    assert deleted_receipts(mock_sqs_client) == [msg.receipt_handle for msg in msgs]
+    assert mock_sns_inbound_logic.call_count == 3
+    assert mock_worker_pool.submit.call_count == 3
+    assert mock_worker_pool.wait.call_count == 1
+    mock_worker_pool.close.assert_called_once_with()
+    # The per-message Pool is not used
+    mock_process_pool_future.wait.assert_not_called()
+
+    msg_logs = [
+        rec for rec in omit_markus_logs(caplog) if rec.msg == "Message processed"
+    ]
+    assert len(msg_logs) == 3
+    assert log_extra(msg_logs[0]) == {
+        "message_process_time_s": 1,
+        "message_queued_time_s": 0,
+        "sqs_message_id": msgs[0].message_id,
+        "success": True,
+        "worker_id": 0,
+    }
+
+
+def test_workers_failures(
+    mock_worker_pool: Mock,
+    mock_sns_inbound_logic: Mock,
+    mock_sqs_client: Mock,
+    test_settings: SettingsWrapper,
+    caplog: LogCaptureFixture,
+) -> None:
+    """Invalid, failed, and timed out messages are reported by the worker pool."""
+    test_settings.PROCESS_EMAIL_WORKERS = 2
+    bad_msg = fake_sqs_message("I am a string, not JSON")
+    error_msg = fake_sqs_message(json.dumps(TEST_SNS_MESSAGE))
+    slow_msg = fake_sqs_message(json.dumps(TEST_SNS_MESSAGE))
+    mock_sqs_client.return_value = fake_queue([bad_msg, error_msg, slow_msg], [])
+    mock_sns_inbound_logic.side_effect = ValueError("bad stuff")
+    mock_worker_pool._timed_out.add(1)
+    call_command(COMMAND_NAME)
+
+    summary = summary_from_exit_log(caplog)
+    assert summary["total_messages"] == 3
+    assert summary["failed_messages"] == 3
+    assert deleted_receipts(mock_sqs_client) == []
+    assert mock_worker_pool.submit.call_count == 2
+
+    msg_extras = {
+        log_extra(rec)["sqs_message_id"]: log_extra(rec)
+        for rec in omit_markus_logs(caplog)
+        if rec.msg == "Message processed"
+    }
+    assert msg_extras[bad_msg.message_id]["error"].startswith(
+        "Failed to load message.body"
+    )
+    assert msg_extras[error_msg.message_id]["error_type"] == "ValueError"
+    assert msg_extras[slow_msg.message_id]["error"] == "Timed out after 3.0 seconds."
+
+
+def test_concurrency_polls_while_messages_in_progress(
+    mock_worker_pool: Mock,
+    mock_sqs_client: Mock,
+    test_settings: SettingsWrapper,
+    caplog: LogCaptureFixture,
+) -> None:
+    """With PROCESS_EMAIL_CONCURRENCY, the next batch is polled before all finish."""
+    test_settings.PROCESS_EMAIL_CONCURRENCY = 3
+    test_settings.PROCESS_EMAIL_MAX_SECONDS = 4
+    msgs = [fake_sqs_message(json.dumps(TEST_SNS_MESSAGE)) for _ in range(4)]
+    mock_sqs_client.return_value = fake_queue(msgs[:3], msgs[3:], [])
+    mock_worker_pool._per_wait = 1
+    call_command(COMMAND_NAME)
+
+    summary = summary_from_exit_log(caplog)
+    assert summary["total_messages"] == 4
+    assert "failed_messages" not in summary
+    assert deleted_receipts(mock_sqs_client) == [msg.receipt_handle for msg in msgs]
+
+    # The pool size defaults to the concurrency
+    (start_log,) = (
+        rec for rec in omit_markus_logs(caplog) if rec.msg == "Started worker processes"
+    )
+    assert log_extra(start_log)["workers"] == 3
+
+    queue = mock_sqs_client.return_value
+    poll_args = [
+        (poll.kwargs["MaxNumberOfMessages"], poll.kwargs["WaitTimeSeconds"])
+        for poll in queue.receive_messages.call_args_list
+    ]
+    # First poll fills the window, later polls only fill the space left
+    assert poll_args == [(3, 5), (2, 1), (2, 1)]
+
+    cycle_extras = [
+        log_extra(rec)
+        for rec in omit_markus_logs(caplog)
+        if rec.msg.startswith("Cycle ")
+    ]
+    assert [extra.get("in_progress_count", 0) for extra in cycle_extras] == [1, 1, 0]
+
+
+def test_delete_messages_failure_is_logged(
+    mock_sqs_client: Mock, caplog: LogCaptureFixture
+) -> None:
+    """If a message can not be deleted, it is logged."""
+    msg = fake_sqs_message(json.dumps(TEST_SNS_MESSAGE))
+    queue = fake_queue([msg], [])
+    queue.delete_messages.side_effect = lambda Entries: {
+        "Failed": [
+            {
+                "Id": "0",
+                "SenderFault": True,
+                "Code": "ReceiptHandleIsInvalid",
+                "Message": "The receipt handle is not valid.",
+            }
+        ]
+    }
+    mock_sqs_client.return_value = queue
+    call_command(COMMAND_NAME)
+
+    assert deleted_receipts(mock_sqs_client) == [msg.receipt_handle]
+    (failed_log,) = (
+        rec for rec in omit_markus_logs(caplog) if rec.msg == "Failed to delete message"
+    )
+    assert log_extra(failed_log) == {
+        "sqs_message_id": msg.message_id,
+        "code": "ReceiptHandleIsInvalid",
+        "error": "The receipt handle is not valid.",
+    }
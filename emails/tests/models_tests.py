@@ -12,6 +12,7 @@ from allauth.socialaccount.models import SocialAccount
 from model_bakery import baker
 from waffle.testutils import override_flag
 
+from privaterelay.models import Profile
 from privaterelay.tests.utils import (
     make_free_test_user,
     make_premium_test_user,
@@ -24,13 +25,18 @@ from ..exceptions import (
     CannotMakeAddressException,
     DomainAddrDuplicateException,
     DomainAddrUnavailableException,
+    DomainAddrUpdateException,
+    RelayAddrFreeTierLimitException,
 )
 from ..models import (
+    AbuseMetrics,
     DeletedAddress,
     DomainAddress,
     RelayAddress,
     address_hash,
+    available_relay_address,
     get_domain_numerical,
+    increment_mask_counters,
 )
 from ..utils import get_domains_from_settings
 
@@ -231,6 +237,64 @@ class RelayAddressTest(TestCase):
         )
         assert not repeat_deleted_relay_address.address == address
 
+    def test_relay_address_create_repeats_existing_address_invalid(self) -> None:
+        address = "taken-address"
+        RelayAddress.objects.create(user=baker.make(User), address=address)
+        relay_address = RelayAddress.objects.create(
+            user=baker.make(User), address=address
+        )
+        assert relay_address.address != address
+
+    def test_available_relay_address_checks_batch_in_one_query(self) -> None:
+        address = "free-address"
+        with self.assertNumQueries(1):
+            assert available_relay_address(address, "test.com") == address
+
+    def test_available_relay_address_skips_used_addresses(self) -> None:
+        RelayAddress.objects.create(user=baker.make(User), address="taken1")
+        baker.make(
+            DeletedAddress, address_hash=address_hash("deleted1", domain="test.com")
+        )
+        baker.make(
+            DeletedAddress, address_hash=address_hash("deleted2", domain="test.com")
+        )
+        with patch(
+            "emails.models.address_default",
+            side_effect=["angry0123", "taken1", "deleted2", "free1"],
+        ):
+            address = available_relay_address("deleted1", "test.com", batch_size=5)
+        assert address == "free1"
+
+    def test_relay_address_create_retries_unique_address_race(self) -> None:
+        RelayAddress.objects.create(user=baker.make(User), address="raced")
+        with patch(
+            "emails.models.available_relay_address", side_effect=["raced", "free2"]
+        ):
+            relay_address = RelayAddress.objects.create(user=baker.make(User))
+        assert relay_address.address == "free2"
+        assert RelayAddress.objects.filter(address="free2").exists()
+
+    def test_make_relay_addresses(self) -> None:
+        relay_addresses = RelayAddress.make_relay_addresses(
+            self.storageless_user,
+            [{"description": "Stored?"}, {"block_list_emails": True}],
+        )
+        assert len(relay_addresses) == 2
+        assert all(relay_address.id for relay_address in relay_addresses)
+        assert relay_addresses[0].description == ""
+        assert relay_addresses[1].block_list_emails
+        assert RelayAddress.objects.filter(user=self.storageless_user).count() == 2
+        abuse_metrics = AbuseMetrics.objects.get(user=self.storageless_user)
+        assert abuse_metrics.num_address_created_per_day == 2
+
+    def test_make_relay_addresses_over_free_limit_raises(self) -> None:
+        baker.make(RelayAddress, user=self.user)
+        with pytest.raises(RelayAddrFreeTierLimitException):
+            RelayAddress.make_relay_addresses(
+                self.user, [{}] * settings.MAX_NUM_FREE_ALIASES
+            )
+        assert RelayAddress.objects.filter(user=self.user).count() == 1
+
     @patch("emails.validators.badwords", return_value=BadWords(short=set(), long=[]))
     @patch("emails.validators.blocklist", return_value=set(["blocked-word"]))
     def test_address_contains_blocklist_invalid(
@@ -620,6 +684,32 @@ class DomainAddressTest(TestCase):
         self.user.profile.refresh_from_db()
         assert self.user.profile.last_engagement == pre_save_last_engagement
 
+    def test_save_cannot_change_address(self) -> None:
+        domain_address = DomainAddress.make_domain_address(self.user, address="first")
+        domain_address.address = "second"
+        with pytest.raises(DomainAddrUpdateException):
+            domain_address.save()
+
+        loaded = DomainAddress.objects.get(id=domain_address.id)
+        loaded.address = "second"
+        with pytest.raises(DomainAddrUpdateException):
+            loaded.save()
+
+    def test_save_with_deferred_address_cannot_change_address(self) -> None:
+        domain_address = DomainAddress.make_domain_address(self.user, address="first")
+        loaded = DomainAddress.objects.defer("address").get(id=domain_address.id)
+        loaded.address = "second"
+        with pytest.raises(DomainAddrUpdateException):
+            loaded.save()
+
+    def test_save_with_profile_is_one_query(self) -> None:
+        domain_address = DomainAddress.make_domain_address(self.user, address="save")
+        loaded = DomainAddress.objects.get(id=domain_address.id)
+        profile = Profile.objects.get(user=self.user)
+        loaded.last_used_at = datetime.now(UTC)
+        with self.assertNumQueries(1):
+            loaded.save(profile=profile)
+
     def test_delete_updates_profile_last_engagement(self) -> None:
         domain_address = DomainAddress.make_domain_address(self.user, address="delete")
         assert self.user.profile.last_engagement
@@ -633,3 +723,56 @@ class DomainAddressTest(TestCase):
     def test_metrics_id(self):
         address = DomainAddress.objects.create(user=self.user, address="metrics")
         assert address.metrics_id == f"D{address.id}"
+
+
+class IncrementMaskCountersTest(TestCase):
+    """Tests for increment_mask_counters()"""
+
+    def setUp(self) -> None:
+        self.address = baker.make(
+            RelayAddress, num_forwarded=1, num_level_one_trackers_blocked=None
+        )
+
+    def test_increments_counters_in_one_query(self) -> None:
+        with self.assertNumQueries(1):
+            increment_mask_counters(
+                self.address,
+                num_forwarded=1,
+                num_blocked=2,
+                num_level_one_trackers_blocked=3,
+                num_replied=4,
+                used=True,
+            )
+        assert self.address.num_forwarded == 2
+        assert self.address.last_used_at
+
+        self.address.refresh_from_db()
+        assert self.address.num_forwarded == 2
+        assert self.address.num_blocked == 2
+        assert self.address.num_level_one_trackers_blocked == 3
+        assert self.address.num_replied == 4
+        assert self.address.num_spam == 0
+        assert self.address.last_used_at
+
+    def test_stale_instances_are_all_counted(self) -> None:
+        stale_address = RelayAddress.objects.get(id=self.address.id)
+        increment_mask_counters(self.address, num_forwarded=1)
+        increment_mask_counters(stale_address, num_forwarded=1)
+
+        self.address.refresh_from_db()
+        assert self.address.num_forwarded == 3
+
+    def test_domain_address(self) -> None:
+        user = make_premium_test_user()
+        user.profile.add_subdomain("counters")
+        address = DomainAddress.objects.create(user=user, address="counters")
+
+        increment_mask_counters(address, num_blocked=1)
+
+        address.refresh_from_db()
+        assert address.num_blocked == 1
+        assert address.last_used_at is None
+
+    def test_no_increments_no_query(self) -> None:
+        with self.assertNumQueries(0):
+            increment_mask_counters(self.address)
@@ -1,9 +1,27 @@
-from unittest.mock import patch
+import base64
+from collections.abc import Iterator
+from datetime import UTC, datetime, timedelta
+from unittest.mock import Mock, patch
 
+from django.core.cache import cache
 from django.core.exceptions import SuspiciousOperation
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
-from ..sns import _grab_keyfile
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from OpenSSL import crypto
+
+from ..sns import (
+    NOTIFICATION_HASH_FORMAT,
+    _clear_certificate_cache,
+    _grab_keyfile,
+    verify_from_sns,
+)
+
+CERT_URL = "https://sns.us-east-1.amazonaws.com/SimpleNotificationService-test.pem"
 
 
 class GrabKeyfileTest(TestCase):
@@ -13,3 +31,132 @@ class GrabKeyfileTest(TestCase):
         with self.assertRaises(SuspiciousOperation):
             _grab_keyfile(cert_url)
         mock_urlopen.assert_not_called()
+
+
+def make_signing_key() -> tuple[rsa.RSAPrivateKey, bytes]:
+    """Create a private key and a matching self-signed PEM certificate."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "sns.amazonaws.com")])
+    now = datetime.now(UTC)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(days=1))
+        .not_valid_after(now + timedelta(days=30))
+        .sign(key, hashes.SHA256())
+    )
+    return key, cert.public_bytes(serialization.Encoding.PEM)
+
+
+def make_notification(key: rsa.RSAPrivateKey, message: str = "Hello") -> dict:
+    """Create a SNS notification signed with the key."""
+    json_body = {
+        "Type": "Notification",
+        "MessageId": "a-message-id",
+        "TopicArn": "arn:aws:sns:us-east-1:111222333444:relay",
+        "Subject": "Test",
+        "Message": message,
+        "Timestamp": "2024-01-01T00:00:00.000Z",
+        "SigningCertURL": CERT_URL,
+    }
+    pkey = crypto.PKey.from_cryptography_key(key)
+    data = NOTIFICATION_HASH_FORMAT.format(**json_body).encode("utf-8")
+    json_body["Signature"] = base64.b64encode(crypto.sign(pkey, data, "sha1")).decode()
+    return json_body
+
+
+@pytest.fixture(autouse=True)
+def clear_certificate_caches() -> Iterator[None]:
+    _clear_certificate_cache()
+    cache.clear()
+    yield
+    _clear_certificate_cache()
+    cache.clear()
+
+
+@pytest.fixture
+def mock_urlopen() -> Iterator[Mock]:
+    with patch("emails.sns.urlopen") as mock_urlopen:
+        yield mock_urlopen
+
+
+def serve_certificates(mock_urlopen: Mock, *pemfiles: bytes) -> None:
+    mock_urlopen.return_value.read.side_effect = list(pemfiles)
+
+
+def test_verify_from_sns_parses_certificate_once(mock_urlopen: Mock) -> None:
+    key, pemfile = make_signing_key()
+    serve_certificates(mock_urlopen, pemfile)
+
+    with patch(
+        "emails.sns.crypto.load_certificate", wraps=crypto.load_certificate
+    ) as mock_load:
+        for num in range(3):
+            json_body = make_notification(key, f"Message {num}")
+            assert verify_from_sns(json_body) == json_body
+
+    mock_urlopen.assert_called_once_with(CERT_URL)
+    mock_load.assert_called_once()
+
+
+def test_verify_from_sns_uses_shared_cache(mock_urlopen: Mock) -> None:
+    key, pemfile = make_signing_key()
+    cache.set(CERT_URL, pemfile)
+
+    json_body = make_notification(key)
+    assert verify_from_sns(json_body) == json_body
+    mock_urlopen.assert_not_called()
+
+
+def test_verify_from_sns_bad_signature_fails(mock_urlopen: Mock) -> None:
+    key, pemfile = make_signing_key()
+    serve_certificates(mock_urlopen, pemfile)
+    json_body = make_notification(key)
+    json_body["Message"] = "Changed"
+
+    with pytest.raises(crypto.Error):
+        verify_from_sns(json_body)
+    # The certificate was just loaded, so it is not downloaded again
+    mock_urlopen.assert_called_once_with(CERT_URL)
+
+
+def test_verify_from_sns_refreshes_rotated_certificate(mock_urlopen: Mock) -> None:
+    old_key, old_pemfile = make_signing_key()
+    new_key, new_pemfile = make_signing_key()
+    serve_certificates(mock_urlopen, old_pemfile, new_pemfile)
+    verify_from_sns(make_notification(old_key))
+
+    json_body = make_notification(new_key)
+    with patch("emails.sns.CERTIFICATE_REFRESH_SECONDS", 0):
+        assert verify_from_sns(json_body) == json_body
+    assert mock_urlopen.call_count == 2
+    assert cache.get(CERT_URL) == new_pemfile
+
+
+@override_settings(AWS_SNS_CERT_LOCAL_CACHE_SECONDS=0)
+def test_verify_from_sns_process_cache_expires(mock_urlopen: Mock) -> None:
+    key, pemfile = make_signing_key()
+    serve_certificates(mock_urlopen, pemfile)
+
+    with patch(
+        "emails.sns.crypto.load_certificate", wraps=crypto.load_certificate
+    ) as mock_load:
+        verify_from_sns(make_notification(key))
+        verify_from_sns(make_notification(key))
+
+    # The expired entry is reloaded from the shared cache
+    mock_urlopen.assert_called_once_with(CERT_URL)
+    assert mock_load.call_count == 2
+
+
+def test_verify_from_sns_checks_cert_url_origin(mock_urlopen: Mock) -> None:
+    key, _ = make_signing_key()
+    json_body = make_notification(key)
+    json_body["SigningCertURL"] = "https://attacker.com/cert.pem"
+
+    with pytest.raises(SuspiciousOperation):
+        verify_from_sns(json_body)
+    mock_urlopen.assert_not_called()
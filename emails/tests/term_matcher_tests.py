@@ -0,0 +1,41 @@
+"""Tests for emails/term_matcher.py"""
+
+import pytest
+
+from emails.term_matcher import TermMatcher
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        ("he", True),
+        ("she", True),
+        ("ushers", True),
+        ("hers", True),
+        ("ahishe", True),
+        ("h", False),
+        ("hi", False),
+        ("sh", False),
+        ("", False),
+    ],
+)
+def test_contains_term(value: str, expected: bool) -> None:
+    matcher = TermMatcher(["he", "she", "his", "hers"])
+    assert matcher.contains_term(value) is expected
+
+
+def test_contains_term_found_through_fallback() -> None:
+    # After "abc", the next "a" does not continue "abcx", so the search continues
+    # from the "bc" prefix of "bcab"
+    matcher = TermMatcher(["abcx", "bcab", "cd"])
+    assert matcher.contains_term("abcabx")
+    assert matcher.contains_term("zzabcd")
+    assert not matcher.contains_term("abcac")
+
+
+def test_contains_term_no_terms() -> None:
+    assert not TermMatcher([]).contains_term("anything")
+
+
+def test_contains_term_empty_term() -> None:
+    assert TermMatcher([""]).contains_term("anything")
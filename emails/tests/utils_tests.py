@@ -3,23 +3,37 @@ import json
 import random
 import zlib
 from base64 import b64encode
+from email import message_from_bytes
+from email.message import EmailMessage
 from typing import Literal, TypedDict
 from unittest.mock import patch
 from urllib.parse import quote_plus
 
 from django.test import TestCase, override_settings
 
+import jwcrypto.jwe
+import jwcrypto.jwk
 import pytest
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDFExpand
 
+from emails.policy import relay_policy
 from emails.utils import (
+    REPLY_METADATA_PREFIX,
     InvalidFromHeader,
     decode_dict_gza85,
+    decrypt_reply_metadata,
+    derive_reply_keys,
     encode_dict_gza85,
+    encrypt_reply_metadata,
     generate_from_header,
     get_domains_from_settings,
     get_email_domain_from_settings,
+    message_as_bytes,
     parse_email_header,
     remove_trackers,
+    scan_trackers,
 )
 
 
@@ -397,6 +411,70 @@ class RemoveTrackers(TestCase):
         assert general_removed == 0
         assert general_count == 0
 
+    def test_strict_level_replaces_strict_trackers(self):
+        content = (
+            '<a href="https://strict.tracker.com/foo/bar.html">A link</a>\n'
+            + '<img src="https://open.tracker.com/foo/bar.jpg">An image</img>'
+        )
+        changed_content, tracker_details = remove_trackers(
+            content, self.from_address, self.datetime_now, level="strict"
+        )
+        assert changed_content == (
+            f'<a href="{self.url}'
+            f'{self.url_trackerwarning_data("https://strict.tracker.com/foo/bar.html")}'
+            '">A link</a>\n'
+            '<img src="https://open.tracker.com/foo/bar.jpg">An image</img>'
+        )
+        assert tracker_details["tracker_removed"] == 1
+        assert tracker_details["level_one"] == {
+            "count": 1,
+            "trackers": {"open.tracker.com": 1},
+        }
+
+    def test_tracker_after_redirect_replaced(self):
+        """A tracker in the path or query of another URL is found."""
+        link = "https://example.com/r?u=https://trckr.com/pixel.gif"
+        content = f'<img src="{link}">'
+        changed_content, tracker_details = remove_trackers(
+            content, self.from_address, self.datetime_now
+        )
+        assert changed_content == (
+            f'<img src="{self.url}{self.url_trackerwarning_data(link)}">'
+        )
+        assert tracker_details["level_one"]["trackers"] == {"trckr.com": 1}
+
+    def test_tracker_before_scheme_not_replaced(self):
+        """A tracker domain that appears before the :// is not a tracker link."""
+        content = "<a href='mail.trckr.com?next=https://example.com'>A link</a>"
+        changed_content, tracker_details = remove_trackers(
+            content, self.from_address, self.datetime_now
+        )
+        assert changed_content == content
+        assert tracker_details["tracker_removed"] == 0
+
+    def test_neighboring_attributes_are_not_replaced(self):
+        """Only the quoted URL is replaced, not other attributes without spaces."""
+        content = '<img class="pixel"src="https://trckr.com/o.gif"alt="">'
+        changed_content, tracker_details = remove_trackers(
+            content, self.from_address, self.datetime_now
+        )
+        expected_link = self.url_trackerwarning_data("https://trckr.com/o.gif")
+        assert changed_content == (
+            f'<img class="pixel"src="{self.url}{expected_link}"alt="">'
+        )
+        assert tracker_details["tracker_removed"] == 1
+
+    def test_level_two_counted_in_same_pass(self):
+        content = (
+            '<a href="https://strict.tracker.com/a">A</a>'
+            ' <a href="https://strict.tracker.com/b">B</a>'
+            ' <img src="https://trckr.com/o.gif">'
+        )
+        _, level_one, level_two, replaced = scan_trackers(content)
+        assert level_one == {"count": 1, "trackers": {"trckr.com": 1}}
+        assert level_two == {"count": 2, "trackers": {"strict.tracker.com": 2}}
+        assert replaced == 0
+
 
 def test_encode_dict_gza85() -> None:
     data = {"key": "value"}
@@ -451,3 +529,99 @@ def test_decode_dict_gza85_invalid_encoded_raises(
 ):
     with pytest.raises(expected_error, match=expected_regex):
         decode_dict_gza85(invalid_encoded)
+
+
+MIXED_8BIT_EMAIL = (
+    "From: sender@example.com\r\n"
+    "To: mask@test.com\r\n"
+    "Subject: Attachment\r\n"
+    "MIME-Version: 1.0\r\n"
+    "Content-Type: multipart/mixed; boundary=BOUNDARY\r\n"
+    "\r\n"
+    "--BOUNDARY\r\n"
+    "Content-Type: text/plain; charset=utf-8\r\n"
+    "Content-Transfer-Encoding: 8bit\r\n"
+    "\r\n"
+    "H\u00e9llo w\u00f6rld \u2713\r\n"
+    "--BOUNDARY\r\n"
+    "Content-Type: application/octet-stream\r\n"
+    "Content-Transfer-Encoding: base64\r\n"
+    "\r\n"
+    "AAECAwQFBgcICQoLDA0ODxAREhMUFRYXGBkaGxwdHh8=\r\n"
+    "--BOUNDARY--\r\n"
+).encode()
+
+
+def _parse_email(raw: bytes) -> EmailMessage:
+    email = message_from_bytes(raw, policy=relay_policy)
+    assert isinstance(email, EmailMessage)
+    return email
+
+
+def test_message_as_bytes_matches_as_string() -> None:
+    email = _parse_email(MIXED_8BIT_EMAIL)
+    del email["Subject"]
+    email["Subject"] = "Replaced \u2713"
+    text_body = email.get_body("plain")
+    assert isinstance(text_body, EmailMessage)
+    text_body.set_content(text_body.get_content() + "More \u00e9")
+
+    assert message_as_bytes(email) == email.as_string().encode()
+
+
+def test_message_as_bytes_passes_attachments_through() -> None:
+    email = _parse_email(MIXED_8BIT_EMAIL)
+
+    data = message_as_bytes(email)
+
+    assert b"\nAAECAwQFBgcICQoLDA0ODxAREhMUFRYXGBkaGxwdHh8=\n" in data
+    assert data == email.as_string().encode()
+
+
+@pytest.mark.parametrize("message_id", [b"", b"CAFabc123", b"x" * 100])
+def test_derive_reply_keys_matches_hkdf_expand(message_id: bytes) -> None:
+    lookup_key, encryption_key = derive_reply_keys(message_id)
+
+    assert lookup_key == HKDFExpand(
+        algorithm=hashes.SHA256(), length=16, info=b"replay replies lookup key"
+    ).derive(message_id)
+    assert encryption_key == HKDFExpand(
+        algorithm=hashes.SHA256(), length=32, info=b"replay replies encryption key"
+    ).derive(message_id)
+
+
+_REPLY_METADATA = {"message-id": "<msg-id@example.com>", "from": "a@example.com"}
+
+
+def test_encrypt_reply_metadata_round_trip() -> None:
+    _, key = derive_reply_keys(b"msg-id")
+
+    encrypted = encrypt_reply_metadata(key, _REPLY_METADATA)
+
+    assert encrypted.startswith(REPLY_METADATA_PREFIX)
+    assert encrypt_reply_metadata(key, _REPLY_METADATA) != encrypted
+    assert json.loads(decrypt_reply_metadata(key, encrypted)) == _REPLY_METADATA
+
+
+def test_decrypt_reply_metadata_wrong_key_raises() -> None:
+    _, key = derive_reply_keys(b"msg-id")
+    _, other_key = derive_reply_keys(b"other-msg-id")
+    encrypted = encrypt_reply_metadata(key, _REPLY_METADATA)
+
+    with pytest.raises(InvalidTag):
+        decrypt_reply_metadata(other_key, encrypted)
+
+
+def test_decrypt_reply_metadata_jwe() -> None:
+    """Reply metadata encrypted as a JWE can still be decrypted."""
+    _, key = derive_reply_keys(b"msg-id")
+    jwk = jwcrypto.jwk.JWK(
+        kty="oct", k=base64.urlsafe_b64encode(key).rstrip(b"=").decode("ascii")
+    )
+    jwe = jwcrypto.jwe.JWE(
+        json.dumps(_REPLY_METADATA),
+        json.dumps({"alg": "dir", "enc": "A256GCM"}),
+        recipient=jwk,
+    ).serialize(compact=True)
+
+    assert json.loads(decrypt_reply_metadata(key, jwe)) == _REPLY_METADATA
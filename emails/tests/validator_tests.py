@@ -8,6 +8,7 @@ from waffle.testutils import override_flag
 
 from privaterelay.tests.utils import make_free_test_user, make_premium_test_user
 
+from ..apps import BadWords
 from ..models import DomainAddress, RelayAddress
 from ..validators import (
     has_bad_words,
@@ -40,6 +41,19 @@ class HasBadWordsTest(TestCase):
         assert has_bad_words("poo")
         assert not has_bad_words("pools")
 
+    def test_has_bad_words_contains_long_word(self) -> None:
+        assert has_bad_words("myangryaddress")
+        assert not has_bad_words("myhappyaddress")
+
+    @patch(
+        "emails.validators.badwords",
+        return_value=BadWords(short={"bad"}, long=["mocked"]),
+    )
+    def test_has_bad_words_with_mocked_bad_words(self, mock_badwords: Mock) -> None:
+        assert has_bad_words("bad")
+        assert has_bad_words("unmocked1")
+        assert not has_bad_words("angry")
+
 
 class IsBlocklistedTest(TestCase):
     def test_is_blocklisted_with_blocked_word(self) -> None:
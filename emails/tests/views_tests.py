@@ -14,9 +14,12 @@ from uuid import uuid4
 
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import connection
 from django.http import HttpResponse
 from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
 import pytest
 from allauth.socialaccount.models import SocialAccount
@@ -46,6 +49,7 @@ from emails.utils import (
     get_message_id_bytes,
 )
 from emails.views import (
+    SUBDOMAIN_OWNER_CACHE_KEY_PREFIX,
     EmailDroppedReason,
     RawComplaintData,
     ReplyHeadersNotFound,
@@ -55,8 +59,10 @@ from emails.views import (
     _get_address,
     _get_address_if_exists,
     _get_complaint_data,
-    _get_keys_from_headers,
     _get_mask_by_metrics_id,
+    _get_reply_keys_from_headers,
+    _get_reply_record_from_headers,
+    _get_wrapped_email_chrome,
     _record_receipt_verdicts,
     _replace_headers,
     _set_forwarded_first_reply,
@@ -65,6 +71,7 @@ from emails.views import (
     log_email_dropped,
     reply_requires_premium_test,
     validate_sns_arn_and_type,
+    wrap_html_email,
     wrapped_email_test,
 )
 from privaterelay.ftl_bundles import main
@@ -395,7 +402,8 @@ class SNSNotificationTestBase(TestCase):
         source = self.mock_send_raw_email.call_args[1]["Source"]
         destinations = self.mock_send_raw_email.call_args[1]["Destinations"]
         assert len(destinations) == 1
-        raw_message = self.mock_send_raw_email.call_args[1]["RawMessage"]["Data"]
+        raw_data = self.mock_send_raw_email.call_args[1]["RawMessage"]["Data"]
+        raw_message = raw_data.decode()
         assert "\n\n" in raw_message, "Never found message body!"
         if expected_source is not None:
             assert source == expected_source
@@ -1305,7 +1313,9 @@ class ComplaintHandlingTest(TestCase):
         call = self.mock_ses_client.send_raw_email.call_args
         assert call.kwargs["Source"] == settings.RELAY_FROM_ADDRESS
         assert call.kwargs["Destinations"] == [self.user.email]
-        msg_without_newlines = call.kwargs["RawMessage"]["Data"].replace("\n", "")
+        msg_without_newlines = (
+            call.kwargs["RawMessage"]["Data"].decode().replace("\n", "")
+        )
         assert "This mask has been deactivated" in msg_without_newlines
         assert self.ra.full_address in msg_without_newlines
 
@@ -2062,7 +2072,7 @@ class SNSNotificationRemoveEmailsInS3Test(TestCase):
         assert response.content == b"noreply address is not supported."
 
     @override_settings(STATSD_ENABLED=True)
-    @patch("emails.views._get_keys_from_headers")
+    @patch("emails.views._get_reply_record_from_headers")
     def test_noreply_headers_reply_email_in_s3_deleted(
         self, mocked_get_keys: Mock
     ) -> None:
@@ -2099,7 +2109,7 @@ class SNSNotificationRemoveEmailsInS3Test(TestCase):
         assert response.status_code == 400
 
     @override_settings(STATSD_ENABLED=True)
-    @patch("emails.views._get_reply_record_from_lookup_key")
+    @patch("emails.views._get_reply_record_from_headers")
     def test_no_reply_record_reply_email_in_s3_deleted(
         self, mocked_get_record: Mock
     ) -> None:
@@ -2116,13 +2126,11 @@ class SNSNotificationRemoveEmailsInS3Test(TestCase):
         assert response.status_code == 404
 
     @override_settings(STATSD_ENABLED=True)
-    @patch("emails.views._get_keys_from_headers")
-    @patch("emails.views._get_reply_record_from_lookup_key")
+    @patch("emails.views._get_reply_record_from_headers")
     def test_no_reply_record_reply_email_not_in_s3_deleted_ignored(
-        self, mocked_get_record: Mock, mocked_get_keys: Mock
+        self, mocked_get_record: Mock
     ) -> None:
         """If no DB match for In-Reply-To header, return 404."""
-        mocked_get_keys.return_value = ("lookup", "encryption")
         mocked_get_record.side_effect = Reply.DoesNotExist()
 
         with MetricsMock() as mm:
@@ -2269,13 +2277,14 @@ class SNSNotificationValidUserEmailsInS3Test(TestCase):
         self.assert_log_incoming_email_dropped(caplog, "user_deactivated")
 
     @patch("emails.views._reply_allowed")
-    @patch("emails.views._get_reply_record_from_lookup_key")
+    @patch("emails.views._get_reply_record_from_headers")
     def test_reply_not_allowed_email_in_s3_deleted(
         self, mocked_reply_record: Mock, mocked_reply_allowed: Mock
     ) -> None:
         # external user sending a reply to Relay user
         # where the replies were being exchanged but now the user
         # no longer has the premium subscription
+        mocked_reply_record.return_value = (Mock(), b"encryption")
         mocked_reply_allowed.return_value = False
 
         with self.assertLogs(INFO_LOG) as caplog:
@@ -2570,6 +2579,40 @@ class GetAddressTest(TestCase):
         with self.assertNoLogs(GLEAN_LOG, "INFO"):
             assert _get_address("domain@subdomain.Test.Com") == self.domain_address
 
+    def test_existing_domain_address_caches_subdomain_owner(self) -> None:
+        cache_key = SUBDOMAIN_OWNER_CACHE_KEY_PREFIX + "subdomain"
+        cache.delete(cache_key)
+        # Get the subdomain owner, the domain address and profile, and update it
+        with self.assertNumQueries(3):
+            assert _get_address("domain@subdomain.test.com") == self.domain_address
+        assert cache.get(cache_key) == self.user.id
+        # The subdomain owner is cached, and the profile is not locked
+        with self.assertNumQueries(2):
+            assert _get_address("domain@subdomain.test.com") == self.domain_address
+
+    def test_existing_domain_address_only_saves_last_used_at(self) -> None:
+        """The unlocked update does not overwrite concurrent changes to the mask."""
+        with CaptureQueriesContext(connection) as queries:
+            assert _get_address("domain@subdomain.test.com") == self.domain_address
+        updates = [
+            query["sql"]
+            for query in queries.captured_queries
+            if query["sql"].startswith("UPDATE")
+        ]
+        assert len(updates) == 1
+        assert '"last_used_at"' in updates[0]
+        assert '"description"' not in updates[0]
+        assert '"enabled"' not in updates[0]
+
+    def test_existing_domain_address_with_stale_subdomain_owner(self) -> None:
+        """A cached subdomain owner that does not match the profile is not used."""
+        other_user = make_premium_test_user()
+        other_user.profile.subdomain = "other"
+        other_user.profile.save()
+        baker.make(DomainAddress, user=other_user, address="domain")
+        cache.set(SUBDOMAIN_OWNER_CACHE_KEY_PREFIX + "subdomain", other_user.id)
+        assert _get_address("domain@subdomain.test.com") == self.domain_address
+
     def test_subdomain_for_wrong_domain_raises(self) -> None:
         with (
             pytest.raises(ObjectDoesNotExist) as exc_info,
@@ -2986,6 +3029,43 @@ def test_wrapped_email_test(
         assert "/tracker-report/#" not in no_space_html
 
 
+@pytest.mark.django_db
+def test_wrap_html_email_reuses_rendered_header_and_footer() -> None:
+    _get_wrapped_email_chrome.cache_clear()
+    original_html = "<p>First</p>\n\n   \n<p>Second</p>\r\n"
+
+    first = wrap_html_email(original_html, "en", True, "one@test.com", 1, "https://a")
+    second = wrap_html_email(
+        original_html, "en", True, "<b>two@test.com</b>", 1, "https://b?c&d"
+    )
+
+    cache_info = _get_wrapped_email_chrome.cache_info()
+    assert cache_info.misses == 1
+    assert cache_info.hits == 1
+    assert original_html in first
+    assert original_html in second
+    assert "one@test.com" in first
+    assert "https://a" in first
+    assert "two@test.com" in second
+    assert "<b>two" not in second
+    assert "https://b?c&amp;d" in second
+    assert "relayWrappedEmail" not in first + second
+
+
+@pytest.mark.django_db
+def test_wrap_html_email_renders_each_variant() -> None:
+    _get_wrapped_email_chrome.cache_clear()
+
+    free = wrap_html_email("<p>Hi</p>", "en", False, "one@test.com")
+    premium = wrap_html_email("<p>Hi</p>", "en", True, "one@test.com")
+
+    assert _get_wrapped_email_chrome.cache_info().misses == 2
+    assert free != premium
+    assert free.endswith("\n")
+    assert "\n\n" not in free
+    assert "\n\n" not in premium
+
+
 @pytest.mark.parametrize("forwarded", ("False", "True"))
 @pytest.mark.parametrize("content_type", ("text/plain", "text/html"))
 @pytest.mark.django_db
@@ -3149,49 +3229,70 @@ def test_build_reply_requires_premium_email_after_forward():
     )
 
 
-def test_get_keys_from_headers_no_reply_headers(settings):
+def test_get_reply_keys_from_headers_no_reply_headers(settings):
     """If no reply headers, raise ReplyHeadersNotFound."""
     msg_id = "<msg-id-123@email.com>"
     headers = [{"name": "Message-Id", "value": msg_id}]
     settings.STATSD_ENABLED = True
     with MetricsMock() as mm, pytest.raises(ReplyHeadersNotFound):
-        _get_keys_from_headers(headers)
+        _get_reply_keys_from_headers(headers)
     mm.assert_incr_once("fx.private.relay.mail_to_replies_without_reply_headers")
 
 
-def test_get_keys_from_headers_in_reply_to():
+def test_get_reply_keys_from_headers_in_reply_to():
     """If In-Reply-To header, get keys from it."""
     msg_id = "<msg-id-123@email.com>"
     msg_id_bytes = get_message_id_bytes(msg_id)
-    lookup_key, encryption_key = derive_reply_keys(msg_id_bytes)
     headers = [{"name": "In-Reply-To", "value": msg_id}]
-    (lookup_key_from_header, encryption_key_from_header) = _get_keys_from_headers(
-        headers
-    )
-    assert lookup_key == lookup_key_from_header
-    assert encryption_key == encryption_key_from_header
+    assert _get_reply_keys_from_headers(headers) == [derive_reply_keys(msg_id_bytes)]
+
+
+def test_get_reply_keys_from_headers_references():
+    """If no In-Reply-To header, get keys from each References header message ID."""
+    msg_ids = ["<msg-id-123@email.com>", "<msg-id-456@email.com>"]
+    headers = [{"name": "References", "value": " ".join(msg_ids)}]
+    assert _get_reply_keys_from_headers(headers) == [
+        derive_reply_keys(get_message_id_bytes(msg_id)) for msg_id in msg_ids
+    ]
+
+
+@pytest.mark.django_db
+def test_get_reply_record_from_headers_in_reply_to():
+    """If In-Reply-To header, get the Reply record for it."""
+    msg_id = "<msg-id-123@email.com>"
+    lookup_key, encryption_key = derive_reply_keys(get_message_id_bytes(msg_id))
+    reply = baker.make(Reply, lookup=b64_lookup_key(lookup_key))
+    headers = [{"name": "In-Reply-To", "value": msg_id}]
+    assert _get_reply_record_from_headers(headers) == (reply, encryption_key)
 
 
 @pytest.mark.django_db
-def test_get_keys_from_headers_references_reply():
+def test_get_reply_record_from_headers_references_reply(
+    django_assert_num_queries: Any,
+) -> None:
     """
-    If no In-Reply-To header, get keys from References header.
+    If no In-Reply-To header, get the first Reply record from References header,
+    with one query that includes the mask, user, and profile.
     """
-    msg_id = "<msg-id-456@email.com"
-    msg_id_bytes = get_message_id_bytes(msg_id)
-    lookup_key, encryption_key = derive_reply_keys(msg_id_bytes)
-    baker.make(Reply, lookup=b64_lookup_key(lookup_key))
-    msg_ids = f"<msg-id-123@email.com> {msg_id} <msg-id-789@email.com>"
+    relay_address = baker.make(RelayAddress, user=make_free_test_user())
+    replies = {}
+    for msg_id in ("<msg-id-456@email.com>", "<msg-id-789@email.com>"):
+        lookup_key, encryption_key = derive_reply_keys(get_message_id_bytes(msg_id))
+        replies[msg_id] = baker.make(
+            Reply, relay_address=relay_address, lookup=b64_lookup_key(lookup_key)
+        )
+    msg_ids = "<msg-id-123@email.com> <msg-id-456@email.com> <msg-id-789@email.com>"
     headers = [{"name": "References", "value": msg_ids}]
-    (lookup_key_from_header, encryption_key_from_header) = _get_keys_from_headers(
-        headers
-    )
-    assert lookup_key == lookup_key_from_header
-    assert encryption_key == encryption_key_from_header
+    lookup_key, encryption_key = derive_reply_keys(b"msg-id-456")
+    with django_assert_num_queries(1):
+        reply_record, key_from_header = _get_reply_record_from_headers(headers)
+        assert reply_record.profile.user == relay_address.user
+    assert reply_record == replies["<msg-id-456@email.com>"]
+    assert key_from_header == encryption_key
 
 
 @pytest.mark.django_db
-def test_get_keys_from_headers_references_reply_dne():
+def test_get_reply_record_from_headers_references_reply_dne():
     """
     If no In-Reply-To header,
     and no Reply record for any values in the References header,
@@ -3200,7 +3301,7 @@ def test_get_keys_from_headers_references_reply_dne():
     msg_ids = "<msg-id-123@email.com> <msg-id-456@email.com> <msg-id-789@email.com>"
     headers = [{"name": "References", "value": msg_ids}]
     with pytest.raises(Reply.DoesNotExist):
-        _get_keys_from_headers(headers)
+        _get_reply_record_from_headers(headers)
 
 
 def test_replace_headers_read_error_is_handled() -> None:
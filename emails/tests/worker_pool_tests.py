@@ -0,0 +1,88 @@
+import os
+import time
+from collections.abc import Iterator
+
+import pytest
+
+from emails.management.worker_pool import (
+    TaskResult,
+    WorkerExitedError,
+    WorkerPool,
+)
+
+
+def run_task(action: str, value: float = 0.0) -> None:
+    """Task function for the worker pool tests, run in a worker process."""
+    if action == "sleep":
+        time.sleep(value)
+    elif action == "raise":
+        raise ValueError(f"bad value {value}")
+    elif action == "exit":
+        os._exit(int(value))
+
+
+def wait_for(pool: WorkerPool, count: int, limit: float = 10.0) -> list[TaskResult]:
+    """Wait until count results are returned, or fail after limit seconds."""
+    results: list[TaskResult] = []
+    deadline = time.monotonic() + limit
+    while len(results) < count:
+        assert time.monotonic() < deadline, "Timed out waiting for results."
+        results.extend(pool.wait(0.1))
+    return results
+
+
+@pytest.fixture
+def pool() -> Iterator[WorkerPool]:
+    with WorkerPool(2, run_task, task_timeout=5.0) as worker_pool:
+        yield worker_pool
+
+
+def test_worker_pool_runs_tasks(pool: WorkerPool) -> None:
+    task_ids = [pool.submit("sleep", 0.0) for _ in range(5)]
+    assert pool.in_flight == 5
+    results = wait_for(pool, 5)
+    assert sorted(result.task_id for result in results) == task_ids
+    assert all(result.success for result in results)
+    assert pool.in_flight == 0
+    assert pool.restart_count == 0
+
+
+def test_worker_pool_reports_errors(pool: WorkerPool) -> None:
+    task_id = pool.submit("raise", 2)
+    (result,) = wait_for(pool, 1)
+    assert result.task_id == task_id
+    assert not result.success
+    assert isinstance(result.error, ValueError)
+    assert str(result.error) == "bad value 2"
+    assert pool.restart_count == 0
+
+
+def test_worker_pool_replaces_exited_worker(pool: WorkerPool) -> None:
+    pool.submit("exit", 3)
+    (result,) = wait_for(pool, 1)
+    assert isinstance(result.error, WorkerExitedError)
+    assert pool.restart_count == 1
+
+    pool.submit("sleep", 0.0)
+    (result,) = wait_for(pool, 1)
+    assert result.success
+
+
+def test_worker_pool_times_out_only_stuck_worker() -> None:
+    with WorkerPool(2, run_task, task_timeout=0.5) as pool:
+        stuck_id = pool.submit("sleep", 60.0)
+        fast_id = pool.submit("sleep", 0.0)
+        results = {result.task_id: result for result in wait_for(pool, 2)}
+        assert results[fast_id].success
+        assert results[stuck_id].timed_out
+        assert not results[stuck_id].success
+        assert pool.restart_count == 1
+
+        pool.submit("sleep", 0.0)
+        (result,) = wait_for(pool, 1)
+        assert result.success
+
+
+def test_worker_pool_size_must_be_positive() -> None:
+    with pytest.raises(ValueError):
+        WorkerPool(0, run_task)
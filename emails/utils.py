@@ -2,17 +2,21 @@ from __future__ import annotations
 
 import base64
 import contextlib
+import hmac
 import json
 import logging
+import os
 import pathlib
 import re
 import zlib
 from collections.abc import Callable
 from email.errors import HeaderParseError, InvalidHeaderDefect
+from email.generator import BytesGenerator
 from email.headerregistry import Address, AddressHeader
 from email.message import EmailMessage
 from email.utils import formataddr, parseaddr
-from functools import cache
+from functools import cache, lru_cache
+from io import BytesIO
 from typing import Any, Literal, TypeVar, cast
 from urllib.parse import quote_plus, urlparse
 
@@ -28,8 +32,7 @@ import markus
 import requests
 from allauth.socialaccount.models import SocialAccount
 from botocore.exceptions import ClientError
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.hkdf import HKDFExpand
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from mypy_boto3_ses.type_defs import ContentTypeDef, SendRawEmailResponseTypeDef
 
 from privaterelay.plans import get_bundle_country_language_mapping
@@ -48,6 +51,12 @@ shavar_prod_lists_url = (
 )
 EMAILS_FOLDER_PATH = pathlib.Path(__file__).parent
 TRACKER_FOLDER_PATH = EMAILS_FOLDER_PATH / "tracker_lists"
+# HKDF-Expand info for the reply keys, with the counter byte for the first block
+_REPLY_LOOKUP_KEY_INFO = b"replay replies lookup key\x01"
+_REPLY_ENCRYPTION_KEY_INFO = b"replay replies encryption key\x01"
+# Prefix of reply metadata in the compact format. Older metadata is a JWE.
+REPLY_METADATA_PREFIX = "v1:"
+REPLY_METADATA_PREFIX_BYTES = REPLY_METADATA_PREFIX.encode()
 
 
 def ses_message_props(data: str) -> ContentTypeDef:
@@ -237,7 +246,7 @@ def ses_send_raw_email(
     if not settings.AWS_SES_CONFIGSET:
         raise ValueError("settings.AWS_SES_CONFIGSET must have a value")
 
-    data = message.as_string()
+    data = message_as_bytes(message)
     try:
         ses_response = client.send_raw_email(
             Source=source_address,
@@ -252,6 +261,21 @@ def ses_send_raw_email(
         raise
 
 
+def message_as_bytes(message: EmailMessage) -> bytes:
+    """
+    Serialize an email to bytes, with the same content as message.as_string().
+
+    The email is written directly to a bytes buffer, rather than to a string that is
+    then encoded. Parts that were not changed, such as attachments, are written
+    without decoding and re-encoding their content. The 7bit policy re-encodes 8bit
+    text parts, like as_string() does.
+    """
+    buffer = BytesIO()
+    generator = BytesGenerator(buffer, policy=message.policy.clone(cte_type="7bit"))
+    generator.flatten(message)
+    return buffer.getvalue()
+
+
 def urlize_and_linebreaks(text, autoescape=True):
     return linebreaksbr(urlize(text, autoescape=autoescape), autoescape=autoescape)
 
@@ -331,39 +355,47 @@ def b64_lookup_key(lookup_key: bytes) -> str:
 
 
 def derive_reply_keys(message_id: bytes) -> tuple[bytes, bytes]:
-    """Derive the lookup key and encryption key from an aliased message id."""
-    algorithm = hashes.SHA256()
-    hkdf = HKDFExpand(algorithm=algorithm, length=16, info=b"replay replies lookup key")
-    lookup_key = hkdf.derive(message_id)
-    hkdf = HKDFExpand(
-        algorithm=algorithm, length=32, info=b"replay replies encryption key"
-    )
-    encryption_key = hkdf.derive(message_id)
+    """
+    Derive the lookup key and encryption key from an aliased message id.
+
+    The keys are from HKDF-Expand with SHA-256. Both keys fit in a single SHA-256
+    block, so each is the first bytes of HMAC(message_id, info + 0x01).
+    """
+    lookup_key = hmac.digest(message_id, _REPLY_LOOKUP_KEY_INFO, "sha256")[:16]
+    encryption_key = hmac.digest(message_id, _REPLY_ENCRYPTION_KEY_INFO, "sha256")
     return (lookup_key, encryption_key)
 
 
 def encrypt_reply_metadata(key: bytes, payload: dict[str, str]) -> str:
-    """Encrypt the given payload into a JWE, using the given key."""
-    # This is a bit dumb, we have to base64-encode the key in order to load it :-/
-    k = jwcrypto.jwk.JWK(
-        kty="oct", k=base64.urlsafe_b64encode(key).rstrip(b"=").decode("ascii")
-    )
-    e = jwcrypto.jwe.JWE(
-        json.dumps(payload), json.dumps({"alg": "dir", "enc": "A256GCM"}), recipient=k
-    )
-    return cast(str, e.serialize(compact=True))
+    """
+    Encrypt the given payload with AES-GCM, using the given key.
 
+    The result is the prefix, then the base64-encoded nonce, ciphertext, and tag.
+    """
+    nonce = os.urandom(12)
+    plaintext = json.dumps(payload, separators=(",", ":")).encode()
+    ciphertext = AESGCM(key).encrypt(nonce, plaintext, REPLY_METADATA_PREFIX_BYTES)
+    encoded = base64.urlsafe_b64encode(nonce + ciphertext).decode("ascii")
+    return REPLY_METADATA_PREFIX + encoded
+
+
+def decrypt_reply_metadata(key: bytes, encrypted_metadata: str) -> bytes:
+    """Decrypt the given metadata into a json payload, using the given key."""
+    if encrypted_metadata.startswith(REPLY_METADATA_PREFIX):
+        data = base64.urlsafe_b64decode(
+            encrypted_metadata[len(REPLY_METADATA_PREFIX) :]
+        )
+        return AESGCM(key).decrypt(data[:12], data[12:], REPLY_METADATA_PREFIX_BYTES)
 
-def decrypt_reply_metadata(key, jwe):
-    """Decrypt the given JWE into a json payload, using the given key."""
+    # Metadata encrypted before the compact format is a JWE
     # This is a bit dumb, we have to base64-encode the key in order to load it :-/
     k = jwcrypto.jwk.JWK(
         kty="oct", k=base64.urlsafe_b64encode(key).rstrip(b"=").decode("ascii")
     )
     e = jwcrypto.jwe.JWE()
-    e.deserialize(jwe)
+    e.deserialize(encrypted_metadata)
     e.decrypt(k)
-    return e.plaintext
+    return cast(bytes, e.plaintext)
 
 
 def _get_bucket_and_key_from_s3_json(message_json):
@@ -445,26 +477,87 @@ def set_user_group(user):
     internal_group.user_set.add(user)
 
 
-def convert_domains_to_regex_patterns(domain_pattern):
-    return r"""(["'])(\S*://(\S*\.)*""" + re.escape(domain_pattern) + r"\S*)\1"
+# A quoted string with no whitespace that contains a URL, like an href or src
+_QUOTED_URL_PATTERN = re.compile(r""""([^"\s]*://[^"\s]*)"|'([^'\s]*://[^'\s]*)'""")
 
 
-def count_tracker(html_content, trackers):
-    tracker_total = 0
-    details = {}
-    # html_content needs to be str for count()
-    for tracker in trackers:
-        pattern = convert_domains_to_regex_patterns(tracker)
-        html_content, count = re.subn(pattern, "", html_content)
-        if count:
-            tracker_total += count
-            details[tracker] = count
-    return {"count": tracker_total, "trackers": details}
+@lru_cache(maxsize=8)
+def _tracker_domain_pattern(trackers: tuple[str, ...]) -> re.Pattern[str] | None:
+    """
+    Compile a tracker list to a single pattern.
+
+    A tracker domain matches when it follows the :// or a dot, so open.tracker.com
+    matches https://foo.open.tracker.com but not https://fooopen.tracker.com.
+    Longer domains are tried first, so the most specific domain is reported.
+    """
+    if not trackers:
+        return None
+    domains = sorted(set(trackers), key=len, reverse=True)
+    return re.compile(r"(?:://|\.)(" + "|".join(map(re.escape, domains)) + ")")
+
+
+def _find_tracker(pattern: re.Pattern[str] | None, url: str) -> str | None:
+    """Return the first tracker domain after the :// in the URL, or None."""
+    if pattern is None:
+        return None
+    match = pattern.search(url, url.find("://"))
+    return match.group(1) if match else None
+
+
+def scan_trackers(
+    html_content: str,
+    replace_level: Literal[1, 2] | None = None,
+    replace_link: Callable[[str], str] | None = None,
+) -> tuple[str, dict[str, Any], dict[str, Any], int]:
+    """
+    Find level one and level two trackers in quoted URLs, in one pass.
+
+    If replace_link is set, quoted URLs with a tracker at replace_level are
+    replaced with replace_link(original_url).
+
+    Return is a tuple:
+    * The HTML content, with replaced links
+    * Level one details, a dict with the total "count" and the per-domain "trackers"
+    * Level two details, in the same format
+    * The number of replaced links
+    """
+    patterns = {
+        1: _tracker_domain_pattern(tuple(general_trackers())),
+        2: _tracker_domain_pattern(tuple(strict_trackers())),
+    }
+    details: dict[int, dict[str, Any]] = {
+        1: {"count": 0, "trackers": {}},
+        2: {"count": 0, "trackers": {}},
+    }
+    replaced = 0
+
+    def check_link(match: re.Match[str]) -> str:
+        nonlocal replaced
+        url = match.group(1) or match.group(2)
+        replace = False
+        for level, pattern in patterns.items():
+            tracker = _find_tracker(pattern, url)
+            if tracker:
+                details[level]["count"] += 1
+                level_trackers = details[level]["trackers"]
+                level_trackers[tracker] = level_trackers.get(tracker, 0) + 1
+                replace = replace or level == replace_level
+        if replace and replace_link:
+            replaced += 1
+            quote = match.group(0)[0]
+            return f"{quote}{replace_link(url)}{quote}"
+        return match.group(0)
+
+    if replace_link:
+        html_content = _QUOTED_URL_PATTERN.sub(check_link, html_content)
+    else:
+        for match in _QUOTED_URL_PATTERN.finditer(html_content):
+            check_link(match)
+    return html_content, details[1], details[2], replaced
 
 
 def count_all_trackers(html_content):
-    general_detail = count_tracker(html_content, general_trackers())
-    strict_detail = count_tracker(html_content, strict_trackers())
+    _, general_detail, strict_detail, _ = scan_trackers(html_content)
 
     incr_if_enabled("tracker.general_count", general_detail["count"])
     incr_if_enabled("tracker.strict_count", strict_detail["count"])
@@ -475,31 +568,22 @@ def count_all_trackers(html_content):
 
 
 def remove_trackers(html_content, from_address, datetime_now, level="general"):
-    trackers = general_trackers() if level == "general" else strict_trackers()
-    tracker_removed = 0
-    changed_content = html_content
-
-    for tracker in trackers:
-        pattern = convert_domains_to_regex_patterns(tracker)
-
-        def convert_to_tracker_warning_link(matchobj):
-            quote, original_link, _ = matchobj.groups()
-            tracker_link_details = {
-                "sender": from_address,
-                "received_at": datetime_now,
-                "original_link": original_link,
-            }
-            anchor = quote_plus(json.dumps(tracker_link_details, separators=(",", ":")))
-            url = f"{settings.SITE_ORIGIN}/contains-tracker-warning/#{anchor}"
-            return f"{quote}{url}{quote}"
-
-        changed_content, matched = re.subn(
-            pattern, convert_to_tracker_warning_link, changed_content
+    def convert_to_tracker_warning_link(original_link: str) -> str:
+        tracker_link_details = {
+            "sender": from_address,
+            "received_at": datetime_now,
+            "original_link": original_link,
+        }
+        anchor = quote_plus(json.dumps(tracker_link_details, separators=(",", ":")))
+        return f"{settings.SITE_ORIGIN}/contains-tracker-warning/#{anchor}"
+
+    changed_content, level_one_detail, level_two_detail, tracker_removed = (
+        scan_trackers(
+            html_content,
+            replace_level=1 if level == "general" else 2,
+            replace_link=convert_to_tracker_warning_link,
         )
-        tracker_removed += matched
-
-    level_one_detail = count_tracker(html_content, general_trackers())
-    level_two_detail = count_tracker(html_content, strict_trackers())
+    )
 
     tracker_details = {
         "tracker_removed": tracker_removed,
@@ -30,7 +30,7 @@ def has_bad_words(value: str) -> bool:
     """Return True if the value is a short bad word or contains a long bad word."""
     if len(value) <= 4:
         return value in badwords().short
-    return any(badword in value for badword in badwords().long)
+    return badwords().long_matcher.contains_term(value)
 
 
 def blocklist() -> set[str]:
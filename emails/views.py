@@ -8,22 +8,24 @@ from email import message_from_bytes
 from email.iterators import _structure
 from email.message import EmailMessage
 from email.utils import parseaddr
+from functools import lru_cache
 from io import StringIO
 from json import JSONDecodeError
 from textwrap import dedent
 from typing import Any, Literal, NamedTuple, TypedDict, TypeVar
-from urllib.parse import urlencode
+from urllib.parse import quote, urlencode
 from uuid import uuid4
 
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import transaction
 from django.db.models import prefetch_related_objects
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import render
 from django.template.loader import render_to_string
-from django.utils.html import escape
+from django.utils.html import escape, strip_tags
 from django.views.decorators.csrf import csrf_exempt
 
 from botocore.exceptions import ClientError
@@ -42,6 +44,7 @@ from privaterelay.utils import (
 )
 
 from .exceptions import CannotMakeAddressException
+from .mask_filter import get_mask_lookup_filter
 from .models import (
     DeletedAddress,
     DomainAddress,
@@ -49,6 +52,7 @@ from .models import (
     Reply,
     address_hash,
     get_domain_numerical,
+    increment_mask_counters,
 )
 from .policy import relay_policy
 from .sns import SUPPORTED_SNS_TYPES, verify_from_sns
@@ -84,6 +88,8 @@ from .utils import (
 
 logger = logging.getLogger("events")
 info_logger = logging.getLogger("eventsinfo")
+# Change the version to ignore subdomain owners cached in an older format
+SUBDOMAIN_OWNER_CACHE_KEY_PREFIX = "subdomain_owner:v1:"
 
 
 class ReplyHeadersNotFound(Exception):
@@ -194,22 +200,82 @@ def wrap_html_email(
     num_level_one_email_trackers_removed: int | None = None,
     tracker_report_link: str | None = None,
 ) -> str:
-    """Add Relay banners, surveys, etc. to an HTML email"""
-    subplat_upgrade_link = get_subplat_upgrade_link_by_language(language)
+    """
+    Add Relay banners, surveys, etc. to an HTML email
+
+    The header and footer are rendered once per variant and cached. The email
+    addresses and links are filled in, and the original HTML is added unchanged.
+    """
+    header, footer = _get_wrapped_email_chrome(
+        language,
+        has_premium,
+        num_level_one_email_trackers_removed,
+        bool(tracker_report_link),
+        get_subplat_upgrade_link_by_language(language),
+        flag_is_active_in_task("holiday_promo_2023", None),
+        settings.SITE_ORIGIN,
+    )
+    display_email_text = strip_tags(display_email)
+    header = header.replace(
+        _WRAPPED_EMAIL_DISPLAY_EMAIL, escape(display_email_text)
+    ).replace(_WRAPPED_EMAIL_MASK_URL, quote(display_email_text, safe="/"))
+    if tracker_report_link:
+        header = header.replace(
+            _WRAPPED_EMAIL_TRACKER_REPORT_LINK, escape(tracker_report_link)
+        )
+    if original_html.endswith("\n"):
+        # Do not add an empty line between the original HTML and the footer
+        footer = footer[1:]
+    return "".join((header, original_html, footer))
+
+
+# Placeholders in the cached header and footer of wrapped emails
+_WRAPPED_EMAIL_BODY = "relayWrappedEmailOriginalHtml"
+_WRAPPED_EMAIL_DISPLAY_EMAIL = "relayWrappedEmailDisplayEmail"
+_WRAPPED_EMAIL_MASK_URL = "relayWrappedEmailMaskUrl"
+_WRAPPED_EMAIL_TRACKER_REPORT_LINK = "relayWrappedEmailTrackerReportLink"
+
+
+@lru_cache(maxsize=256)
+def _get_wrapped_email_chrome(
+    language: str,
+    has_premium: bool,
+    num_level_one_email_trackers_removed: int | None,
+    has_tracker_report_link: bool,
+    subplat_upgrade_link: str,
+    show_holiday_promo: bool,
+    site_origin: str,
+) -> tuple[str, str]:
+    """
+    Render the header and footer of a wrapped email, without empty lines.
+
+    The header ends with the indent of the original HTML, and the footer starts
+    with a newline.
+    """
     email_context = {
-        "original_html": original_html,
+        "original_html": _WRAPPED_EMAIL_BODY,
         "language": language,
         "has_premium": has_premium,
         "subplat_upgrade_link": subplat_upgrade_link,
-        "display_email": display_email,
-        "tracker_report_link": tracker_report_link,
+        "show_holiday_promo": show_holiday_promo,
+        "display_email": _WRAPPED_EMAIL_DISPLAY_EMAIL,
+        "mask_url": _WRAPPED_EMAIL_MASK_URL,
+        "tracker_report_link": (
+            _WRAPPED_EMAIL_TRACKER_REPORT_LINK if has_tracker_report_link else None
+        ),
         "num_level_one_email_trackers_removed": num_level_one_email_trackers_removed,
-        "SITE_ORIGIN": settings.SITE_ORIGIN,
+        "SITE_ORIGIN": site_origin,
     }
     content = render_to_string("emails/wrapped_email.html", email_context)
-    # Remove empty lines
-    content_lines = [line for line in content.splitlines() if line.strip()]
-    return "\n".join(content_lines) + "\n"
+    header, footer = content.split(_WRAPPED_EMAIL_BODY)
+    header_lines = header.splitlines()
+    indent = header_lines.pop()
+    header_lines = [line for line in header_lines if line.strip()]
+    footer_lines = [line for line in footer.splitlines() if line.strip()]
+    return (
+        "\n".join(header_lines) + "\n" + indent,
+        "\n" + "\n".join(footer_lines) + "\n",
+    )
 
 
 def wrapped_email_test(request: HttpRequest) -> HttpResponse:
@@ -686,13 +752,12 @@ def _handle_received(message_json: AWS_SNSMessageJSON) -> HttpResponse:
 
     # check if this is a reply from an external sender to a Relay user
     try:
-        (lookup_key, _) = _get_keys_from_headers(mail["headers"])
-        reply_record = _get_reply_record_from_lookup_key(lookup_key)
+        (reply_record, _) = _get_reply_record_from_headers(mail["headers"])
         user_address = address
         address = reply_record.address
         message_id = _get_message_id_from_headers(mail["headers"])
         # make sure the relay user is premium
-        if not _reply_allowed(from_address, to_address, reply_record, message_id):
+        if not _reply_allowed(from_address, user_address, reply_record, message_id):
             log_email_dropped(reason="reply_requires_premium", mask=user_address)
             return HttpResponse("Relay replies require a premium account", status=403)
     except (ReplyHeadersNotFound, Reply.DoesNotExist):
@@ -713,11 +778,9 @@ def _handle_received(message_json: AWS_SNSMessageJSON) -> HttpResponse:
     # if address is set to block, early return
     if not address.enabled:
         incr_if_enabled("email_for_disabled_address", 1)
-        address.num_blocked += 1
-        address.save(update_fields=["num_blocked"])
+        increment_mask_counters(address, num_blocked=1)
         _record_receipt_verdicts(receipt, "disabled_alias")
-        user_profile.last_engagement = datetime.now(UTC)
-        user_profile.save()
+        user_profile.touch_engagement()
         glean_logger().log_email_blocked(mask=address, reason="block_all")
         return HttpResponse("Address is temporarily disabled.")
 
@@ -732,10 +795,8 @@ def _handle_received(message_json: AWS_SNSMessageJSON) -> HttpResponse:
         and _check_email_from_list(mail["headers"])
     ):
         incr_if_enabled("list_email_for_address_blocking_lists", 1)
-        address.num_blocked += 1
-        address.save(update_fields=["num_blocked"])
-        user_profile.last_engagement = datetime.now(UTC)
-        user_profile.save()
+        increment_mask_counters(address, num_blocked=1)
+        user_profile.touch_engagement()
         glean_logger().log_email_blocked(mask=address, reason="block_promotional")
         return HttpResponse("Address is not accepting list emails.")
 
@@ -814,6 +875,10 @@ def _handle_received(message_json: AWS_SNSMessageJSON) -> HttpResponse:
         sample_trackers=sample_trackers,
         remove_level_one_trackers=remove_level_one_trackers,
     )
+    # Release the incoming email before the forwarded email is serialized, so that
+    # a large email is held in memory fewer times
+    incoming_email_size = len(incoming_email_bytes)
+    del incoming_email_bytes
     if has_html:
         incr_if_enabled("email_with_html_content", 1)
     if has_text:
@@ -839,23 +904,14 @@ def _handle_received(message_json: AWS_SNSMessageJSON) -> HttpResponse:
     _store_reply_record(mail, message_id, address)
 
     user_profile.update_abuse_metric(
-        email_forwarded=True, forwarded_email_size=len(incoming_email_bytes)
+        email_forwarded=True, forwarded_email_size=incoming_email_size
     )
-    user_profile.last_engagement = datetime.now(UTC)
-    user_profile.save()
-    address.num_forwarded += 1
-    address.last_used_at = datetime.now(UTC)
-    if level_one_trackers_removed:
-        address.num_level_one_trackers_blocked = (
-            address.num_level_one_trackers_blocked or 0
-        ) + level_one_trackers_removed
-    address.save(
-        update_fields=[
-            "num_forwarded",
-            "last_used_at",
-            "block_list_emails",
-            "num_level_one_trackers_blocked",
-        ]
+    user_profile.touch_engagement()
+    increment_mask_counters(
+        address,
+        num_forwarded=1,
+        num_level_one_trackers_blocked=level_one_trackers_removed,
+        used=True,
     )
     glean_logger().log_email_forwarded(mask=address, is_reply=False)
     return HttpResponse("Sent email to final recipient.", status=200)
@@ -899,33 +955,55 @@ def _get_message_id_from_headers(headers):
     return message_id
 
 
-def _get_keys_from_headers(headers):
-    in_reply_to = None
+def _get_reply_keys_from_headers(
+    headers: list[dict[str, str]],
+) -> list[tuple[bytes, bytes]]:
+    """
+    Get the candidate (lookup key, encryption key) pairs from the reply headers.
+
+    The keys are from the In-Reply-To header, or from each message ID in the
+    References header, whichever comes first.
+    """
     for header in headers:
-        if header["name"].lower() == "in-reply-to":
-            in_reply_to = header["value"]
-            message_id_bytes = get_message_id_bytes(in_reply_to)
-            return derive_reply_keys(message_id_bytes)
-
-        if header["name"].lower() == "references":
-            message_ids = header["value"]
-            for message_id in message_ids.split(" "):
-                message_id_bytes = get_message_id_bytes(message_id)
-                lookup_key, encryption_key = derive_reply_keys(message_id_bytes)
-                try:
-                    # FIXME: calling code is likely to duplicate this query
-                    _get_reply_record_from_lookup_key(lookup_key)
-                    return lookup_key, encryption_key
-                except Reply.DoesNotExist:
-                    pass
-            raise Reply.DoesNotExist
+        header_name = header["name"].lower()
+        if header_name == "in-reply-to":
+            message_ids = [header["value"]]
+        elif header_name == "references":
+            message_ids = header["value"].split(" ")
+        else:
+            continue
+        return [
+            derive_reply_keys(get_message_id_bytes(message_id))
+            for message_id in message_ids
+        ]
     incr_if_enabled("mail_to_replies_without_reply_headers", 1)
     raise ReplyHeadersNotFound
 
 
-def _get_reply_record_from_lookup_key(lookup_key):
-    lookup = b64_lookup_key(lookup_key)
-    return Reply.objects.get(lookup=lookup)
+def _get_reply_record_from_headers(
+    headers: list[dict[str, str]],
+) -> tuple[Reply, bytes]:
+    """
+    Get the Reply record for the reply headers, and the key to decrypt it.
+
+    All the candidate records are read with one query, along with the mask, user,
+    and profile. If several match, the first in the header is used.
+
+    Raises ReplyHeadersNotFound if there are no reply headers, or Reply.DoesNotExist
+    if no record matches.
+    """
+    keys = _get_reply_keys_from_headers(headers)
+    lookups = [b64_lookup_key(lookup_key) for lookup_key, _ in keys]
+    reply_records = {
+        reply_record.lookup: reply_record
+        for reply_record in Reply.objects.filter(lookup__in=lookups).select_related(
+            "relay_address__user__profile", "domain_address__user__profile"
+        )
+    }
+    for lookup, (_, encryption_key) in zip(lookups, keys):
+        if (reply_record := reply_records.get(lookup)) is not None:
+            return reply_record, encryption_key
+    raise Reply.DoesNotExist
 
 
 def _strip_localpart_tag(address):
@@ -1329,8 +1407,18 @@ def _send_reply_requires_premium_email(
 
 
 def _reply_allowed(
-    from_address, to_address, reply_record, message_id=None, decrypted_metadata=None
-):
+    from_address: str,
+    to_mask: RelayAddress | DomainAddress | None,
+    reply_record: Reply,
+    message_id: str | None = None,
+    decrypted_metadata: dict[str, Any] | None = None,
+) -> bool:
+    """
+    Return True if a reply is allowed.
+
+    to_mask is the mask that received the email, or None for a reply from a
+    Relay user.
+    """
     stripped_from_address = _strip_localpart_tag(from_address)
     reply_record_email = reply_record.address.user.email
     stripped_reply_record_address = _strip_localpart_tag(reply_record_email)
@@ -1358,12 +1446,10 @@ def _reply_allowed(
     else:
         # The From: is not a Relay user, so make sure this is a reply *TO* a
         # premium Relay user
-        try:
-            address = _get_address(to_address)
-            if address.user.profile.has_premium:
-                return True
-        except ObjectDoesNotExist:
+        if to_mask is None:
             return False
+        if to_mask.user.profile.has_premium:
+            return True
     incr_if_enabled("free_user_reply_attempt", 1)
     return False
 
@@ -1389,13 +1475,10 @@ def _handle_reply(
     """
     mail = message_json["mail"]
     try:
-        (lookup_key, encryption_key) = _get_keys_from_headers(mail["headers"])
+        (reply_record, encryption_key) = _get_reply_record_from_headers(mail["headers"])
     except ReplyHeadersNotFound:
         incr_if_enabled("reply_email_header_error", 1, tags=["detail:no-header"])
         return HttpResponse("No In-Reply-To header", status=400)
-
-    try:
-        reply_record = _get_reply_record_from_lookup_key(lookup_key)
     except Reply.DoesNotExist:
         incr_if_enabled("reply_email_header_error", 1, tags=["detail:no-reply-record"])
         return HttpResponse("Unknown or stale In-Reply-To header", status=404)
@@ -1406,7 +1489,7 @@ def _handle_reply(
         decrypt_reply_metadata(encryption_key, reply_record.encrypted_metadata)
     )
     if not _reply_allowed(
-        from_address, to_address, reply_record, message_id, decrypted_metadata
+        from_address, None, reply_record, message_id, decrypted_metadata
     ):
         log_email_dropped(reason="reply_requires_premium", mask=address, is_reply=True)
         return HttpResponse("Relay replies require a premium account", status=403)
@@ -1457,12 +1540,29 @@ def _handle_reply(
     reply_record.increment_num_replied()
     profile = address.user.profile
     profile.update_abuse_metric(replied=True)
-    profile.last_engagement = datetime.now(UTC)
-    profile.save()
+    profile.touch_engagement()
     glean_logger().log_email_forwarded(mask=address, is_reply=True)
     return HttpResponse("Sent email to final recipient.", status=200)
 
 
+def _get_subdomain_owner_id(subdomain: str) -> int:
+    """
+    Get the ID of the user that claimed a subdomain.
+
+    A subdomain can not be changed or released, so the ID is cached. It is only
+    stale if the user was deleted. Profile.DoesNotExist is raised for an unclaimed
+    subdomain, which is not cached, since it could be claimed at any time.
+    """
+    cache_key = SUBDOMAIN_OWNER_CACHE_KEY_PREFIX + subdomain
+    owner_id: int | None = cache.get(cache_key)
+    if owner_id is None:
+        owner_id = Profile.objects.values_list("user_id", flat=True).get(
+            subdomain=subdomain
+        )
+        cache.set(cache_key, owner_id, settings.SUBDOMAIN_OWNER_CACHE_TIMEOUT)
+    return owner_id
+
+
 def _get_domain_address(
     local_portion: str, domain_portion: str, create: bool = True
 ) -> DomainAddress:
@@ -1482,18 +1582,43 @@ def _get_domain_address(
         if create:
             incr_if_enabled("email_for_not_supported_domain", 1)
         raise ObjectDoesNotExist("Address does not exist")
+    domain_numerical = get_domain_numerical(address_domain)
     try:
+        # Find an existing DomainAddress without locking the profile. The profile
+        # subdomain is checked as well, in case the cached user was deleted.
+        owner_id = _get_subdomain_owner_id(address_subdomain)
+        domain_address = (
+            DomainAddress.objects.select_related("user__profile")
+            .filter(
+                user_id=owner_id,
+                user__profile__subdomain=address_subdomain,
+                address=local_portion,
+                domain=domain_numerical,
+            )
+            .first()
+        )
+        if domain_address is not None:
+            domain_address.last_used_at = datetime.now(UTC)
+            # Only save last_used_at, so concurrent changes to other fields are kept
+            domain_address.save(
+                update_fields=["last_used_at"], profile=domain_address.user.profile
+            )
+            return domain_address
+
+        # Lock the profile to create the DomainAddress
         with transaction.atomic():
             locked_profile = Profile.objects.select_for_update().get(
                 subdomain=address_subdomain
             )
-            domain_numerical = get_domain_numerical(address_domain)
             # filter DomainAddress because it may not exist
             # which will throw an error with get()
             domain_address = DomainAddress.objects.filter(
                 user=locked_profile.user, address=local_portion, domain=domain_numerical
             ).first()
-            if domain_address is None:
+            if domain_address is not None:
+                # Share the user and profile already loaded with the lock
+                domain_address.user = locked_profile.user
+            else:
                 if not create:
                     raise DomainAddress.DoesNotExist()
                 # TODO: Consider flows when a user generating alias on a fly
@@ -1507,7 +1632,7 @@ def _get_domain_address(
                     created_by_api=False,
                 )
             domain_address.last_used_at = datetime.now(UTC)
-            domain_address.save()
+            domain_address.save(profile=locked_profile)
             return domain_address
     except Profile.DoesNotExist as e:
         if create:
@@ -1540,6 +1665,17 @@ def _get_address(address: str, create: bool = True) -> RelayAddress | DomainAddr
         return _get_domain_address(local_address, domain, create)
 
     # the domain is the site's 'top' relay domain, so look up the RelayAddress
+    mask_filter = get_mask_lookup_filter()
+    if mask_filter and not mask_filter.might_have_address(local_address):
+        # Skip the database for unknown masks, such as dictionary attacks
+        if create:
+            if mask_filter.might_have_deleted(
+                address_hash(local_address, domain=domain)
+            ):
+                incr_if_enabled("email_for_deleted_address", 1)
+            else:
+                incr_if_enabled("email_for_unknown_address", 1)
+        raise RelayAddress.DoesNotExist("RelayAddress matching query does not exist.")
     try:
         domain_numerical = get_domain_numerical(domain)
         relay_address = RelayAddress.objects.get(
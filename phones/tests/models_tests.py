@@ -784,6 +784,21 @@ def test_save_store_phone_log_false_deletes_data() -> None:
         inbound_contact.refresh_from_db()
 
 
+def test_save_store_phone_log_already_false_keeps_data() -> None:
+    user = make_phone_test_user()
+    baker.make(RealPhone, user=user, verified=True)
+    relay_number = baker.make(RelayNumber, user=user)
+    user.profile.store_phone_log = False
+    user.profile.save()
+    inbound_contact = baker.make(InboundContact, relay_number=relay_number)
+
+    user.profile.onboarding_state = 1
+    user.profile.save()
+
+    inbound_contact.refresh_from_db()
+    assert inbound_contact
+
+
 def test_get_last_text_sender_returning_None():
     user = make_phone_test_user()
     baker.make(RealPhone, user=user, verified=True)
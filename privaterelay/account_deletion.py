@@ -0,0 +1,68 @@
+"""Delete Relay accounts, such as when a Mozilla account is deleted."""
+
+from datetime import UTC, datetime
+from typing import TypeVar
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import QuerySet
+
+from emails.models import DomainAddress, RelayAddress, delete_masks
+
+from .models import Profile
+
+# Number of masks to archive and delete per transaction
+DELETE_MASKS_BATCH_SIZE = 1000
+
+_Mask = TypeVar("_Mask", RelayAddress, DomainAddress)
+
+
+def request_account_deletion(user: User) -> None:
+    """
+    Deactivate a user and queue the account for delete_requested_accounts.
+
+    A deactivated user can not use the API, and emails to their masks are dropped,
+    so the account is unusable until it is deleted.
+    """
+    with transaction.atomic():
+        user.is_active = False
+        # Save, rather than update, so the API token caches are cleared by signal
+        user.save(update_fields=["is_active"])
+        Profile.objects.filter(user=user).update(
+            deletion_requested_at=datetime.now(UTC)
+        )
+
+
+def delete_user_account(user: User, batch_size: int = DELETE_MASKS_BATCH_SIZE) -> None:
+    """
+    Delete a user, after archiving their masks as DeletedAddress records.
+
+    The masks are deleted in batches, each with one insert of DeletedAddress rows
+    and one delete of masks, so an account with many masks does not hold locks for
+    long. The profile counters are not updated, since the profile is deleted next.
+    """
+    _delete_all_masks(user, RelayAddress.objects.filter(user=user), batch_size)
+    _delete_all_masks(user, DomainAddress.objects.filter(user=user), batch_size)
+    user.delete()
+
+
+def _delete_all_masks(
+    user: User,
+    masks_query: QuerySet[_Mask],
+    batch_size: int,
+) -> None:
+    masks_query = masks_query.order_by("id")
+    while masks := list(masks_query[:batch_size]):
+        delete_masks(user, masks, update_profile=False)
+
+
+def delete_requested_accounts(batch_size: int = DELETE_MASKS_BATCH_SIZE) -> int:
+    """Delete the accounts queued by request_account_deletion. Return the count."""
+    users = User.objects.filter(profile__deletion_requested_at__isnull=False)
+    deleted = 0
+    for user in users.select_related("profile").order_by(
+        "profile__deletion_requested_at"
+    ):
+        delete_user_account(user, batch_size)
+        deleted += 1
+    return deleted
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+from collections.abc import Sequence
 from datetime import datetime
 from logging import getLogger
 from typing import Any, Literal, NamedTuple
@@ -155,29 +156,44 @@ class RelayGleanLogger(EventsServerEventLogger):
         created_by_api: bool,
     ) -> None:
         """Log that a Relay email mask was created."""
-        user_data = UserData.from_user(mask.user)
+        self.log_email_masks_created(
+            request=request, masks=[mask], created_by_api=created_by_api
+        )
+
+    def log_email_masks_created(
+        self,
+        *,
+        request: HttpRequest | None = None,
+        masks: Sequence[RelayAddress | DomainAddress],
+        created_by_api: bool,
+    ) -> None:
+        """Log that Relay email masks were created by the same user."""
+        if not masks:
+            return
+        user_data = UserData.from_user(masks[0].user)
         if not user_data.metrics_enabled:
             return
         request_data = RequestData.from_request(request) if request else RequestData()
-        mask_data = EmailMaskData.from_mask(mask)
-        self.record_email_mask_created(
-            user_agent=_opt_str_to_glean(request_data.user_agent),
-            ip_address=_opt_str_to_glean(request_data.ip_address),
-            fxa_id=_opt_str_to_glean(user_data.fxa_id),
-            platform="",
-            n_random_masks=user_data.n_random_masks,
-            n_domain_masks=user_data.n_domain_masks,
-            n_deleted_random_masks=user_data.n_deleted_random_masks,
-            n_deleted_domain_masks=user_data.n_deleted_domain_masks,
-            date_joined_relay=_opt_dt_to_glean(user_data.date_joined_relay),
-            premium_status=user_data.premium_status,
-            date_joined_premium=_opt_dt_to_glean(user_data.date_joined_premium),
-            has_extension=user_data.has_extension,
-            date_got_extension=_opt_dt_to_glean(user_data.date_got_extension),
-            is_random_mask=mask_data.is_random_mask,
-            created_by_api=created_by_api,
-            has_website=mask_data.has_website,
-        )
+        for mask in masks:
+            mask_data = EmailMaskData.from_mask(mask)
+            self.record_email_mask_created(
+                user_agent=_opt_str_to_glean(request_data.user_agent),
+                ip_address=_opt_str_to_glean(request_data.ip_address),
+                fxa_id=_opt_str_to_glean(user_data.fxa_id),
+                platform="",
+                n_random_masks=user_data.n_random_masks,
+                n_domain_masks=user_data.n_domain_masks,
+                n_deleted_random_masks=user_data.n_deleted_random_masks,
+                n_deleted_domain_masks=user_data.n_deleted_domain_masks,
+                date_joined_relay=_opt_dt_to_glean(user_data.date_joined_relay),
+                premium_status=user_data.premium_status,
+                date_joined_premium=_opt_dt_to_glean(user_data.date_joined_premium),
+                has_extension=user_data.has_extension,
+                date_got_extension=_opt_dt_to_glean(user_data.date_got_extension),
+                is_random_mask=mask_data.is_random_mask,
+                created_by_api=created_by_api,
+                has_website=mask_data.has_website,
+            )
 
     def log_email_mask_label_updated(
         self,
@@ -186,27 +202,39 @@ class RelayGleanLogger(EventsServerEventLogger):
         mask: RelayAddress | DomainAddress,
     ) -> None:
         """Log that a Relay email mask's label was changed."""
-        user_data = UserData.from_user(mask.user)
+        self.log_email_masks_label_updated(request=request, masks=[mask])
+
+    def log_email_masks_label_updated(
+        self,
+        *,
+        request: HttpRequest,
+        masks: Sequence[RelayAddress | DomainAddress],
+    ) -> None:
+        """Log that the labels of Relay email masks of the same user were changed."""
+        if not masks:
+            return
+        user_data = UserData.from_user(masks[0].user)
         if not user_data.metrics_enabled:
             return
         request_data = RequestData.from_request(request)
-        mask_data = EmailMaskData.from_mask(mask)
-        self.record_email_mask_label_updated(
-            user_agent=_opt_str_to_glean(request_data.user_agent),
-            ip_address=_opt_str_to_glean(request_data.ip_address),
-            fxa_id=_opt_str_to_glean(user_data.fxa_id),
-            platform="",
-            n_random_masks=user_data.n_random_masks,
-            n_domain_masks=user_data.n_domain_masks,
-            n_deleted_random_masks=user_data.n_deleted_random_masks,
-            n_deleted_domain_masks=user_data.n_deleted_domain_masks,
-            date_joined_relay=_opt_dt_to_glean(user_data.date_joined_relay),
-            premium_status=user_data.premium_status,
-            date_joined_premium=_opt_dt_to_glean(user_data.date_joined_premium),
-            has_extension=user_data.has_extension,
-            date_got_extension=_opt_dt_to_glean(user_data.date_got_extension),
-            is_random_mask=mask_data.is_random_mask,
-        )
+        for mask in masks:
+            mask_data = EmailMaskData.from_mask(mask)
+            self.record_email_mask_label_updated(
+                user_agent=_opt_str_to_glean(request_data.user_agent),
+                ip_address=_opt_str_to_glean(request_data.ip_address),
+                fxa_id=_opt_str_to_glean(user_data.fxa_id),
+                platform="",
+                n_random_masks=user_data.n_random_masks,
+                n_domain_masks=user_data.n_domain_masks,
+                n_deleted_random_masks=user_data.n_deleted_random_masks,
+                n_deleted_domain_masks=user_data.n_deleted_domain_masks,
+                date_joined_relay=_opt_dt_to_glean(user_data.date_joined_relay),
+                premium_status=user_data.premium_status,
+                date_joined_premium=_opt_dt_to_glean(user_data.date_joined_premium),
+                has_extension=user_data.has_extension,
+                date_got_extension=_opt_dt_to_glean(user_data.date_got_extension),
+                is_random_mask=mask_data.is_random_mask,
+            )
 
     def log_email_mask_deleted(
         self,
@@ -214,28 +242,32 @@ class RelayGleanLogger(EventsServerEventLogger):
         request: HttpRequest,
         user: User,
         is_random_mask: bool,
+        count: int = 1,
     ) -> None:
-        """Log that a Relay email mask was deleted."""
+        """Log that Relay email masks of the same type were deleted."""
+        if count < 1:
+            return
         user_data = UserData.from_user(user)
         if not user_data.metrics_enabled:
             return
         request_data = RequestData.from_request(request)
-        self.record_email_mask_deleted(
-            user_agent=_opt_str_to_glean(request_data.user_agent),
-            ip_address=_opt_str_to_glean(request_data.ip_address),
-            fxa_id=_opt_str_to_glean(user_data.fxa_id),
-            platform="",
-            n_random_masks=user_data.n_random_masks,
-            n_domain_masks=user_data.n_domain_masks,
-            n_deleted_random_masks=user_data.n_deleted_random_masks,
-            n_deleted_domain_masks=user_data.n_deleted_domain_masks,
-            date_joined_relay=_opt_dt_to_glean(user_data.date_joined_relay),
-            premium_status=user_data.premium_status,
-            date_joined_premium=_opt_dt_to_glean(user_data.date_joined_premium),
-            has_extension=user_data.has_extension,
-            date_got_extension=_opt_dt_to_glean(user_data.date_got_extension),
-            is_random_mask=is_random_mask,
-        )
+        for _ in range(count):
+            self.record_email_mask_deleted(
+                user_agent=_opt_str_to_glean(request_data.user_agent),
+                ip_address=_opt_str_to_glean(request_data.ip_address),
+                fxa_id=_opt_str_to_glean(user_data.fxa_id),
+                platform="",
+                n_random_masks=user_data.n_random_masks,
+                n_domain_masks=user_data.n_domain_masks,
+                n_deleted_random_masks=user_data.n_deleted_random_masks,
+                n_deleted_domain_masks=user_data.n_deleted_domain_masks,
+                date_joined_relay=_opt_dt_to_glean(user_data.date_joined_relay),
+                premium_status=user_data.premium_status,
+                date_joined_premium=_opt_dt_to_glean(user_data.date_joined_premium),
+                has_extension=user_data.has_extension,
+                date_got_extension=_opt_dt_to_glean(user_data.date_got_extension),
+                is_random_mask=is_random_mask,
+            )
 
     def log_email_forwarded(
         self,
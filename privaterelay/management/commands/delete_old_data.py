@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from privaterelay.retention import (
+    DELETE_CHUNK_SIZE,
+    apply_retention_policy,
+    get_retention_policies,
+)
+
+
+class Command(BaseCommand):
+    help = "Deletes records that are past their retention period, in chunks."
+
+    def add_arguments(self, parser):
+        policies = get_retention_policies()
+        parser.add_argument(
+            "policies",
+            nargs="*",
+            metavar="policy",
+            help=(
+                "Retention policies to apply, default all: "
+                + ", ".join(f"{slug} ({p.title})" for slug, p in policies.items())
+            ),
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DELETE_CHUNK_SIZE,
+            help="Number of records to delete per query.",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.1,
+            help="Seconds to wait between chunks.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Count the records to delete, without deleting them.",
+        )
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be at least 1")
+        policies = get_retention_policies()
+        slugs = options["policies"] or list(policies)
+        if unknown := sorted(set(slugs) - set(policies)):
+            raise CommandError(f"Unknown retention policies: {', '.join(unknown)}")
+        for slug in slugs:
+            count = apply_retention_policy(
+                policies[slug],
+                chunk_size=options["chunk_size"],
+                pause_seconds=options["pause"],
+                dry_run=options["dry_run"],
+            )
+            action = "Would delete" if options["dry_run"] else "Deleted"
+            self.stdout.write(f"{slug}: {action} {count} records")
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from privaterelay.account_deletion import (
+    DELETE_MASKS_BATCH_SIZE,
+    delete_requested_accounts,
+)
+
+
+class Command(BaseCommand):
+    help = "Deletes accounts queued for deletion by Mozilla account delete events."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DELETE_MASKS_BATCH_SIZE,
+            help="Number of masks to delete per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        deleted = delete_requested_accounts(options["batch_size"])
+        self.stdout.write(f"Deleted {deleted} accounts")
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-18 03:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("privaterelay", "0011_add_pgcrypto_extension"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="deletion_requested_at",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -5,11 +5,12 @@ import uuid
 from collections import namedtuple
 from datetime import UTC, datetime, timedelta
 from hashlib import sha256
-from typing import TYPE_CHECKING, Literal
+from typing import TYPE_CHECKING, Any, Literal
 
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import models, transaction
+from django.db import models
+from django.db.models.functions import Coalesce
 from django.utils.translation.trans_real import (
     get_supported_language_variant,
     parse_accept_lang_header,
@@ -60,6 +61,8 @@ class Profile(models.Model):
     last_soft_bounce = models.DateTimeField(blank=True, null=True, db_index=True)
     last_hard_bounce = models.DateTimeField(blank=True, null=True, db_index=True)
     last_account_flagged = models.DateTimeField(blank=True, null=True, db_index=True)
+    # Set when a Mozilla account deletion is queued for delete_requested_accounts
+    deletion_requested_at = models.DateTimeField(blank=True, null=True, db_index=True)
     num_deleted_relay_addresses = models.PositiveIntegerField(default=0)
     num_deleted_domain_addresses = models.PositiveIntegerField(default=0)
     num_email_forwarded_in_deleted_address = models.PositiveIntegerField(default=0)
@@ -102,6 +105,38 @@ class Profile(models.Model):
     def __str__(self):
         return f"{self.user} Profile"
 
+    # Fields that delete data when they are changed to False, see save()
+    TRACKED_FIELDS = ("server_storage", "store_phone_log")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._record_tracked_values()
+        return instance
+
+    def refresh_from_db(self, *args: Any, **kwargs: Any) -> None:
+        super().refresh_from_db(*args, **kwargs)
+        fields = kwargs.get("fields", args[1] if len(args) > 1 else None)
+        self._record_tracked_values(fields)
+
+    def _record_tracked_values(self, fields: Iterable[str] | None = None) -> None:
+        """Record the database values of tracked fields, for has_changed()."""
+        if not hasattr(self, "_tracked_values"):
+            self._tracked_values: dict[str, bool] = {}
+        for name in self.TRACKED_FIELDS:
+            if (fields is None or name in fields) and name in self.__dict__:
+                self._tracked_values[name] = self.__dict__[name]
+
+    def has_changed(self, name: str) -> bool:
+        """
+        Return True if a tracked field may be different from the database value.
+
+        If the database value is unknown, the field is considered changed.
+        """
+        if self._state.adding or name not in getattr(self, "_tracked_values", {}):
+            return True
+        return bool(self._tracked_values[name] != getattr(self, name))
+
     def save(
         self,
         force_insert: bool | tuple[ModelBase, ...] = False,
@@ -118,31 +153,45 @@ class Profile(models.Model):
             self.subdomain = self.subdomain.lower()
             if update_fields is not None:
                 update_fields = {"subdomain"}.union(update_fields)
+        if update_fields is not None:
+            update_fields = set(update_fields)
+        changed = {
+            name
+            for name in self.TRACKED_FIELDS
+            if (update_fields is None or name in update_fields)
+            and self.has_changed(name)
+        }
         super().save(
             force_insert=force_insert,
             force_update=force_update,
             using=using,
             update_fields=update_fields,
         )
-        # any time a profile is saved with server_storage False, delete the
+        self._record_tracked_values(update_fields)
+        # when a profile is saved with server_storage changed to False, delete the
         # appropriate server-stored Relay address data.
-        if not self.server_storage:
+        if not self.server_storage and "server_storage" in changed:
             relay_addresses = RelayAddress.objects.filter(user=self.user)
             relay_addresses.update(description="", generated_for="", used_on="")
             domain_addresses = DomainAddress.objects.filter(user=self.user)
             domain_addresses.update(description="", used_on="")
         if settings.PHONES_ENABLED:
-            # any time a profile is saved with store_phone_log False, delete the
-            # appropriate server-stored InboundContact records
+            # when a profile is saved with store_phone_log changed to False, delete
+            # the appropriate server-stored InboundContact records
             from phones.models import InboundContact, RelayNumber
 
-            if not self.store_phone_log:
+            if not self.store_phone_log and "store_phone_log" in changed:
                 try:
                     relay_number = RelayNumber.objects.get(user=self.user)
                     InboundContact.objects.filter(relay_number=relay_number).delete()
                 except RelayNumber.DoesNotExist:
                     pass
 
+    def touch_engagement(self) -> None:
+        """Set last_engagement to now, and write only that column."""
+        self.last_engagement = datetime.now(UTC)
+        Profile.objects.filter(id=self.id).update(last_engagement=self.last_engagement)
+
     @property
     def language(self):
         if self.fxa and self.fxa.extra_data.get("locale"):
@@ -192,9 +241,7 @@ class Profile(models.Model):
 
     @property
     def total_masks(self) -> int:
-        ra_count: int = self.relay_addresses.count()
-        da_count: int = self.domain_addresses.count()
-        return ra_count + da_count
+        return self.get_mask_stat("total_masks")
 
     @property
     def at_mask_limit(self) -> bool:
@@ -331,39 +378,36 @@ class Profile(models.Model):
 
     @property
     def emails_forwarded(self) -> int:
-        return (
-            sum(ra.num_forwarded for ra in self.relay_addresses)
-            + sum(da.num_forwarded for da in self.domain_addresses)
-            + self.num_email_forwarded_in_deleted_address
-        )
+        return self.get_mask_stat("emails_forwarded")
 
     @property
     def emails_blocked(self) -> int:
-        return (
-            sum(ra.num_blocked for ra in self.relay_addresses)
-            + sum(da.num_blocked for da in self.domain_addresses)
-            + self.num_email_blocked_in_deleted_address
-        )
+        return self.get_mask_stat("emails_blocked")
 
     @property
     def emails_replied(self) -> int:
-        ra_sum = self.relay_addresses.aggregate(models.Sum("num_replied", default=0))
-        da_sum = self.domain_addresses.aggregate(models.Sum("num_replied", default=0))
-        return (
-            int(ra_sum["num_replied__sum"])
-            + int(da_sum["num_replied__sum"])
-            + self.num_email_replied_in_deleted_address
-        )
+        return self.get_mask_stat("emails_replied")
 
     @property
     def level_one_trackers_blocked(self) -> int:
-        return (
-            sum(ra.num_level_one_trackers_blocked or 0 for ra in self.relay_addresses)
-            + sum(
-                da.num_level_one_trackers_blocked or 0 for da in self.domain_addresses
-            )
-            + (self.num_level_one_trackers_blocked_in_deleted_address or 0)
+        return self.get_mask_stat("level_one_trackers_blocked")
+
+    def get_mask_stat(self, name: str) -> int:
+        """
+        Get a statistic summed over the user's masks, including deleted masks.
+
+        If the profile was loaded with with_mask_stats(), use the annotated value.
+        Otherwise, query the database for the current value.
+        """
+        annotation = MASK_STATS_ANNOTATIONS[name]
+        if hasattr(self, annotation):
+            return int(getattr(self, annotation))
+        value = (
+            with_mask_stats(Profile.objects.filter(id=self.id))
+            .values_list(annotation, flat=True)
+            .get()
         )
+        return int(value)
 
     @property
     def joined_before_premium_release(self):
@@ -414,6 +458,7 @@ class Profile(models.Model):
     def update_abuse_metric(
         self,
         address_created: bool = False,
+        num_addresses_created: int = 0,
         replied: bool = False,
         email_forwarded: bool = False,
         forwarded_email_size: int = 0,
@@ -421,81 +466,82 @@ class Profile(models.Model):
         if self.user.email in settings.ALLOWED_ACCOUNTS:
             return None
 
-        with transaction.atomic():
-            # look for abuse metrics created on the same UTC date, regardless of time.
-            midnight_utc_today = datetime.combine(
-                datetime.now(UTC).date(), datetime.min.time()
-            ).astimezone(UTC)
-            midnight_utc_tomorrow = midnight_utc_today + timedelta(days=1)
-            abuse_metric = (
-                self.user.abusemetrics_set.select_for_update()
-                .filter(
-                    first_recorded__gte=midnight_utc_today,
-                    first_recorded__lt=midnight_utc_tomorrow,
-                )
-                .first()
-            )
-            if not abuse_metric:
-                from emails.models import AbuseMetrics
-
-                abuse_metric = AbuseMetrics.objects.create(user=self.user)
-                AbuseMetrics.objects.filter(
-                    first_recorded__lt=midnight_utc_today
-                ).delete()
-
-            # increment the abuse metric
-            if address_created:
-                abuse_metric.num_address_created_per_day += 1
-            if replied:
-                abuse_metric.num_replies_per_day += 1
-            if email_forwarded:
-                abuse_metric.num_email_forwarded_per_day += 1
-            if forwarded_email_size > 0:
-                abuse_metric.forwarded_email_size_per_day += forwarded_email_size
-            abuse_metric.last_recorded = datetime.now(UTC)
-            abuse_metric.save()
-
-            # check user should be flagged for abuse
-            hit_max_create = False
-            hit_max_replies = False
-            hit_max_forwarded = False
-            hit_max_forwarded_email_size = False
-
-            hit_max_create = (
-                abuse_metric.num_address_created_per_day
-                >= settings.MAX_ADDRESS_CREATION_PER_DAY
-            )
-            hit_max_replies = (
-                abuse_metric.num_replies_per_day >= settings.MAX_REPLIES_PER_DAY
-            )
-            hit_max_forwarded = (
-                abuse_metric.num_email_forwarded_per_day
-                >= settings.MAX_FORWARDED_PER_DAY
-            )
-            hit_max_forwarded_email_size = (
-                abuse_metric.forwarded_email_size_per_day
-                >= settings.MAX_FORWARDED_EMAIL_SIZE_PER_DAY
+        from emails.models import AbuseMetrics
+
+        # look for abuse metrics created on the same UTC date, regardless of time.
+        now = datetime.now(UTC)
+        midnight_utc_today = datetime.combine(
+            now.date(), datetime.min.time()
+        ).astimezone(UTC)
+        midnight_utc_tomorrow = midnight_utc_today + timedelta(days=1)
+        increments: dict[str, int] = {}
+        if address_created:
+            num_addresses_created += 1
+        if num_addresses_created:
+            increments["num_address_created_per_day"] = num_addresses_created
+        if replied:
+            increments["num_replies_per_day"] = 1
+        if email_forwarded:
+            increments["num_email_forwarded_per_day"] = 1
+        if forwarded_email_size > 0:
+            increments["forwarded_email_size_per_day"] = forwarded_email_size
+
+        # Increment the counters in the database, without locking the row, so that
+        # concurrent forwards and replies for a user do not wait on each other.
+        # Old rows are deleted by the delete_old_abuse_metrics command.
+        todays_metrics = AbuseMetrics.objects.filter(
+            user=self.user,
+            first_recorded__gte=midnight_utc_today,
+            first_recorded__lt=midnight_utc_tomorrow,
+        ).order_by("first_recorded")
+        abuse_metric_id = todays_metrics.values_list("id", flat=True).first()
+        if abuse_metric_id is None:
+            abuse_metric = AbuseMetrics.objects.create(user=self.user, **increments)
+        else:
+            AbuseMetrics.objects.filter(id=abuse_metric_id).update(
+                last_recorded=now,
+                **{name: models.F(name) + value for name, value in increments.items()},
             )
-            if (
-                hit_max_create
-                or hit_max_replies
-                or hit_max_forwarded
-                or hit_max_forwarded_email_size
-            ):
-                self.last_account_flagged = datetime.now(UTC)
-                self.save()
-                data = {
-                    "uid": self.fxa.uid if self.fxa else None,
-                    "flagged": self.last_account_flagged.timestamp(),
-                    "replies": abuse_metric.num_replies_per_day,
-                    "addresses": abuse_metric.num_address_created_per_day,
-                    "forwarded": abuse_metric.num_email_forwarded_per_day,
-                    "forwarded_size_in_bytes": (
-                        abuse_metric.forwarded_email_size_per_day
-                    ),
-                }
-                # log for further secops review
-                abuse_logger.info("Abuse flagged", extra=data)
+            abuse_metric = AbuseMetrics.objects.only(
+                "num_address_created_per_day",
+                "num_replies_per_day",
+                "num_email_forwarded_per_day",
+                "forwarded_email_size_per_day",
+            ).get(id=abuse_metric_id)
+
+        # check user should be flagged for abuse
+        hit_max_create = (
+            abuse_metric.num_address_created_per_day
+            >= settings.MAX_ADDRESS_CREATION_PER_DAY
+        )
+        hit_max_replies = (
+            abuse_metric.num_replies_per_day >= settings.MAX_REPLIES_PER_DAY
+        )
+        hit_max_forwarded = (
+            abuse_metric.num_email_forwarded_per_day >= settings.MAX_FORWARDED_PER_DAY
+        )
+        hit_max_forwarded_email_size = (
+            abuse_metric.forwarded_email_size_per_day
+            >= settings.MAX_FORWARDED_EMAIL_SIZE_PER_DAY
+        )
+        if (
+            hit_max_create
+            or hit_max_replies
+            or hit_max_forwarded
+            or hit_max_forwarded_email_size
+        ):
+            self.last_account_flagged = datetime.now(UTC)
+            self.save(update_fields=["last_account_flagged"])
+            data = {
+                "uid": self.fxa.uid if self.fxa else None,
+                "flagged": self.last_account_flagged.timestamp(),
+                "replies": abuse_metric.num_replies_per_day,
+                "addresses": abuse_metric.num_address_created_per_day,
+                "forwarded": abuse_metric.num_email_forwarded_per_day,
+                "forwarded_size_in_bytes": abuse_metric.forwarded_email_size_per_day,
+            }
+            # log for further secops review
+            abuse_logger.info("Abuse flagged", extra=data)
 
         return self.last_account_flagged
 
@@ -567,6 +613,68 @@ class Profile(models.Model):
         return ""
 
 
+# Profile statistics, and the annotation names used by with_mask_stats()
+MASK_STATS_ANNOTATIONS = {
+    "total_masks": "mask_stats_total_masks",
+    "emails_forwarded": "mask_stats_emails_forwarded",
+    "emails_blocked": "mask_stats_emails_blocked",
+    "emails_replied": "mask_stats_emails_replied",
+    "level_one_trackers_blocked": "mask_stats_level_one_trackers_blocked",
+}
+
+
+def with_mask_stats(profiles: QuerySet[Profile]) -> QuerySet[Profile]:
+    """
+    Annotate profiles with statistics summed over their masks.
+
+    The sums are subqueries on the mask tables, so the profiles and their
+    statistics are loaded in one query, without loading each mask.
+    """
+    from emails.models import DomainAddress, RelayAddress
+
+    def mask_total(
+        mask_model: type[RelayAddress] | type[DomainAddress],
+        aggregate: models.Aggregate,
+    ) -> models.Func:
+        subquery = (
+            mask_model.objects.filter(user=models.OuterRef("user"))
+            .order_by()
+            .values("user")
+            .annotate(total=aggregate)
+            .values("total")
+        )
+        return Coalesce(models.Subquery(subquery), 0)
+
+    def mask_sum(field: str, deleted_field: str) -> models.Expression:
+        return (
+            mask_total(RelayAddress, models.Sum(field))
+            + mask_total(DomainAddress, models.Sum(field))
+            + Coalesce(models.F(deleted_field), 0)
+        )
+
+    return profiles.annotate(
+        **{
+            MASK_STATS_ANNOTATIONS["total_masks"]: (
+                mask_total(RelayAddress, models.Count("id"))
+                + mask_total(DomainAddress, models.Count("id"))
+            ),
+            MASK_STATS_ANNOTATIONS["emails_forwarded"]: mask_sum(
+                "num_forwarded", "num_email_forwarded_in_deleted_address"
+            ),
+            MASK_STATS_ANNOTATIONS["emails_blocked"]: mask_sum(
+                "num_blocked", "num_email_blocked_in_deleted_address"
+            ),
+            MASK_STATS_ANNOTATIONS["emails_replied"]: mask_sum(
+                "num_replied", "num_email_replied_in_deleted_address"
+            ),
+            MASK_STATS_ANNOTATIONS["level_one_trackers_blocked"]: mask_sum(
+                "num_level_one_trackers_blocked",
+                "num_level_one_trackers_blocked_in_deleted_address",
+            ),
+        }
+    )
+
+
 class RegisteredSubdomain(models.Model):
     subdomain_hash = models.CharField(max_length=64, db_index=True, unique=True)
     registered_at = models.DateTimeField(auto_now_add=True)
@@ -12,6 +12,7 @@ These functions get the details of the paid plans:
 
 * get_premium_country_language_mapping
   * get_premium_countries
+  * get_premium_price_for_country_and_language
 * get_phone_country_language_mapping
 * get_bundle_country_language_mapping
 
@@ -41,8 +42,9 @@ has a monthly and a yearly plan. The monthly plan has a Stripe ID of
 plan has a Stripe ID of "price_1LYC7xJNcmPzuWtRcdKXCVZp", and costs €11.88 a year,
 equivalent to €0.99 a month.
 
-The top-level keys say which countries are supported. The function get_premium_countries
-returns these as a set, when the rest of the data is unneeded.
+The top-level keys say which countries are supported, sorted by country code. The
+function get_premium_countries returns these as a set, when the rest of the data is
+unneeded.
 
 The second-level keys are the languages for that country. When all languages in that
 country have the same plan, the single entry is "*". When the country is known but
@@ -62,7 +64,7 @@ on first use to create the PlanCountryLangMapping, and served from cache on late
 
 from copy import deepcopy
 from functools import lru_cache
-from typing import Literal, TypedDict, get_args
+from typing import Literal, TypedDict, cast, get_args
 
 from django.conf import settings
 
@@ -171,6 +173,23 @@ def get_premium_countries() -> set[CountryStr]:
     return set(mapping.keys())
 
 
+def get_premium_price_for_country_and_language(
+    country: str, language: str, period: PeriodStr = "yearly"
+) -> StripePriceDef:
+    """
+    Get the premium price for a country and language.
+
+    Unsupported countries get the US price, and unsupported languages get the
+    country's default language.
+    """
+    mapping = get_premium_country_language_mapping()
+    country_details = mapping.get(cast(CountryStr, country), mapping["US"])
+    language_prices = country_details.get(cast(LanguageStr, language))
+    if language_prices is None:
+        language_prices = next(iter(country_details.values()))
+    return language_prices[period]
+
+
 def get_phone_country_language_mapping() -> PlanCountryLangMapping:
     """Get mapping for phone countries (premium + phone mask)"""
     return _country_language_mapping("phones")
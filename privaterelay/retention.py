@@ -0,0 +1,148 @@
+"""Delete records that are past their retention period, in small chunks."""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+from django.conf import settings
+from django.db.models import Max, QuerySet
+
+from emails.models import AbuseMetrics, Reply
+from emails.utils import incr_if_enabled
+
+logger = logging.getLogger("eventsinfo.retention")
+
+# Number of rows to delete per query
+DELETE_CHUNK_SIZE = 1000
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """A set of records to delete, such as replies older than a few months."""
+
+    slug: str
+    title: str
+    get_queryset: Callable[[], QuerySet[Any]]
+
+
+def old_replies() -> QuerySet[Reply]:
+    """Return the Reply records older than REPLY_RETENTION_DAYS."""
+    return old_replies_before(
+        datetime.now(UTC) - timedelta(days=settings.REPLY_RETENTION_DAYS)
+    )
+
+
+def old_replies_before(before: datetime) -> QuerySet[Reply]:
+    return Reply.objects.filter(created_at__lt=before)
+
+
+def old_abuse_metrics() -> QuerySet[AbuseMetrics]:
+    """Return the AbuseMetrics records from before today (UTC)."""
+    return old_abuse_metrics_before(
+        datetime.combine(datetime.now(UTC).date(), datetime.min.time()).replace(
+            tzinfo=UTC
+        )
+    )
+
+
+def old_abuse_metrics_before(before: datetime) -> QuerySet[AbuseMetrics]:
+    return AbuseMetrics.objects.filter(first_recorded__lt=before)
+
+
+def expired_real_phones() -> QuerySet[Any]:
+    """Return the unverified RealPhone records with an expired verification code."""
+    from phones.models import RealPhone
+
+    return RealPhone.expired_objects.all()
+
+
+def get_retention_policies() -> dict[str, RetentionPolicy]:
+    """Return the retention policies for the enabled apps, by slug."""
+    policies = [
+        RetentionPolicy(
+            "replies", "Reply records for old forwarded emails", old_replies
+        ),
+        RetentionPolicy(
+            "abuse-metrics", "AbuseMetrics records from before today", old_abuse_metrics
+        ),
+    ]
+    if settings.PHONES_ENABLED:
+        policies.append(
+            RetentionPolicy(
+                "real-phones",
+                "Unverified RealPhone records with expired codes",
+                expired_real_phones,
+            )
+        )
+    return {policy.slug: policy for policy in policies}
+
+
+def delete_in_chunks(
+    queryset: QuerySet[Any],
+    chunk_size: int = DELETE_CHUNK_SIZE,
+    pause_seconds: float = 0.0,
+    on_chunk: Callable[[int, int], None] | None = None,
+) -> int:
+    """
+    Delete the records in a queryset, in chunks of ascending ID ranges.
+
+    Each chunk is one delete of at most chunk_size records, between IDs found by
+    an indexed query. There is a pause between chunks, so that other queries and
+    replicas can catch up. Records added after the start are not deleted.
+
+    Each chunk is committed, so an interrupted delete is resumed by running it
+    again. on_chunk is called with the deleted count and last ID of each chunk.
+    Return is the number of deleted records.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    max_id = queryset.aggregate(max_id=Max("id"))["max_id"]
+    if max_id is None:
+        return 0
+    remaining = queryset.filter(id__lte=max_id).order_by("id")
+    deleted = 0
+    while True:
+        end_ids = list(
+            remaining.values_list("id", flat=True)[chunk_size - 1 : chunk_size]
+        )
+        end_id = end_ids[0] if end_ids else max_id
+        count, _ = remaining.filter(id__lte=end_id).delete()
+        deleted += count
+        if on_chunk:
+            on_chunk(count, end_id)
+        if end_id >= max_id:
+            return deleted
+        remaining = remaining.filter(id__gt=end_id)
+        if pause_seconds:
+            time.sleep(pause_seconds)
+
+
+def apply_retention_policy(
+    policy: RetentionPolicy,
+    chunk_size: int = DELETE_CHUNK_SIZE,
+    pause_seconds: float = 0.0,
+    dry_run: bool = False,
+) -> int:
+    """
+    Delete the records for a retention policy, and emit progress metrics.
+
+    With dry_run, the records are counted by the database instead.
+    Return is the number of deleted (or to be deleted) records.
+    """
+    queryset = policy.get_queryset()
+    if dry_run:
+        return queryset.count()
+
+    def record_chunk(count: int, end_id: int) -> None:
+        incr_if_enabled("retention.deleted", count, tags=[f"policy:{policy.slug}"])
+        logger.info(
+            "retention_chunk",
+            extra={"policy": policy.slug, "deleted": count, "end_id": end_id},
+        )
+
+    return delete_in_chunks(queryset, chunk_size, pause_seconds, record_chunk)
@@ -253,6 +253,10 @@ AWS_ACCESS_KEY_ID = config("AWS_ACCESS_KEY_ID", None)
 AWS_SECRET_ACCESS_KEY = config("AWS_SECRET_ACCESS_KEY", None)
 AWS_SNS_TOPIC = set(config("AWS_SNS_TOPIC", "", cast=Csv()))
 AWS_SNS_KEY_CACHE = config("AWS_SNS_KEY_CACHE", "default")
+# How long each process keeps parsed SNS signing certificates
+AWS_SNS_CERT_LOCAL_CACHE_SECONDS = config(
+    "AWS_SNS_CERT_LOCAL_CACHE_SECONDS", 3600, cast=int
+)
 AWS_SES_CONFIGSET: str | None = config("AWS_SES_CONFIGSET", None)
 AWS_SQS_EMAIL_QUEUE_URL = config("AWS_SQS_EMAIL_QUEUE_URL", None)
 AWS_SQS_EMAIL_DLQ_URL = config("AWS_SQS_EMAIL_DLQ_URL", None)
@@ -431,6 +435,7 @@ TEMPLATES = [
 RELAY_FIREFOX_DOMAIN: str = config("RELAY_FIREFOX_DOMAIN", "relay.firefox.com")
 MOZMAIL_DOMAIN: str = config("MOZMAIL_DOMAIN", "mozmail.com")
 MAX_NUM_FREE_ALIASES: int = config("MAX_NUM_FREE_ALIASES", 5, cast=int)
+MAX_BULK_CREATE_MASKS: int = config("MAX_BULK_CREATE_MASKS", 100, cast=int)
 PERIODICAL_PREMIUM_PROD_ID: str = config("PERIODICAL_PREMIUM_PROD_ID", "")
 PREMIUM_PLAN_ID_US_MONTHLY: str = config(
     "PREMIUM_PLAN_ID_US_MONTHLY", "price_1LXUcnJNcmPzuWtRpbNOajYS"
@@ -473,6 +478,25 @@ PREMIUM_FEATURE_PAUSED_DAYS: int = config(
     "ACCOUNT_PREMIUM_FEATURE_PAUSED_DAYS", 1, cast=int
 )
 
+# Use a filter in Redis to drop emails to unknown masks without a database query.
+# Run the rebuild_mask_lookup_filter command to create the filter.
+MASK_LOOKUP_FILTER_ENABLED: bool = config(
+    "MASK_LOOKUP_FILTER_ENABLED", False, cast=bool
+)
+MASK_LOOKUP_FILTER_CAPACITY: int = config(
+    "MASK_LOOKUP_FILTER_CAPACITY", 10_000_000, cast=int
+)
+MASK_LOOKUP_FILTER_ERROR_RATE: float = config(
+    "MASK_LOOKUP_FILTER_ERROR_RATE", 0.01, cast=float
+)
+# Cache the user for a subdomain, to find their domain masks without a row lock
+SUBDOMAIN_OWNER_CACHE_TIMEOUT: int = config(
+    "SUBDOMAIN_OWNER_CACHE_TIMEOUT", 60 * 60 * 24, cast=int
+)
+
+# Delete Reply records after this many days, with delete_old_data
+REPLY_RETENTION_DAYS: int = config("REPLY_RETENTION_DAYS", 90, cast=int)
+
 SOFT_BOUNCE_ALLOWED_DAYS: int = config("SOFT_BOUNCE_ALLOWED_DAYS", 1, cast=int)
 HARD_BOUNCE_ALLOWED_DAYS: int = config("HARD_BOUNCE_ALLOWED_DAYS", 30, cast=int)
 
@@ -631,6 +655,11 @@ ACCOUNT_PRESERVE_USERNAME_CASING = False
 ACCOUNT_USERNAME_REQUIRED = False
 
 FXA_REQUESTS_TIMEOUT_SECONDS = config("FXA_REQUESTS_TIMEOUT_SECONDS", 1, cast=int)
+# Per-process cache of API tokens to users, 0 to disable
+FXA_TOKEN_LOCAL_CACHE_SIZE = config("FXA_TOKEN_LOCAL_CACHE_SIZE", 1000, cast=int)
+# Delete accounts for Mozilla account delete events with delete_requested_accounts,
+# instead of in the event request
+ACCOUNT_DELETION_ASYNC: bool = config("ACCOUNT_DELETION_ASYNC", False, cast=bool)
 FXA_SETTINGS_URL = config("FXA_SETTINGS_URL", f"{FXA_BASE_ORIGIN}/settings")
 FXA_SUBSCRIPTIONS_URL = config(
     "FXA_SUBSCRIPTIONS_URL", f"{FXA_BASE_ORIGIN}/subscriptions"
@@ -918,6 +947,8 @@ PROCESS_EMAIL_MAX_SECONDS_PER_MESSAGE = config(
     PROCESS_EMAIL_MAX_SECONDS or 120.0,
     cast=float,
 )
+PROCESS_EMAIL_WORKERS = config("PROCESS_EMAIL_WORKERS", 0, cast=int)
+PROCESS_EMAIL_CONCURRENCY = config("PROCESS_EMAIL_CONCURRENCY", 0, cast=int)
 
 # Django 3.2 switches default to BigAutoField
 DEFAULT_AUTO_FIELD = "django.db.models.AutoField"
@@ -0,0 +1,151 @@
+from datetime import UTC, datetime, timedelta
+from io import StringIO
+from typing import Any
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import override_settings
+
+import pytest
+from model_bakery import baker
+
+from emails.models import AbuseMetrics, Reply
+from privaterelay.retention import (
+    apply_retention_policy,
+    delete_in_chunks,
+    get_retention_policies,
+    old_replies_before,
+)
+
+COMMAND_NAME = "delete_old_data"
+
+
+def make_reply(days_old: int) -> Reply:
+    reply: Reply = baker.make(Reply)
+    # created_at is auto_now_add, so set it after creation
+    Reply.objects.filter(id=reply.id).update(
+        created_at=datetime.now(UTC) - timedelta(days=days_old)
+    )
+    return reply
+
+
+@pytest.mark.django_db
+def test_delete_in_chunks(django_assert_num_queries: Any) -> None:
+    old = [make_reply(100) for _ in range(5)]
+    new = make_reply(1)
+    chunks: list[tuple[int, int]] = []
+
+    # The max ID, then 3 chunks with a select of the end ID and a delete
+    with django_assert_num_queries(7):
+        deleted = delete_in_chunks(
+            old_replies_before(datetime.now(UTC) - timedelta(days=90)),
+            chunk_size=2,
+            on_chunk=lambda count, end_id: chunks.append((count, end_id)),
+        )
+
+    assert deleted == 5
+    assert chunks == [(2, old[1].id), (2, old[3].id), (1, old[4].id)]
+    assert list(Reply.objects.values_list("id", flat=True)) == [new.id]
+
+
+@pytest.mark.django_db
+def test_delete_in_chunks_skips_kept_records() -> None:
+    replies = [make_reply(100 if i % 2 else 1) for i in range(6)]
+    chunks: list[tuple[int, int]] = []
+
+    deleted = delete_in_chunks(
+        old_replies_before(datetime.now(UTC) - timedelta(days=90)),
+        chunk_size=2,
+        on_chunk=lambda count, end_id: chunks.append((count, end_id)),
+    )
+
+    assert deleted == 3
+    assert chunks == [(2, replies[3].id), (1, replies[5].id)]
+    assert Reply.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_delete_in_chunks_nothing_to_delete(django_assert_num_queries: Any) -> None:
+    make_reply(1)
+    with django_assert_num_queries(1):
+        assert delete_in_chunks(Reply.objects.filter(id__lt=0)) == 0
+
+
+@pytest.mark.parametrize("chunk_size", (0, -1))
+def test_delete_in_chunks_invalid_chunk_size(chunk_size: int) -> None:
+    with pytest.raises(ValueError, match="chunk_size must be at least 1"):
+        delete_in_chunks(Reply.objects.all(), chunk_size=chunk_size)
+
+
+@pytest.mark.django_db
+@override_settings(REPLY_RETENTION_DAYS=90)
+def test_delete_old_data_command() -> None:
+    make_reply(100)
+    new = make_reply(1)
+    old_metrics = baker.make(AbuseMetrics)
+    AbuseMetrics.objects.filter(id=old_metrics.id).update(
+        first_recorded=datetime.now(UTC) - timedelta(days=2)
+    )
+    out = StringIO()
+
+    call_command(COMMAND_NAME, pause=0, stdout=out)
+
+    lines = out.getvalue().splitlines()
+    assert "replies: Deleted 1 records" in lines
+    assert "abuse-metrics: Deleted 1 records" in lines
+    assert list(Reply.objects.values_list("id", flat=True)) == [new.id]
+    assert not AbuseMetrics.objects.exists()
+
+
+@pytest.mark.django_db
+def test_delete_old_data_command_dry_run() -> None:
+    make_reply(100)
+    make_reply(100)
+    out = StringIO()
+
+    call_command(COMMAND_NAME, "replies", dry_run=True, stdout=out)
+
+    assert out.getvalue() == "replies: Would delete 2 records\n"
+    assert Reply.objects.count() == 2
+
+
+def test_delete_old_data_command_unknown_policy() -> None:
+    with pytest.raises(CommandError, match="Unknown retention policies: unknown"):
+        call_command(COMMAND_NAME, "unknown")
+
+
+def test_delete_old_data_command_invalid_chunk_size() -> None:
+    with pytest.raises(CommandError, match="--chunk-size must be at least 1"):
+        call_command(COMMAND_NAME, chunk_size=0)
+
+
+@pytest.mark.skipif(not settings.PHONES_ENABLED, reason="PHONES_ENABLED is False")
+@pytest.mark.django_db
+def test_real_phones_policy() -> None:
+    from phones.models import RealPhone
+    from phones.tests.models_tests import make_phone_test_user
+
+    user = make_phone_test_user()
+    expired_date = datetime.now(UTC) - timedelta(
+        minutes=settings.MAX_MINUTES_TO_VERIFY_REAL_PHONE + 1
+    )
+    # bulk_create skips RealPhone.save, which sends a verification text
+    expired, verified = RealPhone.objects.bulk_create(
+        [
+            RealPhone(
+                user=user, number="+12223334444", verification_sent_date=expired_date
+            ),
+            RealPhone(
+                user=user,
+                number="+12223335555",
+                verification_sent_date=expired_date,
+                verified=True,
+            ),
+        ]
+    )
+
+    policy = get_retention_policies()["real-phones"]
+    assert apply_retention_policy(policy) == 1
+
+    assert not RealPhone.objects.filter(id=expired.id).exists()
+    assert RealPhone.objects.filter(id=verified.id).exists()
@@ -0,0 +1,62 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+
+import pytest
+from model_bakery import baker
+
+from emails.models import DeletedAddress, DomainAddress, RelayAddress, address_hash
+from privaterelay.account_deletion import (
+    delete_user_account,
+    request_account_deletion,
+)
+from privaterelay.tests.utils import make_premium_test_user
+
+COMMAND_NAME = "delete_requested_accounts"
+
+
+@pytest.mark.django_db
+def test_delete_user_account_archives_masks_in_batches() -> None:
+    user = make_premium_test_user()
+    user.profile.add_subdomain("subdomain")
+    relay_addresses = [baker.make(RelayAddress, user=user) for _ in range(5)]
+    domain_address = baker.make(DomainAddress, user=user, address="custom")
+    hashes = [address_hash(mask.address) for mask in relay_addresses] + [
+        address_hash("custom", "subdomain", domain_address.domain_value)
+    ]
+
+    delete_user_account(user, batch_size=2)
+
+    assert not User.objects.filter(id=user.id).exists()
+    assert not RelayAddress.objects.filter(user_id=user.id).exists()
+    assert not DomainAddress.objects.filter(user_id=user.id).exists()
+    assert DeletedAddress.objects.filter(address_hash__in=hashes).count() == 6
+
+
+@pytest.mark.django_db
+def test_request_account_deletion_deactivates_user() -> None:
+    user = make_premium_test_user()
+    baker.make(RelayAddress, user=user)
+
+    request_account_deletion(user)
+
+    user.refresh_from_db()
+    assert not user.is_active
+    assert user.profile.deletion_requested_at is not None
+    assert RelayAddress.objects.filter(user=user).exists()
+
+
+@pytest.mark.django_db
+def test_delete_requested_accounts_command() -> None:
+    requested = make_premium_test_user()
+    baker.make(RelayAddress, user=requested)
+    request_account_deletion(requested)
+    other = make_premium_test_user()
+    out = StringIO()
+
+    call_command(COMMAND_NAME, batch_size=10, stdout=out)
+
+    assert out.getvalue() == "Deleted 1 accounts\n"
+    assert not User.objects.filter(id=requested.id).exists()
+    assert User.objects.filter(id=other.id).exists()
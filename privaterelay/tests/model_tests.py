@@ -14,7 +14,7 @@ from model_bakery import baker
 from emails.models import AbuseMetrics, DomainAddress, RelayAddress
 
 from ..exceptions import CannotMakeSubdomainException
-from ..models import Profile
+from ..models import Profile, with_mask_stats
 from .utils import (
     make_free_test_user,
     phone_subscription,
@@ -526,6 +526,60 @@ class ProfileSaveTest(ProfileTestCase):
             assert relay_address.generated_for == self.TEST_GENERATED_FOR
             assert relay_address.used_on == self.TEST_USED_ON
 
+    def test_save_server_storage_already_false_does_not_update_masks(self) -> None:
+        self.profile.server_storage = False
+        self.profile.save()
+        relay_address = self.add_relay_address()
+        RelayAddress.objects.filter(id=relay_address.id).update(
+            description=self.TEST_DESCRIPTION
+        )
+
+        profile = Profile.objects.get(id=self.profile.id)
+        profile.onboarding_state = 2
+        with self.assertNumQueries(2):  # measure_feature_usage SELECT, then UPDATE
+            profile.save()
+
+        relay_address.refresh_from_db()
+        assert relay_address.description == self.TEST_DESCRIPTION
+
+    def test_save_update_fields_without_server_storage_skips_delete(self) -> None:
+        relay_address = self.add_relay_address()
+        self.profile.server_storage = False
+        self.profile.save(update_fields=["onboarding_state"])
+
+        relay_address.refresh_from_db()
+        assert relay_address.description == self.TEST_DESCRIPTION
+        assert self.profile.has_changed("server_storage")
+
+    def test_save_server_storage_false_after_refresh_deletes_data(self) -> None:
+        relay_address = self.add_relay_address()
+        Profile.objects.filter(id=self.profile.id).update(server_storage=False)
+        self.profile.refresh_from_db()
+        assert not self.profile.has_changed("server_storage")
+        self.profile.server_storage = True
+        self.profile.save()
+        self.profile.server_storage = False
+        self.profile.save()
+
+        relay_address.refresh_from_db()
+        assert relay_address.description == ""
+
+
+class ProfileTouchEngagementTest(ProfileTestCase):
+    """Tests for Profile.touch_engagement()"""
+
+    def test_touch_engagement_writes_only_last_engagement(self) -> None:
+        assert self.profile.last_engagement is None
+        self.profile.onboarding_state = 3
+
+        with self.assertNumQueries(1):
+            self.profile.touch_engagement()
+
+        assert self.profile.last_engagement
+        profile = Profile.objects.get(id=self.profile.id)
+        assert profile.last_engagement == self.profile.last_engagement
+        assert profile.onboarding_state == 0
+
 
 class ProfileDisplayNameTest(ProfileTestCase):
     """Tests for Profile.display_name"""
@@ -647,6 +701,72 @@ class ProfileEmailsRepliedTest(ProfileTestCase):
         assert self.profile.emails_replied == 8
 
 
+class ProfileMaskStatsTest(ProfileTestCase):
+    """Tests for the Profile mask statistics and with_mask_stats()"""
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.upgrade_to_premium()
+        self.profile.subdomain = "test"
+        self.profile.num_email_forwarded_in_deleted_address = 1
+        self.profile.num_email_blocked_in_deleted_address = 2
+        self.profile.num_email_replied_in_deleted_address = 3
+        self.profile.num_level_one_trackers_blocked_in_deleted_address = None
+        self.profile.save()
+        baker.make(
+            RelayAddress,
+            user=self.profile.user,
+            num_forwarded=10,
+            num_blocked=20,
+            num_replied=30,
+            num_level_one_trackers_blocked=40,
+        )
+        baker.make(
+            RelayAddress,
+            user=self.profile.user,
+            num_forwarded=100,
+            num_blocked=200,
+            num_replied=300,
+            num_level_one_trackers_blocked=None,
+        )
+        baker.make(
+            DomainAddress,
+            user=self.profile.user,
+            address="stats",
+            num_forwarded=1000,
+            num_blocked=2000,
+            num_replied=3000,
+            num_level_one_trackers_blocked=4000,
+        )
+        # Another user's masks are not included
+        baker.make(RelayAddress, num_forwarded=5, num_blocked=5, num_replied=5)
+
+    def test_properties_sum_over_masks(self) -> None:
+        assert self.profile.total_masks == 3
+        assert self.profile.emails_forwarded == 1111
+        assert self.profile.emails_blocked == 2222
+        assert self.profile.emails_replied == 3333
+        assert self.profile.level_one_trackers_blocked == 4040
+
+    def test_with_mask_stats_loads_stats_in_one_query(self) -> None:
+        with self.assertNumQueries(1):
+            profile = with_mask_stats(Profile.objects.filter(id=self.profile.id)).get()
+            assert profile.total_masks == 3
+            assert profile.emails_forwarded == 1111
+            assert profile.emails_blocked == 2222
+            assert profile.emails_replied == 3333
+            assert profile.level_one_trackers_blocked == 4040
+
+    def test_with_mask_stats_no_masks(self) -> None:
+        other_profile = baker.make(User).profile
+        profile = with_mask_stats(Profile.objects.filter(id=other_profile.id)).get()
+        assert profile.total_masks == 0
+        assert profile.emails_forwarded == 0
+        assert profile.emails_blocked == 0
+        assert profile.emails_replied == 0
+        assert profile.level_one_trackers_blocked == 0
+
+
 class ProfileUpdateAbuseMetricTest(ProfileTestCase):
     """Tests for Profile.update_abuse_metric()"""
 
@@ -720,6 +840,36 @@ class ProfileUpdateAbuseMetricTest(ProfileTestCase):
         assert self.abuse_metric.forwarded_email_size_per_day == 100
         assert self.profile.last_account_flagged == self.expected_now
 
+    def test_increments_existing_metrics_for_today(self) -> None:
+        self.profile.update_abuse_metric(replied=True, forwarded_email_size=20)
+        self.profile.update_abuse_metric(replied=True, forwarded_email_size=30)
+        self.abuse_metric.refresh_from_db()
+
+        assert self.abuse_metric.num_replies_per_day == 2
+        assert self.abuse_metric.forwarded_email_size_per_day == 50
+        assert self.abuse_metric.num_email_forwarded_per_day == 0
+        assert self.abuse_metric.last_recorded == self.expected_now
+        assert AbuseMetrics.objects.count() == 1
+        self.mocked_abuse_info.assert_not_called()
+
+    def test_creates_metrics_without_deleting_old_metrics(self) -> None:
+        AbuseMetrics.objects.filter(id=self.abuse_metric.id).update(
+            first_recorded=self.expected_now - timedelta(days=2)
+        )
+        other_user_metric = baker.make(AbuseMetrics)
+        AbuseMetrics.objects.filter(id=other_user_metric.id).update(
+            first_recorded=self.expected_now - timedelta(days=2)
+        )
+
+        self.profile.update_abuse_metric(address_created=True)
+
+        assert AbuseMetrics.objects.count() == 3
+        todays_metric = AbuseMetrics.objects.latest("first_recorded")
+        assert todays_metric.user == self.profile.user
+        assert todays_metric.num_address_created_per_day == 1
+        self.abuse_metric.refresh_from_db()
+        assert self.abuse_metric.num_address_created_per_day == 0
+
 
 class ProfileMetricsEnabledTest(ProfileTestCase):
     def test_no_fxa_means_metrics_enabled(self) -> None:
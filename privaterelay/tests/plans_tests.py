@@ -6,11 +6,13 @@ from pytest_django.fixtures import SettingsWrapper
 from privaterelay.plans import (
     CountryStr,
     LanguageOrAny,
+    PeriodStr,
     PlanCountryLangMapping,
     get_bundle_country_language_mapping,
     get_phone_country_language_mapping,
     get_premium_countries,
     get_premium_country_language_mapping,
+    get_premium_price_for_country_and_language,
     relay_countries,
 )
 
@@ -177,6 +179,31 @@ def test_get_premium_country_language_mapping_overrides(
     assert mapping["CA"]["*"]["yearly"]["id"] == stage_yearly_id
 
 
+def test_get_premium_country_language_mapping_is_sorted() -> None:
+    mapping = get_premium_country_language_mapping()
+    assert list(mapping) == sorted(mapping)
+
+
+@pytest.mark.parametrize(
+    "country,language,period,price_data_key",
+    (
+        ("CH", "fr", "monthly", "fr-CH"),
+        ("CH", "it", "yearly", "it-CH"),
+        ("CH", "en", "yearly", "fr-CH"),  # Unsupported language, first language
+        ("DE", "de", "yearly", "DE"),
+        ("MX", "es", "yearly", "en-US"),  # Unsupported country, US price
+    ),
+)
+def test_get_premium_price_for_country_and_language(
+    country: str, language: str, period: PeriodStr, price_data_key: str
+) -> None:
+    price = get_premium_price_for_country_and_language(country, language, period)
+    currency, monthly_sid, yearly_sid = _PREMIUM_PRICE_DATA[price_data_key]
+    sid = monthly_sid if period == "monthly" else yearly_sid
+    assert price["id"] == f"price{sid}"
+    assert price["currency"] == currency
+
+
 _PHONE_PRICE_DATA = {
     "en-US": ("USD", "_1Li0w8JNcmPzuWtR2rGU80P3", "_1Li15WJNcmPzuWtRIh0F4VwP"),
 }
@@ -1,27 +1,33 @@
+import gc
 import logging
+import weakref
 from collections.abc import Iterator
 from pathlib import Path
 from unittest.mock import patch
 
 from django.contrib.auth.models import AbstractBaseUser, Group, User
 from django.core.cache.backends.base import BaseCache
+from django.http import HttpRequest
 from django.test import RequestFactory
 
 import pytest
 from _pytest.fixtures import SubRequest
 from _pytest.logging import LogCaptureFixture
 from pytest_django.fixtures import SettingsWrapper
+from rest_framework.request import Request
 from waffle.models import AbstractUserFlag, Flag
 from waffle.testutils import override_flag
 from waffle.utils import get_cache as get_waffle_cache
 
-from ..plans import get_premium_country_language_mapping
+from ..plans import PeriodStr, get_premium_country_language_mapping
 from ..utils import (
     AcceptLanguageError,
     flag_is_active_in_task,
     get_countries_info_from_request_and_mapping,
+    get_subplat_upgrade_link_by_language,
     get_version_info,
     guess_country_from_accept_lang,
+    request_cache,
 )
 
 
@@ -311,6 +317,42 @@ def test_guess_country_from_accept_lang_short_primary_lang_fails(
     assert exc_info.value.accept_lang == accept_lang
 
 
+def test_guess_country_from_accept_lang_is_cached() -> None:
+    guess_country_from_accept_lang.cache_clear()
+    assert guess_country_from_accept_lang("de-CH") == "CH"
+    assert guess_country_from_accept_lang("de-CH") == "CH"
+    cache_info = guess_country_from_accept_lang.cache_info()
+    assert cache_info.misses == 1
+    assert cache_info.hits == 1
+
+
+@pytest.mark.parametrize(
+    "accept_language,period,expected_plan",
+    (
+        ("en", "yearly", "price_us_yearly"),
+        ("en", "monthly", "price_us_monthly"),
+        ("fr-CH", "yearly", "price_1LYCwMJNcmPzuWtRm6ebmq2N"),
+        ("de", "yearly", "price_1LYC7xJNcmPzuWtRcdKXCVZp"),
+        ("es-MX", "yearly", "price_us_yearly"),
+    ),
+)
+def test_get_subplat_upgrade_link_by_language(
+    settings: SettingsWrapper,
+    accept_language: str,
+    period: PeriodStr,
+    expected_plan: str,
+) -> None:
+    settings.FXA_BASE_ORIGIN = "https://accounts.example.com"
+    settings.PERIODICAL_PREMIUM_PROD_ID = "prod_premium"
+    settings.PREMIUM_PLAN_ID_US_MONTHLY = "price_us_monthly"
+    settings.PREMIUM_PLAN_ID_US_YEARLY = "price_us_yearly"
+    link = get_subplat_upgrade_link_by_language(accept_language, period)
+    assert link == (
+        "https://accounts.example.com/subscriptions/products/prod_premium"
+        f"?plan={expected_plan}"
+    )
+
+
 def test_get_countries_info_bad_accept_language(
     rf: RequestFactory, caplog: LogCaptureFixture
 ) -> None:
@@ -620,3 +662,72 @@ def test_get_version_info() -> None:
         "source": "https://github.com/mozilla/fx-private-relay",
         "build": "https://circleci.com/gh/mozilla/fx-private-relay/100",
     }
+
+
+_request_cache_calls: list[tuple[HttpRequest, str]] = []
+
+
+@request_cache
+def _cached_lookup(request: HttpRequest, name: str = "default") -> str:
+    _request_cache_calls.append((request, name))
+    return f"{request.path}:{name}"
+
+
+@pytest.fixture
+def request_cache_calls() -> Iterator[list[tuple[HttpRequest, str]]]:
+    _request_cache_calls.clear()
+    yield _request_cache_calls
+    _request_cache_calls.clear()
+
+
+def test_request_cache_caches_per_request(
+    rf: RequestFactory, request_cache_calls: list[tuple[HttpRequest, str]]
+) -> None:
+    request1 = rf.get("/one")
+    request2 = rf.get("/two")
+
+    assert _cached_lookup(request1) == "/one:default"
+    assert _cached_lookup(request1) == "/one:default"
+    assert _cached_lookup(request1, name="other") == "/one:other"
+    assert _cached_lookup(request2) == "/two:default"
+
+    assert [(call[0].path, call[1]) for call in request_cache_calls] == [
+        ("/one", "default"),
+        ("/one", "other"),
+        ("/two", "default"),
+    ]
+
+
+def test_request_cache_shared_with_drf_request(
+    rf: RequestFactory, request_cache_calls: list[tuple[HttpRequest, str]]
+) -> None:
+    request = rf.get("/shared")
+    drf_request = Request(request)
+
+    assert _cached_lookup(drf_request) == "/shared:default"
+    assert _cached_lookup(request) == "/shared:default"
+    assert len(request_cache_calls) == 1
+
+
+def test_request_cache_releases_request(
+    rf: RequestFactory, request_cache_calls: list[tuple[HttpRequest, str]]
+) -> None:
+    request = rf.get("/released")
+    _cached_lookup(request)
+    request_cache_calls.clear()
+    request_ref = weakref.ref(request)
+
+    del request
+    gc.collect()
+
+    assert request_ref() is None
+
+
+def test_get_countries_info_logs_region_once(
+    rf: RequestFactory, caplog: LogCaptureFixture
+) -> None:
+    request = rf.get("/api/v1/runtime_data", HTTP_X_CLIENT_REGION="DE")
+    mapping = get_premium_country_language_mapping()
+    get_countries_info_from_request_and_mapping(request, mapping)
+    get_countries_info_from_request_and_mapping(request, mapping)
+    assert len(caplog.records) == 1
@@ -1,5 +1,7 @@
+import gc
 import json
 import logging
+import weakref
 from collections.abc import Iterator
 from copy import deepcopy
 from dataclasses import dataclass
@@ -10,7 +12,7 @@ from unittest.mock import Mock, patch
 from uuid import uuid4
 
 from django.contrib.auth.models import User
-from django.test import Client, TestCase, override_settings
+from django.test import Client, RequestFactory, TestCase, override_settings
 from django.utils import timezone
 
 import jwt
@@ -38,7 +40,7 @@ from privaterelay.tests.utils import premium_subscription
 from ..apps import PrivateRelayConfig
 from ..fxa_utils import NoSocialToken
 from ..models import Profile
-from ..views import _update_all_data, fxa_verifying_keys
+from ..views import _get_fxa, _update_all_data, fxa_verifying_keys
 
 
 def test_no_social_token():
@@ -165,6 +167,20 @@ class UpdateExtraDataAndEmailTest(TestCase):
         assert ea.email == new_email
 
 
+@pytest.mark.django_db
+def test_get_fxa_releases_request(rf: RequestFactory) -> None:
+    sa: SocialAccount = baker.make(SocialAccount, provider="fxa")
+    request = rf.get("/accounts/profile/refresh")
+    request.user = sa.user
+    assert _get_fxa(request) == sa
+    request_ref = weakref.ref(request)
+
+    del request
+    gc.collect()
+
+    assert request_ref() is None
+
+
 @pytest.mark.django_db
 def test_logout_page(client, settings):
     user = baker.make(User)
@@ -573,6 +589,32 @@ def test_fxa_rp_events_delete_user(
     assert DeletedAddress.objects.filter(address_hash=da_address_hash).exists()
 
 
+def test_fxa_rp_events_delete_user_async(
+    client: Client,
+    settings: SettingsWrapper,
+    setup_fxa_rp_events: FxaRpEventsSetupData,
+) -> None:
+    """With ACCOUNT_DELETION_ASYNC, a delete-user event queues the deletion."""
+    settings.ACCOUNT_DELETION_ASYNC = True
+    setup_fxa_rp_events.mock_responses.reset()  # No profile fetch for delete-user
+    event_jwt = get_fxa_event_jwt(
+        "delete-user",
+        fxa_id=setup_fxa_rp_events.fxa_acct.uid,
+        client_id=setup_fxa_rp_events.app.client_id,
+        signing_key=setup_fxa_rp_events.key,
+        event_data={},
+    )
+
+    response = client.get("/fxa-rp-events", HTTP_AUTHORIZATION=f"Bearer {event_jwt}")
+
+    assert response.status_code == 200
+    user = setup_fxa_rp_events.user
+    user.refresh_from_db()
+    assert not user.is_active
+    assert user.profile.deletion_requested_at is not None
+    assert RelayAddress.objects.filter(id=setup_fxa_rp_events.ra.id).exists()
+
+
 def test_version_view(client: Client, version_json_path: Path) -> None:
     version_info = {
         "commit": "a_commit_hash",
@@ -5,16 +5,17 @@ import logging
 import random
 from collections.abc import Callable
 from decimal import Decimal
-from functools import cache, wraps
+from functools import cache, lru_cache, wraps
 from pathlib import Path
 from string import ascii_uppercase
-from typing import TYPE_CHECKING, ParamSpec, TypedDict, TypeVar, cast
+from typing import TYPE_CHECKING, Any, Concatenate, ParamSpec, TypedDict, TypeVar, cast
 
 from django.conf import settings
 from django.contrib.auth.models import AbstractBaseUser
 from django.http import Http404, HttpRequest
 from django.utils.translation.trans_real import parse_accept_lang_header
 
+from rest_framework.request import Request
 from waffle import get_waffle_flag_model
 from waffle.models import logger as waffle_logger
 from waffle.utils import get_cache as get_waffle_cache
@@ -22,10 +23,9 @@ from waffle.utils import get_setting as get_waffle_setting
 
 from .plans import (
     CountryStr,
-    LanguageStr,
     PeriodStr,
     PlanCountryLangMapping,
-    get_premium_country_language_mapping,
+    get_premium_price_for_country_and_language,
 )
 
 if TYPE_CHECKING:
@@ -33,6 +33,45 @@ if TYPE_CHECKING:
 
 info_logger = logging.getLogger("eventsinfo")
 
+# Generics for defining function decorators
+# https://mypy.readthedocs.io/en/stable/generics.html#declaring-decorators
+_Params = ParamSpec("_Params")
+_RetVal = TypeVar("_RetVal")
+
+
+def request_cache(
+    func: Callable[Concatenate[HttpRequest, _Params], _RetVal],
+) -> Callable[Concatenate[HttpRequest, _Params], _RetVal]:
+    """
+    Cache the result of a function for the life of a request.
+
+    The results are stored on the request, so they are released with the request.
+    functools.cache would keep every request for the life of the process, and never
+    return a cached result. The other arguments must be hashable.
+
+    Usage:
+
+        @request_cache
+        def get_fxa(request):
+            return request.user.socialaccount_set.filter(provider="fxa").first()
+    """
+
+    @wraps(func)
+    def inner(
+        request: HttpRequest, /, *args: _Params.args, **kwargs: _Params.kwargs
+    ) -> _RetVal:
+        # Share the cache between a DRF Request and the wrapped HttpRequest
+        http_request = request._request if isinstance(request, Request) else request
+        results: dict[Any, Any] = http_request.__dict__.setdefault(
+            "_relay_request_cache", {}
+        )
+        key = (func.__module__, func.__qualname__, args, frozenset(kwargs.items()))
+        if key not in results:
+            results[key] = func(request, *args, **kwargs)
+        return cast(_RetVal, results[key])
+
+    return inner
+
 
 class CountryInfo(TypedDict):
     country_code: str
@@ -45,7 +84,8 @@ def get_countries_info_from_request_and_mapping(
     request: HttpRequest, mapping: PlanCountryLangMapping
 ) -> CountryInfo:
     country_code = _get_cc_from_request(request)
-    countries = sorted(mapping.keys())
+    # The plan mappings are already sorted by country code
+    countries = list(mapping)
     available_in_country = country_code in countries
     return {
         "country_code": country_code,
@@ -59,7 +99,7 @@ def get_countries_info_from_lang_and_mapping(
     accept_lang: str, mapping: PlanCountryLangMapping
 ) -> CountryInfo:
     country_code = _get_cc_from_lang(accept_lang)
-    countries = sorted(mapping.keys())
+    countries = list(mapping)
     available_in_country = country_code in countries
     return {
         "country_code": country_code,
@@ -72,23 +112,16 @@ def get_countries_info_from_lang_and_mapping(
 def get_subplat_upgrade_link_by_language(
     accept_language: str, period: PeriodStr = "yearly"
 ) -> str:
-    country_str = guess_country_from_accept_lang(accept_language)
-    country = cast(CountryStr, country_str)
-    language_str = accept_language.split("-")[0].lower()
-    language = cast(LanguageStr, language_str)
-    country_lang_mapping = get_premium_country_language_mapping()
-    country_details = country_lang_mapping.get(country, country_lang_mapping["US"])
-    if language in country_details:
-        plan = country_details[language][period]
-    else:
-        first_key = list(country_details.keys())[0]
-        plan = country_details[first_key][period]
+    country = guess_country_from_accept_lang(accept_language)
+    language = accept_language.split("-")[0].lower()
+    plan = get_premium_price_for_country_and_language(country, language, period)
     return (
         f"{settings.FXA_BASE_ORIGIN}/subscriptions/products/"
         f"{settings.PERIODICAL_PREMIUM_PROD_ID}?plan={plan['id']}"
     )
 
 
+@request_cache
 def _get_cc_from_request(request: HttpRequest) -> str:
     """Determine the user's region / country code."""
 
@@ -114,11 +147,10 @@ def _get_cc_from_request(request: HttpRequest) -> str:
         log_data["region_method"] = "fallback"
     log_data["region"] = region
 
-    # MPP-3284: Log details of region selection. Only log once per request, since some
-    # endpoints, like /api/v1/runtime_data, call this multiple times.
-    if not getattr(request, "_logged_region_details", False):
-        setattr(request, "_logged_region_details", True)
-        info_logger.info("region_details", extra=log_data)
+    # MPP-3284: Log details of region selection. This is logged once per request,
+    # since the result is cached for endpoints like /api/v1/runtime_data that call
+    # this multiple times.
+    info_logger.info("region_details", extra=log_data)
 
     return region
 
@@ -285,6 +317,7 @@ class AcceptLanguageError(ValueError):
         self.accept_lang = accept_lang
 
 
+@lru_cache(maxsize=1024)
 def guess_country_from_accept_lang(accept_lang: str) -> str:
     """
     Guess the user's country from the Accept-Language header
@@ -293,6 +326,9 @@ def guess_country_from_accept_lang(accept_lang: str) -> str:
 
     If an issue is detected, a AcceptLanguageError is raised.
 
+    Results are cached by the raw header value, since most calls are for a few
+    common values, like the language of a forwarded email.
+
     The header may come directly from a web request, or may be the header
     captured by Mozilla Accounts (FxA) at signup.
 
@@ -355,12 +391,6 @@ def guess_country_from_accept_lang(accept_lang: str) -> str:
         raise AcceptLanguageError("Unknown langauge", accept_lang)
 
 
-# Generics for defining function decorators
-# https://mypy.readthedocs.io/en/stable/generics.html#declaring-decorators
-_Params = ParamSpec("_Params")
-_RetVal = TypeVar("_RetVal")
-
-
 def enable_or_404(
     check_function: Callable[[], bool],
     message: str = "This conditional view is disabled.",
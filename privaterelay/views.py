@@ -2,7 +2,6 @@ import json
 import logging
 from collections.abc import Iterable
 from datetime import UTC, datetime
-from functools import cache
 from hashlib import sha256
 from typing import Any, TypedDict
 
@@ -24,12 +23,13 @@ from markus.utils import generate_tag
 from oauthlib.oauth2.rfc6749.errors import CustomOAuth2Error
 from rest_framework.decorators import api_view, schema
 
-from emails.models import DomainAddress, RelayAddress
 from emails.utils import incr_if_enabled
 
+from .account_deletion import delete_user_account, request_account_deletion
 from .apps import PrivateRelayConfig
 from .exceptions import CannotMakeSubdomainException
 from .fxa_utils import NoSocialToken, _get_oauth2_session
+from .utils import request_cache
 from .validators import valid_available_subdomain
 
 FXA_PROFILE_CHANGE_EVENT = "https://schemas.accounts.firefox.com/event/profile-change"
@@ -43,7 +43,7 @@ logger = logging.getLogger("events")
 info_logger = logging.getLogger("eventsinfo")
 
 
-@cache
+@request_cache
 def _get_fxa(request):
     return request.user.socialaccount_set.filter(provider="fxa").first()
 
@@ -353,14 +353,11 @@ def _update_all_data(
 def _handle_fxa_delete(
     authentic_jwt: FxAEvent, social_account: SocialAccount, event_key: str
 ) -> None:
-    # Using for loops here because QuerySet.delete() does a bulk delete which does
-    # not call the model delete() methods that create DeletedAddress records
-    for relay_address in RelayAddress.objects.filter(user=social_account.user):
-        relay_address.delete()
-    for domain_address in DomainAddress.objects.filter(user=social_account.user):
-        domain_address.delete()
-
-    social_account.user.delete()
+    if settings.ACCOUNT_DELETION_ASYNC:
+        # Deactivate now, and delete with the delete_requested_accounts command
+        request_account_deletion(social_account.user)
+    else:
+        delete_user_account(social_account.user)
     info_logger.info(
         "fxa_rp_event",
         extra={